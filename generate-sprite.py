@@ -5,17 +5,81 @@
 将所有控制按钮图标合并成一张雪碧图，并生成对应的CSS代码
 """
 
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import io
+import math
 import os
+import select
 import shutil
-from PIL import Image
+import struct
+import sys
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, features
 import json
 
 # 配置
 IMG_DIR = 'src/assets/png'
 OUTPUT_SPRITE = 'docs/assets/img/controls-sprite.png'
 OUTPUT_CSS = 'docs/assets/css/sprite-generated.css'
+OUTPUT_JSON = OUTPUT_SPRITE.replace('.png', '.json')
+# 拆分主题时深色图标使用的雪碧图（浅色图标仍使用 OUTPUT_SPRITE）
+OUTPUT_SPRITE_DARK = OUTPUT_SPRITE.replace('.png', '-dark.png')
+# 页面切换深色主题时添加到 body 上的选择器
+DARK_THEME_SELECTOR = 'body.dark-mode'
+
+# 源图标的像素密度：设计稿按 @2x 导出（styles.css 中以 background-size 缩小一半显示）
+SOURCE_DENSITY = 2
+
+# 开发服务器使用的雪碧图副本目录
+SRC_IMG_DIR = 'src/assets/img'
+
+# 增量构建缓存目录（保存清单和上次的输出副本，docs 会被 Vite 清空所以不能依赖它）
+SPRITE_CACHE_DIR = '.cache/sprite'
+# 3: 拼图改为直接复制图标像素（半透明像素不再与透明底色混合），缓存的雪碧图不能再增量重绘
+SPRITE_CACHE_VERSION = 3
+
+# 监听模式：文件事件静默多久后开始重建（秒），以及快速重建后空闲多久补做完整压缩优化
+WATCH_DEBOUNCE = 0.15
+WATCH_SETTLE = 2.0
+# 不支持 inotify 时轮询目录的间隔（秒）
+WATCH_POLL_INTERVAL = 0.3
+
+# 并行解码图标的默认线程数（Pillow 解码、缩放时会释放 GIL，线程即可利用多核）
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+# 图标登记表：按文件名约定自动发现的图标分组，两个构建脚本共用
+ICON_REGISTRY = os.path.join(SPRITE_CACHE_DIR, 'icon-registry.json')
+ICON_REGISTRY_VERSION = 1
+# 文件名约定：<分组>[_<状态>][_dark].png，无状态后缀或 _Default 为默认状态
+ICON_STATES = ('hover', 'press', 'disabled')
+
+# 默认布局：styles.css 中手写了基于 10 列网格的 background-position，
+# 因此默认保持网格布局，maxrects 需显式开启
+DEFAULT_LAYOUT = 'grid'
+
+# 可选的现代图片格式及其无损编码参数（PNG 始终作为兜底输出）
+ALT_FORMATS = {
+    'webp': {'lossless': True, 'quality': 100, 'method': 6, 'exact': True},
+    'avif': {'quality': 100, 'subsampling': '4:4:4'},
+}
+
+# PNG 优化参数（无损）：尝试的 deflate 压缩级别与 zlib 策略
+PNG_COMPRESS_LEVELS = [6, 9]
+PNG_ZLIB_STRATEGIES = {
+    'default': zlib.Z_DEFAULT_STRATEGY,
+    'filtered': zlib.Z_FILTERED,
+    'rle': zlib.Z_RLE,
+}
 
 # 需要合并的图标列表（按类别分组）
+# 雪碧图按此顺序排布；目录中未列出的图标会被自动发现并追加到末尾，
+# 已有图标的位置保持不变（见 load_icon_registry()）
 ICONS = {
     'help': [
         'help.png',
@@ -155,38 +219,423 @@ ICONS = {
 }
 
 
-def generate_sprite():
-    """生成雪碧图"""
-    print("🎨 开始生成雪碧图...")
+def _png_chunk(tag, data):
+    """构造一个 PNG 数据块（长度 + 类型 + 数据 + CRC）"""
+    return (struct.pack('>I', len(data)) + tag + data +
+            struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
 
-    # 收集所有图标文件
-    all_icons = []
-    icon_positions = {}
 
-    for category, icons in ICONS.items():
+def _encode_png_unfiltered(img, level, strategy):
+    """手动编码 RGBA PNG：所有扫描行使用 None 滤波器
+
+    Pillow 对 RGBA 图像固定使用逐行自适应滤波，而图标雪碧图大面积透明，
+    不滤波时 deflate 往往压得更小，因此作为额外的候选策略。
+    """
+    width, height = img.size
+    raw = img.tobytes()
+    stride = width * 4
+    scanlines = b''.join(
+        b'\x00' + raw[y * stride:(y + 1) * stride] for y in range(height))
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 15, 9, strategy)
+    idat = compressor.compress(scanlines) + compressor.flush()
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + _png_chunk(b'IHDR', ihdr) +
+            _png_chunk(b'IDAT', idat) + _png_chunk(b'IEND', b''))
+
+
+def _to_exact_palette(img):
+    """颜色数不超过 256 时无损转换为调色板图像（带 tRNS 透明度），否则返回 None"""
+    colors = img.getcolors(256)
+    if colors is None:
+        return None
+
+    index = {color: i for i, (_, color) in enumerate(colors)}
+    data = bytes(index[pixel] for pixel in img.getdata())
+    palette_img = Image.frombytes('P', img.size, data)
+    palette_img.putpalette(
+        b''.join(bytes(color[:3]) for _, color in colors), 'RGB')
+    palette_img.info['transparency'] = bytes(color[3] for _, color in colors)
+    return palette_img
+
+
+def encode_png(img, optimize=True):
+    """将雪碧图编码为 PNG 字节
+
+    optimize=True 时尝试多种滤波策略、deflate 级别和无损调色板，
+    保留像素完全一致的最小结果；optimize='fast' 时只做一次低级别 deflate
+    （监听模式下追求重建速度）；optimize=False 时保持原来的
+    compress_level=0 无压缩输出（调试模式）。
+
+    返回值：
+        tuple: (png_bytes, report)，report 包含策略、原始大小、优化后大小和耗时
+    """
+    start = time.perf_counter()
+
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG', compress_level=0)
+    baseline = buffer.getvalue()
+
+    report = {
+        'strategy': 'uncompressed',
+        'original_bytes': len(baseline),
+        'bytes': len(baseline),
+    }
+    if not optimize:
+        report['encode_ms'] = (time.perf_counter() - start) * 1000
+        return baseline, report
+    if optimize == 'fast':
+        buffer = io.BytesIO()
+        img.save(buffer, 'PNG', compress_level=1)
+        report.update({
+            'strategy': 'rgba/adaptive/default/L1',
+            'bytes': buffer.tell(),
+            'encode_ms': (time.perf_counter() - start) * 1000,
+        })
+        return buffer.getvalue(), report
+
+    candidates = []
+    for level in PNG_COMPRESS_LEVELS:
+        for name, strategy in PNG_ZLIB_STRATEGIES.items():
+            buffer = io.BytesIO()
+            img.save(buffer, 'PNG', compress_level=level, compress_type=strategy)
+            candidates.append((f'rgba/adaptive/{name}/L{level}', buffer.getvalue()))
+            candidates.append((f'rgba/none/{name}/L{level}',
+                               _encode_png_unfiltered(img, level, strategy)))
+
+    palette_img = _to_exact_palette(img)
+    if palette_img is not None:
+        for level in PNG_COMPRESS_LEVELS:
+            buffer = io.BytesIO()
+            palette_img.save(buffer, 'PNG', compress_level=level)
+            candidates.append((f'palette/L{level}', buffer.getvalue()))
+
+    best_name, best_bytes = 'uncompressed', baseline
+    expected = img.tobytes()
+    for name, data in sorted(candidates, key=lambda item: len(item[1])):
+        if len(data) >= len(best_bytes):
+            break
+        # 校验解码后像素与原图完全一致，确保无损
+        with Image.open(io.BytesIO(data)) as decoded:
+            if decoded.convert('RGBA').tobytes() == expected:
+                best_name, best_bytes = name, data
+                break
+
+    report.update({
+        'strategy': best_name,
+        'bytes': len(best_bytes),
+        'encode_ms': (time.perf_counter() - start) * 1000,
+    })
+    return best_bytes, report
+
+
+def encode_alt_format(img, fmt):
+    """用 ALT_FORMATS 中的参数编码为 WebP / AVIF
+
+    当前 Pillow 不支持该格式，或解码后像素与原图不一致（非无损）时返回 None。
+    """
+    if not features.check(fmt):
+        return None
+
+    buffer = io.BytesIO()
+    img.save(buffer, fmt.upper(), **ALT_FORMATS[fmt])
+    data = buffer.getvalue()
+    with Image.open(io.BytesIO(data)) as decoded:
+        if decoded.convert('RGBA').tobytes() != img.tobytes():
+            return None
+    return data
+
+
+def _format_path(path, fmt):
+    """同一张雪碧图其他格式的输出路径，如 controls-sprite.webp"""
+    return os.path.splitext(path)[0] + '.' + fmt
+
+
+def collect_icons(icon_config=None):
+    """按 ICONS 配置顺序收集存在的图标文件，返回 [(图标名, 路径)]
+
+    icon_config: 使用的图标分组，默认为 ICONS；自动发现时传入登记表中的分组
+    """
+    all_icons = []
+    for category, icons in (icon_config or ICONS).items():
         for icon in icons:
             icon_path = os.path.join(IMG_DIR, icon)
             if os.path.exists(icon_path):
                 all_icons.append((icon, icon_path))
             else:
                 print(f"⚠️  图标不存在: {icon}")
+    return all_icons
 
-    if not all_icons:
-        print("❌ 没有找到任何图标文件")
+
+def _file_sha256(path):
+    """计算文件内容的 SHA-256（只读字节，不解码图片）"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def parse_icon_name(icon_name):
+    """按文件名约定解析图标，返回 (分组, 状态, 主题)
+
+    例如 mute_on_hover_dark.png -> ('mute_on', 'hover', 'dark')，
+    play_Default.png -> ('play', 'default', 'light')
+    """
+    stem = os.path.splitext(icon_name)[0]
+    theme = 'light'
+    if stem.endswith('_dark'):
+        stem, theme = stem[:-len('_dark')], 'dark'
+    state = 'default'
+    for suffix in ICON_STATES + ('Default',):
+        if stem.endswith('_' + suffix):
+            stem, state = stem[:-len(suffix) - 1], suffix.lower()
+            break
+    return stem, state, theme
+
+
+def discover_icons(directory=IMG_DIR):
+    """扫描图标目录，按文件名约定分组
+
+    返回值：
+        dict: {分组: {状态: {主题: 文件名}}}，按名称排序
+    """
+    groups = {}
+    with os.scandir(directory) as entries:
+        names = sorted(entry.name for entry in entries
+                       if entry.is_file() and entry.name.lower().endswith('.png'))
+    for icon_name in names:
+        group, state, theme = parse_icon_name(icon_name)
+        groups.setdefault(group, {}).setdefault(state, {})[theme] = icon_name
+    return groups
+
+
+def icon_drift(groups, manual=None):
+    """对比自动发现的图标与手写的 ICONS 配置
+
+    返回值：
+        dict: 'unregistered' 目录中有但 ICONS 未列出的图标（会被自动追加），
+              'missing' ICONS 列出但目录中不存在的图标，
+              'unpaired' 缺少浅色或深色对应图标的图标
+    """
+    manual = manual or ICONS
+    found = {name for states in groups.values()
+             for themes in states.values() for name in themes.values()}
+    listed = [name for icons in manual.values() for name in icons]
+    listed_set = set(listed)
+    return {
+        'unregistered': sorted(found - listed_set),
+        'missing': [name for name in listed if name not in found],
+        'unpaired': sorted(name for states in groups.values()
+                           for themes in states.values() if len(themes) == 1
+                           for name in themes.values()),
+    }
+
+
+def _merge_icon_config(groups, manual=None):
+    """ICONS 中的分组保持原有顺序，新发现的图标按分组追加在末尾"""
+    manual = manual or ICONS
+    config = {category: list(icons) for category, icons in manual.items()}
+    listed = {name for icons in manual.values() for name in icons}
+    for group, states in groups.items():
+        new_icons = [name for themes in states.values() for name in themes.values()
+                     if name not in listed]
+        if not new_icons:
+            continue
+        # 与已有类别同名时另起一个类别，保证已有图标的位置不变
+        category = group if group not in config else f'{group}_auto'
+        # 同一分组内：先浅色后深色，各主题内按状态顺序
+        order = {state: i for i, state in enumerate(('default',) + ICON_STATES)}
+        config[category] = sorted(new_icons, key=lambda name: (
+            parse_icon_name(name)[2] == 'dark',
+            order.get(parse_icon_name(name)[1], len(order)), name))
+    return config
+
+
+def _icon_config_hash(manual=None):
+    data = json.dumps(manual or ICONS, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def load_icon_registry(refresh=False):
+    """读取图标登记表，过期时重新扫描目录并写回缓存
+
+    登记表以 ICONS 的哈希和图标目录的修改时间（增删、改名文件时变化）作为
+    有效性依据，未过期时只需 stat 一次目录并读取一个 JSON 文件。
+
+    返回值：
+        dict: 'icons' 为实际使用的图标分组（ICONS + 自动发现），
+              'groups' 为按约定解析的分组，'drift' 见 icon_drift()
+    """
+    source = {
+        'icons_hash': _icon_config_hash(),
+        'dir_mtime_ns': os.stat(IMG_DIR).st_mtime_ns,
+    }
+    if not refresh and os.path.exists(ICON_REGISTRY):
+        try:
+            with open(ICON_REGISTRY, 'r', encoding='utf-8') as f:
+                registry = json.load(f)
+            if (registry.get('version') == ICON_REGISTRY_VERSION
+                    and registry.get('source') == source):
+                return registry
+        except (OSError, ValueError):
+            pass
+
+    groups = discover_icons()
+    registry = {
+        'version': ICON_REGISTRY_VERSION,
+        'source': source,
+        'icons': _merge_icon_config(groups),
+        'groups': groups,
+        'drift': icon_drift(groups),
+    }
+    os.makedirs(os.path.dirname(ICON_REGISTRY), exist_ok=True)
+    _atomic_write(ICON_REGISTRY, json.dumps(registry, indent=2, ensure_ascii=False))
+    return registry
+
+
+def print_icon_drift(drift, verbose=False):
+    """打印自动发现结果与 ICONS 的差异，verbose=False 时每类最多列出 5 个"""
+    labels = {
+        'unregistered': '🆕 未在 ICONS 中列出，已自动追加到雪碧图末尾',
+        'missing': '⚠️  ICONS 中列出但文件不存在',
+        'unpaired': '🌗 缺少浅色/深色对应图标',
+    }
+    for key, label in labels.items():
+        names = drift.get(key, [])
+        if not names:
+            continue
+        shown = names if verbose else names[:5]
+        print(f"{label} ({len(names)}): {', '.join(shown)}"
+              f"{' ...' if len(shown) < len(names) else ''}")
+
+
+def print_registry_report(registry):
+    """打印图标登记表：每个分组的状态与主题，以及与 ICONS 的差异"""
+    print(f"📒 图标登记表: {ICON_REGISTRY}")
+    for group, states in registry['groups'].items():
+        parts = [f"{state}[{'/'.join(sorted(themes))}]" for state, themes in states.items()]
+        print(f"  {group}: {', '.join(parts)}")
+    if any(registry['drift'].values()):
+        print()
+        print_icon_drift(registry['drift'], verbose=True)
+    else:
+        print("\n✅ 目录中的图标与 ICONS 配置一致")
+
+
+def _config_hash(options, icon_config=None):
+    """ICONS 配置与输出参数的哈希，任一变化都会使缓存整体失效"""
+    config = {
+        'version': SPRITE_CACHE_VERSION,
+        'icons': icon_config or ICONS,
+        'options': options,
+    }
+    data = json.dumps(config, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def _load_cache_manifest():
+    """读取增量缓存清单，不存在或损坏时返回 None"""
+    manifest_path = os.path.join(SPRITE_CACHE_DIR, 'manifest.json')
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != SPRITE_CACHE_VERSION:
+        return None
+    return manifest
+
+
+def _cached_output(path):
+    """输出文件在缓存目录中的副本路径"""
+    return os.path.join(SPRITE_CACHE_DIR, os.path.basename(path))
+
+
+def _atomic_write(path, data):
+    """原子写入：先写同目录下的临时文件再替换，开发服务器不会读到写了一半的文件"""
+    tmp_path = os.path.join(os.path.dirname(path) or '.',
+                            f'.{os.path.basename(path)}.{os.getpid()}.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data.encode('utf-8') if isinstance(data, str) else data)
+    os.replace(tmp_path, path)
+
+
+def _atomic_copy(src, dst):
+    """原子复制（保留修改时间），见 _atomic_write()"""
+    tmp_path = os.path.join(os.path.dirname(dst) or '.',
+                            f'.{os.path.basename(dst)}.{os.getpid()}.tmp')
+    shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+def _restore_cached_outputs(outputs):
+    """将缓存的雪碧图 / JSON / CSS 复制回输出目录，缓存不完整时返回 False"""
+    if not all(os.path.exists(_cached_output(path)) for path in outputs):
         return False
 
-    print(f"✅ 找到 {len(all_icons)} 个图标文件")
+    img_dir = os.path.dirname(OUTPUT_SPRITE)
+    os.makedirs(SRC_IMG_DIR, exist_ok=True)
+    for path in outputs:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _atomic_copy(_cached_output(path), path)
+        # 图片目录下的输出同时复制到 src/assets/img，供开发服务器使用
+        if os.path.dirname(path) == img_dir:
+            _atomic_copy(_cached_output(path),
+                         os.path.join(SRC_IMG_DIR, os.path.basename(path)))
+    return True
+
+
+def _save_cache(manifest, outputs):
+    """保存输出文件副本和缓存清单（清单最后写入，保证缓存一致）"""
+    os.makedirs(SPRITE_CACHE_DIR, exist_ok=True)
+    for path in outputs:
+        shutil.copy2(path, _cached_output(path))
+    manifest_path = os.path.join(SPRITE_CACHE_DIR, 'manifest.json')
+    _atomic_write(manifest_path, json.dumps(manifest, indent=2, ensure_ascii=False))
 
+
+def _changed_icons(manifest, config_hash, icon_hashes, icon_sizes, positions,
+                   sprite_size, sheet_paths):
+    """判断能否只重绘变化的图标格子
+
+    仅当配置、布局、图标集合都与缓存一致，且变化图标的新旧尺寸都不超出
+    所在格子时返回变化的图标名列表，否则返回 None（需要全量生成）。
+    """
+    if (manifest is None
+            or manifest.get('config_hash') != config_hash
+            or manifest.get('sprite_size') != list(sprite_size)
+            or manifest.get('positions') != positions
+            or set(manifest.get('icons', {})) != set(icon_hashes)
+            or not all(os.path.exists(_cached_output(path))
+                       for path in sheet_paths)):
+        return None
+
+    changed = [name for name, digest in icon_hashes.items()
+               if manifest['icons'][name] != digest]
+    for name in changed:
+        cell = positions[name]
+        old_size = manifest.get('sizes', {}).get(name, [0, 0])
+        for width, height in (old_size, icon_sizes[name]):
+            if width > cell['width'] or height > cell['height']:
+                return None
+    return changed
+
+
+def layout_grid(all_icons, icon_sizes, icons_per_row=10):
+    """固定网格布局：以第一个图标的尺寸作为格子大小，每行 icons_per_row 个
+
+    返回值：
+        tuple: (positions, (sprite_width, sprite_height))
+    """
     # 获取图标尺寸（假设所有图标尺寸一致或分类一致）
-    first_img = Image.open(all_icons[0][1])
-    icon_width = first_img.width
-    icon_height = first_img.height
-    first_img.close()
+    icon_width, icon_height = icon_sizes[all_icons[0][0]]
 
     print(f"📐 图标尺寸: {icon_width}x{icon_height}px")
 
+    for icon_name, _ in all_icons:
+        width, height = icon_sizes[icon_name]
+        if width > icon_width or height > icon_height:
+            print(f"⚠️  图标超出网格格子: {icon_name} ({width}x{height}px)，"
+                  f"建议使用 --layout maxrects")
+
     # 计算雪碧图尺寸（横向排列，每行10个）
-    icons_per_row = 10
     rows = (len(all_icons) + icons_per_row - 1) // icons_per_row
     sprite_width = icon_width * icons_per_row
     sprite_height = icon_height * rows
@@ -194,93 +643,1054 @@ def generate_sprite():
     print(
         f"📊 雪碧图尺寸: {sprite_width}x{sprite_height}px ({icons_per_row}列 x {rows}行)")
 
-    # 创建雪碧图
-    sprite = Image.new('RGBA', (sprite_width, sprite_height), (0, 0, 0, 0))
+    # 计算位置（CSS 使用负值）
+    positions = {}
+    for idx, (icon_name, _) in enumerate(all_icons):
+        col = idx % icons_per_row
+        row = idx // icons_per_row
+        positions[icon_name] = {
+            'x': -(col * icon_width),
+            'y': -(row * icon_height),
+            'width': icon_width,
+            'height': icon_height
+        }
 
-    # 粘贴图标并记录位置
-    for idx, (icon_name, icon_path) in enumerate(all_icons):
-        img = Image.open(icon_path)
+    return positions, (sprite_width, sprite_height)
 
-        # 确保图像模式为RGBA，保持透明通道
-        if img.mode != 'RGBA':
-            img = img.convert('RGBA')
 
-        # 计算位置
-        col = idx % icons_per_row
-        row = idx // icons_per_row
-        x = col * icon_width
-        y = row * icon_height
+def _maxrects_pack(rects, bin_width, bin_height):
+    """MaxRects 装箱（Bottom-Left 规则）
 
-        # 直接粘贴原始尺寸，不做任何缩放或重采样
-        sprite.paste(img, (x, y), img)
-        img.close()
+    参数：
+        rects: [(key, width, height)]，按放置顺序排列
+        bin_width / bin_height: 箱子尺寸
 
-        # 记录位置（CSS 使用负值）
-        icon_positions[icon_name] = {
-            'x': -x,
-            'y': -y,
-            'width': icon_width,
-            'height': icon_height
+    返回值：
+        dict: {key: (x, y)}，放不下时返回 None
+    """
+    free_rects = [(0, 0, bin_width, bin_height)]
+    placed = {}
+
+    for key, width, height in rects:
+        # 选择放置后底边最低、其次最靠左的空闲位置
+        best = None
+        for fx, fy, fw, fh in free_rects:
+            if width <= fw and height <= fh:
+                score = (fy + height, fx)
+                if best is None or score < best:
+                    best = score
+                    best_pos = (fx, fy)
+        if best is None:
+            return None
+
+        x, y = best_pos
+        placed[key] = best_pos
+
+        # 拆分所有与新矩形相交的空闲矩形
+        split = []
+        for fx, fy, fw, fh in free_rects:
+            if (x >= fx + fw or x + width <= fx or
+                    y >= fy + fh or y + height <= fy):
+                split.append((fx, fy, fw, fh))
+                continue
+            if x > fx:
+                split.append((fx, fy, x - fx, fh))
+            if x + width < fx + fw:
+                split.append((x + width, fy, fx + fw - x - width, fh))
+            if y > fy:
+                split.append((fx, fy, fw, y - fy))
+            if y + height < fy + fh:
+                split.append((fx, y + height, fw, fy + fh - y - height))
+
+        # 去掉被其他空闲矩形完全包含的矩形
+        split = sorted(set(split), key=lambda r: r[2] * r[3])
+        free_rects = []
+        for i, (ax, ay, aw, ah) in enumerate(split):
+            contained = False
+            for bx, by, bw, bh in split[i + 1:]:
+                if (ax >= bx and ay >= by and
+                        ax + aw <= bx + bw and ay + ah <= by + bh):
+                    contained = True
+                    break
+            if not contained:
+                free_rects.append((ax, ay, aw, ah))
+
+    return placed
+
+
+def layout_maxrects(all_icons, icon_sizes, padding=0, extrude=0):
+    """MaxRects 装箱布局：按每个图标的真实尺寸排布，选择面积最小的雪碧图
+
+    参数：
+        padding: 图标之间的透明间距（像素）
+        extrude: 图标四周复制边缘像素的宽度（像素），防止缩放时采样到相邻图标
+
+    返回值：
+        tuple: (positions, (sprite_width, sprite_height))
+    """
+    border = extrude * 2 + padding
+    rects = [(name, icon_sizes[name][0] + border, icon_sizes[name][1] + border)
+             for name, _ in all_icons]
+    # 先放高的、再放宽的，Bottom-Left 规则下更紧凑
+    rects.sort(key=lambda r: (-r[2], -r[1]))
+
+    total_area = sum(w * h for _, w, h in rects)
+    max_width = max(w for _, w, _ in rects)
+    total_height = sum(h for _, _, h in rects)
+    side = int(total_area ** 0.5)
+
+    # 在一组候选宽度中选择面积最小（其次更接近正方形）的结果
+    candidates = {max_width}
+    for step in range(16):
+        candidates.add(max(max_width, int(side * (0.6 + step * 0.1))))
+
+    best = None
+    for bin_width in sorted(candidates):
+        placed = _maxrects_pack(rects, bin_width, total_height)
+        if placed is None:
+            continue
+        # 末尾的间距不计入雪碧图尺寸
+        used_width = max(placed[k][0] + w for k, w, _ in rects) - padding
+        used_height = max(placed[k][1] + h for k, _, h in rects) - padding
+        score = (used_width * used_height, abs(used_width - used_height))
+        if best is None or score < best[0]:
+            best = (score, placed, used_width, used_height)
+
+    _, placed, sprite_width, sprite_height = best
+    print(f"📊 雪碧图尺寸: {sprite_width}x{sprite_height}px "
+          f"(MaxRects, padding={padding}px, extrude={extrude}px)")
+
+    # 按 ICONS 顺序输出位置（CSS 使用负值）
+    positions = {}
+    for icon_name, _ in all_icons:
+        x, y = placed[icon_name]
+        width, height = icon_sizes[icon_name]
+        positions[icon_name] = {
+            'x': -(x + extrude),
+            'y': -(y + extrude),
+            'width': width,
+            'height': height
         }
 
-        print(f"  📍 {icon_name}: ({x}px, {y}px)")
+    return positions, (sprite_width, sprite_height)
+
+
+def print_fill_report(all_icons, icon_sizes, sprite_size, layout):
+    """打印雪碧图填充率，并与固定网格布局的面积对比"""
+    icon_area = sum(w * h for w, h in (icon_sizes[name] for name, _ in all_icons))
+    sprite_area = sprite_size[0] * sprite_size[1]
+    print(f"📈 填充率: {icon_area * 100 / sprite_area:.1f}% "
+          f"(图标 {icon_area}px² / 雪碧图 {sprite_area}px²)")
+
+    if layout != 'grid':
+        # 与能容纳所有图标的固定网格（按最大图标定格子大小）对比
+        cell_width = max(w for w, _ in icon_sizes.values())
+        cell_height = max(h for _, h in icon_sizes.values())
+        rows = (len(all_icons) + 9) // 10
+        grid_area = cell_width * 10 * cell_height * rows
+        print(f"📉 对比网格布局 {cell_width * 10}x{cell_height * rows}px："
+              f"面积减少 {(grid_area - sprite_area) * 100 / grid_area:.1f}%")
+
+
+def parallel_map(func, items, workers=DEFAULT_WORKERS):
+    """用线程池并行执行 func，按 items 的顺序逐个产出结果
+
+    同时在途的任务不超过 workers * 2 个，已产出的结果由调用方及时释放，
+    图标再多峰值内存也只与线程数相关；workers <= 1 时退化为串行执行。
+    """
+    if workers <= 1:
+        yield from map(func, items)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def compute_trim_boxes(all_icons, icon_hashes, cached_trims=None,
+                       workers=DEFAULT_WORKERS):
+    """计算每个图标不透明区域的包围盒 [left, top, right, bottom]
+
+    内容哈希与缓存一致的图标直接复用上次的结果，不再解码；
+    完全透明的图标保留原始尺寸。
+    """
+    cached_trims = cached_trims or {}
+    boxes = {}
+    pending = []
+    for icon_name, icon_path in all_icons:
+        entry = cached_trims.get(icon_name)
+        if entry and entry.get('hash') == icon_hashes[icon_name]:
+            boxes[icon_name] = entry['box']
+        else:
+            pending.append((icon_name, icon_path))
+
+    def trim_box(icon):
+        with Image.open(icon[1]) as img:
+            box = img.convert('RGBA').getchannel('A').getbbox()
+            return list(box) if box else [0, 0, img.width, img.height]
+
+    for (icon_name, _), box in zip(pending, parallel_map(trim_box, pending, workers)):
+        boxes[icon_name] = box
+    return boxes
+
+
+def compute_pixel_hashes(all_icons, icon_hashes, cached_pixels=None,
+                         workers=DEFAULT_WORKERS):
+    """计算每个图标解码后像素（尺寸 + RGBA 数据）的哈希
+
+    文件字节不同但像素相同的图标（如重新导出的 PNG）也会得到相同的哈希；
+    内容哈希与缓存一致的图标直接复用上次的结果，不再解码。
+    """
+    cached_pixels = cached_pixels or {}
+    digests = {}
+    pending = []
+    for icon_name, icon_path in all_icons:
+        entry = cached_pixels.get(icon_name)
+        if entry and entry.get('hash') == icon_hashes[icon_name]:
+            digests[icon_name] = entry['pixels']
+        else:
+            pending.append((icon_name, icon_path))
+
+    def pixel_hash(icon):
+        with Image.open(icon[1]) as img:
+            rgba = img.convert('RGBA')
+            digest = hashlib.sha256(
+                f'{rgba.width}x{rgba.height}:'.encode('ascii') + rgba.tobytes())
+            return digest.hexdigest()
+
+    for (icon_name, _), digest in zip(pending, parallel_map(pixel_hash, pending, workers)):
+        digests[icon_name] = digest
+    return digests
+
+
+def find_duplicates(all_icons, pixel_hashes, icon_sizes):
+    """找出像素完全相同的图标，按 ICONS 顺序以第一个出现的图标为准
+
+    返回值：
+        dict: {重复图标名: 共用位置的图标名}
+    """
+    aliases = {}
+    first_seen = {}
+    for icon_name, _ in all_icons:
+        digest = pixel_hashes[icon_name]
+        if digest in first_seen:
+            aliases[icon_name] = first_seen[digest]
+        else:
+            first_seen[digest] = icon_name
+
+    if aliases:
+        print(f"🔗 像素去重: {len(aliases)} 个图标与其他图标像素完全相同，共用雪碧图位置")
+        for icon_name, target in aliases.items():
+            print(f"  🔗 {icon_name} → {target}")
+        saved = sum(icon_sizes[name][0] * icon_sizes[name][1] * 4 for name in aliases)
+        print(f"📉 去重减少雪碧图像素数据 {saved} 字节")
+    else:
+        print("🔗 像素去重: 没有发现重复图标")
+    return aliases
+
+
+def _extrude_tile(img, extrude=0):
+    """在图标四周复制 extrude 像素宽的边缘，返回带挤出边的图块（extrude 为 0 时返回原图）
+
+    在解码线程中执行，拼图时每个图标只需粘贴一次
+    """
+    if extrude <= 0:
+        return img
+    width, height = img.size
+    e = extrude
+    tile = Image.new('RGBA', (width + e * 2, height + e * 2), (0, 0, 0, 0))
+    # 直接粘贴原始尺寸，不做任何缩放或重采样
+    tile.paste(img, (e, e))
+    strips = [
+        # (源区域, 拉伸后尺寸, 图块中的位置)
+        ((0, 0, width, 1), (width, e), (e, 0)),
+        ((0, height - 1, width, height), (width, e), (e, e + height)),
+        ((0, 0, 1, height), (e, height), (0, e)),
+        ((width - 1, 0, width, height), (e, height), (e + width, e)),
+        ((0, 0, 1, 1), (e, e), (0, 0)),
+        ((width - 1, 0, width, 1), (e, e), (e + width, 0)),
+        ((0, height - 1, 1, height), (e, e), (0, e + height)),
+        ((width - 1, height - 1, width, height), (e, e), (e + width, e + height)),
+    ]
+    for box, size, dest in strips:
+        tile.paste(img.crop(box).resize(size, Image.NEAREST), dest)
+    return tile
+
+
+def _paste_tile(sprite, tile, x, y, extrude=0, overlapping=False):
+    """将 _extrude_tile() 生成的图块拼到雪碧图，(x, y) 为图标（不含挤出边）的位置
+
+    图块互不重叠时直接复制像素（不需要蒙版，结果与图标像素完全一致）；
+    网格布局中有图标超出格子时按顺序做 alpha 合成，透明部分不覆盖相邻图标
+    """
+    dest = (x - extrude, y - extrude)
+    if overlapping:
+        sprite.alpha_composite(tile, dest)
+    else:
+        sprite.paste(tile, dest)
+
+
+def theme_slot(icon_name):
+    """图标所属的主题槽位：xxx_dark.png 与 xxx.png 共用同一位置"""
+    if icon_name.endswith('_dark.png'):
+        return icon_name[:-len('_dark.png')] + '.png'
+    return icon_name
+
+
+def icon_theme(icon_name):
+    """按 _dark 后缀约定判断图标所属主题"""
+    return 'dark' if icon_name.endswith('_dark.png') else 'light'
+
+
+def sprite_sheets(split_themes=False, densities=None):
+    """各张雪碧图的输出路径 {(主题, 密度): 路径}
+
+    不拆分主题时主题为 None；源密度的雪碧图沿用原文件名，
+    其他密度在文件名后追加 @Nx，例如 controls-sprite@1x.png。
+    """
+    themes = {'light': OUTPUT_SPRITE, 'dark': OUTPUT_SPRITE_DARK} if split_themes \
+        else {None: OUTPUT_SPRITE}
+    sheets = {}
+    for theme, path in themes.items():
+        for density in densities or [SOURCE_DENSITY]:
+            if density != SOURCE_DENSITY:
+                path_for_density = path.replace('.png', f'@{density}x.png')
+            else:
+                path_for_density = path
+            sheets[(theme, density)] = path_for_density
+    return sheets
+
+
+def density_alignment(densities):
+    """所有坐标和尺寸需要对齐的像素数，保证缩放到各密度后仍是整数像素"""
+    align = 1
+    for density in densities or []:
+        step = SOURCE_DENSITY // math.gcd(SOURCE_DENSITY, density)
+        align = align * step // math.gcd(align, step)
+    return align
+
+
+def _align_up(value, align):
+    """向上取整到 align 的倍数"""
+    return (value + align - 1) // align * align
+
+
+def _prepare_icon(img, size, trim_box=None):
+    """将解码后的图标转为 RGBA、按需裁剪，并补齐到布局使用的尺寸"""
+    # 转为独立的 RGBA 副本，保持透明通道，并与源文件句柄脱离
+    img = img.convert('RGBA')
+
+    if trim_box is not None:
+        img = img.crop(trim_box)
+
+    if list(img.size) != list(size):
+        # 对齐多出的部分保持透明
+        canvas = Image.new('RGBA', tuple(size), (0, 0, 0, 0))
+        canvas.paste(img, (0, 0))
+        img = canvas
+    return img
+
+
+def sprite_icon_names(discover=True, registry=None):
+    """合并进雪碧图的全部图标文件名（这些图标无需单独部署）
+
+    discover=True 时读取图标登记表（包含自动发现的图标），否则只取 ICONS；
+    registry 为已读取的登记表（见 load_icon_registry()），不传时在这里读取
+    """
+    icon_config = (registry or load_icon_registry())['icons'] if discover else ICONS
+    return {icon for icons in icon_config.values() for icon in icons}
+
+
+def build_sprite(optimize=True, use_cache=True, layout=DEFAULT_LAYOUT,
+                 padding=0, extrude=0, trim=False, dedup=False,
+                 split_themes=False, densities=None, formats=None,
+                 workers=DEFAULT_WORKERS, discover=True, registry=None):
+    """构建雪碧图（只在内存中拼图，不写任何输出文件）
+
+    参数：
+        optimize: 是否对输出 PNG 做无损压缩优化；'fast' 时只做快速压缩（监听模式），
+                  False 时输出无压缩 PNG（调试用）
+        use_cache: 是否使用增量缓存；图标和配置都未变化时直接复用上次的输出，
+                   只有个别图标变化时只重绘对应格子
+        layout: 布局方式，'grid' 为固定 10 列网格（styles.css 中手写的坐标依赖它），
+                'maxrects' 按真实尺寸装箱
+        padding / extrude: 仅 maxrects 布局生效，见 layout_maxrects()
+        trim: 装箱前裁掉图标四周的透明边，仅 maxrects 布局生效；
+              裁剪偏移和原始尺寸写入 JSON，CSS 用 padding 还原原始尺寸
+        dedup: 像素完全相同的图标只保存一份，JSON 和 CSS 中共用同一位置
+        split_themes: 按 _dark 后缀拆分为浅色、深色两张雪碧图，xxx.png 与
+                      xxx_dark.png 在两张图中坐标相同，切换主题只需替换图片 URL
+        densities: 需要输出的像素密度列表，如 [1, 2]；每个图标只解码一次，
+                   低于 SOURCE_DENSITY 的密度逐个图标高质量缩小，等于源密度时直接使用
+                   原图，高于源密度的无法无损生成会被跳过；CSS 使用 image-set()
+        formats: 额外输出的无损格式，如 ['webp', 'avif']；只有比 PNG 更小的格式
+                 才会输出，CSS 按体积从小到大用 image-set() type() 排列，PNG 兜底
+        workers: 并行解码图标的线程数，1 为串行；拼图始终按固定顺序在主线程进行，
+                 输出与串行完全一致，因此不影响缓存
+        discover: 按文件名约定自动发现 ICONS 中未列出的图标并追加到末尾；
+                  False 时只使用 ICONS
+        registry: 已读取的图标登记表（见 load_icon_registry()），调用方同时需要图标列表时
+                  传入，同一次构建只读取一次；不传时在这里读取
+
+    返回值：
+        dict: 交给 write_sprite() 写出的构建结果，没有找到任何图标时返回 None。
+              其中 'icons' 为参与合并的全部图标名，'positions' 为每个图标的位置，
+              'sprites' 为 {(主题, 密度): 雪碧图 Image}；缓存完全命中时 'cached'
+              为 True，此时不解码任何图片，'sprites' 为 None
+    """
+    print("🎨 开始生成雪碧图...")
+
+    if trim and layout != 'maxrects':
+        print("⚠️  裁剪透明边仅在 maxrects 布局下生效，已忽略")
+        trim = False
+
+    # 收集所有图标文件（ICONS + 自动发现的图标）
+    icon_config = ICONS
+    if discover:
+        registry = registry or load_icon_registry()
+        icon_config = registry['icons']
+        print_icon_drift(registry['drift'])
+    all_icons = collect_icons(icon_config)
+
+    if not all_icons:
+        print("❌ 没有找到任何图标文件")
+        return None
+
+    print(f"✅ 找到 {len(all_icons)} 个图标文件")
+
+    if densities:
+        skipped = [d for d in densities if d > SOURCE_DENSITY]
+        if skipped:
+            print(f"⚠️  源图标为 @{SOURCE_DENSITY}x，无法无损生成 "
+                  f"{', '.join(f'@{d}x' for d in skipped)}，已跳过")
+        densities = sorted({d for d in densities if 0 < d <= SOURCE_DENSITY})
+    align = density_alignment(densities)
+    if align > 1:
+        # 间距和挤出宽度也要对齐，保证缩放后坐标仍是整数像素
+        padding = _align_up(padding, align)
+        extrude = _align_up(extrude, align)
+
+    formats = [fmt for fmt in formats or [] if fmt in ALT_FORMATS]
+    sheets = sprite_sheets(split_themes, densities)
+
+    # 按内容哈希检查增量缓存（只读文件字节，不解码图片）
+    icon_hashes = {name: _file_sha256(path) for name, path in all_icons}
+    # 编码方式不影响像素，不计入配置哈希：切换压缩级别时仍可在缓存的雪碧图上增量重绘
+    config_hash = _config_hash({
+        'layout': [layout, padding, extrude],
+        'trim': trim,
+        'dedup': dedup,
+        'split_themes': split_themes,
+        'densities': densities,
+        'formats': formats,
+    }, icon_config)
+    build = {
+        'icons': {icon for icons in icon_config.values() for icon in icons},
+        'icon_config': icon_config,
+        'sheets': sheets,
+        'optimize': optimize,
+        'use_cache': use_cache,
+        'densities': densities,
+        'formats': formats,
+        'cached': False,
+    }
+    manifest = _load_cache_manifest() if use_cache else None
+    if (manifest is not None
+            and manifest.get('config_hash') == config_hash
+            and manifest.get('optimize') == optimize
+            and manifest.get('icons') == icon_hashes
+            and all(os.path.exists(_cached_output(path))
+                    for path in manifest.get('outputs', []))):
+        print("♻️  图标与配置均未变化，将复用缓存的雪碧图、JSON 和 CSS")
+        build.update({
+            'cached': True,
+            'positions': manifest['positions'],
+            'sprites': None,
+            'sprite_size': manifest['sprite_size'],
+            'manifest': manifest,
+        })
+        return build
+
+    # 读取图标尺寸（只解析文件头，不解码像素）
+    icon_sizes = {}
+    for icon_name, icon_path in all_icons:
+        with Image.open(icon_path) as img:
+            icon_sizes[icon_name] = list(img.size)
+    icon_paths = dict(all_icons)
+
+    # 划分槽位：每个槽位占雪碧图中的一个位置；拆分主题时浅色和深色图标共用槽位
+    slots = {}
+    for icon_name, _ in all_icons:
+        if split_themes:
+            slots.setdefault(theme_slot(icon_name), {})[icon_theme(icon_name)] = icon_name
+        else:
+            slots[icon_name] = {None: icon_name}
+    slot_of = {name: key for key, members in slots.items() for name in members.values()}
+    if split_themes:
+        print(f"🌗 拆分主题: {len(slots)} 个槽位，浅色、深色雪碧图坐标一致")
+
+    # 裁剪透明边：布局使用裁剪后的尺寸
+    trim_boxes = None
+    if trim:
+        trim_boxes = compute_trim_boxes(
+            all_icons, icon_hashes,
+            manifest.get('trims') if manifest is not None else None, workers)
+        # 同一槽位使用合并后的包围盒，保证两个主题的偏移一致；多密度时向外对齐
+        for members in slots.values():
+            boxes = [trim_boxes[name] for name in members.values()]
+            union = [min(b[0] for b in boxes) // align * align,
+                     min(b[1] for b in boxes) // align * align,
+                     _align_up(max(b[2] for b in boxes), align),
+                     _align_up(max(b[3] for b in boxes), align)]
+            for name in members.values():
+                trim_boxes[name] = union
+        source_sizes = icon_sizes
+        icon_sizes = {name: [box[2] - box[0], box[3] - box[1]]
+                      for name, box in trim_boxes.items()}
+        source_area = sum(w * h for w, h in source_sizes.values())
+        trimmed_area = sum(w * h for w, h in icon_sizes.values())
+        print(f"✂️  裁剪透明边: 图标面积 {source_area}px² → {trimmed_area}px² "
+              f"(减少 {(source_area - trimmed_area) * 100 / source_area:.1f}%)")
+
+    if align > 1:
+        icon_sizes = {name: [_align_up(w, align), _align_up(h, align)]
+                      for name, (w, h) in icon_sizes.items()}
+
+    # 槽位尺寸取其中最大的图标
+    slot_sizes = {key: [max(icon_sizes[name][0] for name in members.values()),
+                        max(icon_sizes[name][1] for name in members.values())]
+                  for key, members in slots.items()}
+    slot_list = [(key, None) for key in slots]
+
+    # 像素去重：只有不重复的槽位参与布局
+    slot_aliases = {}
+    pixel_hashes = None
+    if dedup:
+        pixel_hashes = compute_pixel_hashes(
+            all_icons, icon_hashes,
+            manifest.get('pixels') if manifest is not None else None, workers)
+        slot_hashes = {}
+        for key, members in slots.items():
+            signature = json.dumps(sorted(
+                (str(theme), pixel_hashes[name]) for theme, name in members.items()))
+            slot_hashes[key] = hashlib.sha256(signature.encode('utf-8')).hexdigest()
+        slot_aliases = find_duplicates(slot_list, slot_hashes, slot_sizes)
+    unique_slots = [(key, None) for key in slots if key not in slot_aliases]
+
+    # 计算布局
+    if layout == 'maxrects':
+        slot_positions, sprite_size = layout_maxrects(
+            unique_slots, slot_sizes, padding=padding, extrude=extrude)
+    else:
+        slot_positions, sprite_size = layout_grid(unique_slots, slot_sizes)
+        extrude = 0
+    sprite_width, sprite_height = sprite_size
+    print_fill_report(unique_slots, slot_sizes, sprite_size, layout)
+
+    # 每个图标的位置取自所在槽位（重复槽位指向共用的位置，按 ICONS 顺序输出）
+    icon_positions = {}
+    for icon_name, _ in all_icons:
+        key = slot_of[icon_name]
+        target = slot_aliases.get(key, key)
+        pos = dict(slot_positions[target])
+        if layout == 'maxrects':
+            pos['width'], pos['height'] = icon_sizes[icon_name]
+        if target != key:
+            theme = icon_theme(icon_name) if split_themes else None
+            pos['alias_of'] = slots[target][theme]
+        if split_themes:
+            pos['sheet'] = os.path.basename(
+                sheets[(icon_theme(icon_name), SOURCE_DENSITY)])
+        icon_positions[icon_name] = pos
+
+    # 记录裁剪偏移和原始尺寸
+    if trim_boxes is not None:
+        for icon_name, pos in icon_positions.items():
+            box = trim_boxes[icon_name]
+            pos['offset_x'] = box[0]
+            pos['offset_y'] = box[1]
+            pos['source_width'] = source_sizes[icon_name][0]
+            pos['source_height'] = source_sizes[icon_name][1]
+
+    changed = _changed_icons(manifest, config_hash, icon_hashes, icon_sizes,
+                             icon_positions, (sprite_width, sprite_height),
+                             list(sheets.values()))
+    if changed is not None:
+        # 增量模式：在上次的雪碧图上只重绘变化的槽位
+        if changed:
+            print(f"♻️  {len(changed)} 个图标有变化，只重绘对应格子")
+        else:
+            print("♻️  图标未变化，只重新编码")
+        sprites = {}
+        for sheet, path in sheets.items():
+            with Image.open(_cached_output(path)) as cached:
+                sprites[sheet] = cached.convert('RGBA')
+        changed_slots = {slot_of[name] for name in changed}
+        draw_slots = [key for key, _ in unique_slots if key in changed_slots]
+    else:
+        # 创建雪碧图（每个密度按比例缩放尺寸）
+        sprites = {}
+        for theme, density in sheets:
+            size = (sprite_width * density // SOURCE_DENSITY,
+                    sprite_height * density // SOURCE_DENSITY)
+            sprites[(theme, density)] = Image.new('RGBA', size, (0, 0, 0, 0))
+        draw_slots = [key for key, _ in unique_slots]
+
+    # 解码图标：每个图标只解码一次，各主题、各密度共用；
+    # 解码、转换、裁剪和缩放在线程池中并行，结果按槽位顺序返回
+    def decode_slot(key):
+        members = slots[key]
+        decoded = {}
+        scaled = {}
+        for theme, density in sprites:
+            # 某个主题缺少该图标时用另一主题的图标补位，避免切换主题后图标消失
+            icon_name = members.get(theme) or next(iter(members.values()))
+            if icon_name not in decoded:
+                with Image.open(icon_paths[icon_name]) as img:
+                    decoded[icon_name] = _prepare_icon(
+                        img, icon_sizes[icon_name],
+                        trim_boxes[icon_name] if trim_boxes is not None else None)
+            img = decoded[icon_name]
+            if density != SOURCE_DENSITY:
+                # 低密度：单独缩小每个图标，避免相邻图标互相渗色
+                img = img.resize((img.width * density // SOURCE_DENSITY,
+                                  img.height * density // SOURCE_DENSITY),
+                                 Image.LANCZOS)
+            # 挤出边缘也在这里生成，拼图时每个图标只粘贴一次
+            scaled[(theme, density)] = _extrude_tile(img, extrude * density // SOURCE_DENSITY)
+        return scaled
+
+    # 图标的实际尺寸超出布局中的格子时（网格布局）相邻图块会重叠
+    overlapping = any(slot_sizes[key][0] > slot_positions[key]['width']
+                      or slot_sizes[key][1] > slot_positions[key]['height']
+                      for key, _ in unique_slots)
+
+    # 粘贴图标：在主线程按固定顺序拼图，结果与串行完全一致
+    for key, scaled in zip(draw_slots, parallel_map(decode_slot, draw_slots, workers)):
+        slot_pos = slot_positions[key]
+        x, y = -slot_pos['x'], -slot_pos['y']
+
+        for (theme, density), sprite in sprites.items():
+            def scale(value):
+                return value * density // SOURCE_DENSITY
+
+            if changed is not None:
+                # 先清空旧格子（含挤出边缘），保证结果与全量生成一致
+                sprite.paste((0, 0, 0, 0),
+                             (scale(x - extrude), scale(y - extrude),
+                              scale(x + slot_pos['width'] + extrude),
+                              scale(y + slot_pos['height'] + extrude)))
+
+            _paste_tile(sprite, scaled[(theme, density)], scale(x), scale(y), scale(extrude), overlapping)
+
+        for img in {id(img): img for img in scaled.values()}.values():
+            img.close()
+
+        print(f"  📍 {key}: ({x}px, {y}px)")
+
+    build.update({
+        'positions': icon_positions,
+        'sprites': sprites,
+        'sprite_size': [sprite_width, sprite_height],
+        'manifest': {
+            'version': SPRITE_CACHE_VERSION,
+            'config_hash': config_hash,
+            'optimize': optimize,
+            'icons': icon_hashes,
+            'sizes': icon_sizes,
+            'positions': icon_positions,
+            'sprite_size': [sprite_width, sprite_height],
+            'trims': {name: {'hash': icon_hashes[name], 'box': box}
+                      for name, box in (trim_boxes or {}).items()},
+            'pixels': {name: {'hash': icon_hashes[name], 'pixels': digest}
+                       for name, digest in (pixel_hashes or {}).items()},
+        },
+    })
+    return build
+
+
+def write_sprite(build):
+    """写出 build_sprite() 的结果：编码雪碧图、生成 CSS 和 JSON，并更新增量缓存
+
+    缓存完全命中时直接把缓存的输出复制回 docs 和 src/assets/img。
+    """
+    if build['cached']:
+        _restore_cached_outputs(build['manifest']['outputs'])
+        remove_stale_outputs(build['manifest']['outputs'])
+        print("♻️  已复用缓存的雪碧图、JSON 和 CSS")
+        return
+
+    sheets = build['sheets']
+    sprites = build['sprites']
+    formats = build['formats']
+    icon_positions = build['positions']
+    sprite_width, sprite_height = build['sprite_size']
 
     # 确保输出目录存在
     output_dir = os.path.dirname(OUTPUT_SPRITE)
     if not os.path.exists(output_dir):
         os.makedirs(output_dir, exist_ok=True)
-    
-    # 保存雪碧图（不压缩，保持最高质量）
-    sprite.save(OUTPUT_SPRITE, 'PNG', compress_level=0)
-    print(f"✅ 雪碧图已保存: {OUTPUT_SPRITE}")
-
-    # 同时复制到 src/assets/img 目录，因为开发服务器用的也是雪碧图，不是原始图标
-    src_img_dir = 'src/assets/img'
-    if not os.path.exists(src_img_dir):
-        os.makedirs(src_img_dir, exist_ok=True)
-    
-    src_sprite_path = os.path.join(src_img_dir, os.path.basename(OUTPUT_SPRITE))
-    shutil.copy2(OUTPUT_SPRITE, src_sprite_path)
-    print(f"✅ 雪碧图已复制到: {src_sprite_path}")
+    if not os.path.exists(SRC_IMG_DIR):
+        os.makedirs(SRC_IMG_DIR, exist_ok=True)
+
+    outputs = []
+    variants = {}
+    for sheet, path in sheets.items():
+        # 保存雪碧图（默认无损压缩优化，像素与原图完全一致）
+        png_bytes, report = encode_png(sprites[sheet], optimize=build['optimize'])
+        _atomic_write(path, png_bytes)
+        print(f"✅ 雪碧图已保存: {path}")
+        saved = report['original_bytes'] - report['bytes']
+        print(f"🗜️  编码策略: {report['strategy']}，"
+              f"{report['original_bytes']} → {report['bytes']} 字节，"
+              f"节省 {saved} 字节 ({saved * 100 / report['original_bytes']:.1f}%)，"
+              f"耗时 {report['encode_ms']:.0f}ms")
+        written = [path]
+        variants[sheet] = [('png', path, len(png_bytes))]
+
+        # 其他无损格式：只保留比 PNG 更小的
+        for fmt in formats:
+            alt_path = _format_path(path, fmt)
+            data = encode_alt_format(sprites[sheet], fmt)
+            if data is None:
+                print(f"⚠️  {fmt.upper()}: 当前 Pillow 不支持或无法无损编码，已跳过")
+            elif len(data) >= len(png_bytes):
+                print(f"⚠️  {fmt.upper()}: {len(data)} 字节，不小于 PNG，已跳过")
+            else:
+                _atomic_write(alt_path, data)
+                print(f"✅ 雪碧图已保存: {alt_path}")
+                written.append(alt_path)
+                variants[sheet].append((fmt, alt_path, len(data)))
+        variants[sheet].sort(key=lambda variant: (variant[0] == 'png', variant[2]))
+
+        # 同时复制到 src/assets/img 目录，因为开发服务器用的也是雪碧图，不是原始图标
+        for written_path in written:
+            src_sprite_path = os.path.join(SRC_IMG_DIR, os.path.basename(written_path))
+            _atomic_copy(written_path, src_sprite_path)
+            print(f"✅ 雪碧图已复制到: {src_sprite_path}")
+        outputs.extend(written)
+
+    if formats:
+        print_format_report(variants)
 
     # 生成CSS
-    generate_css(icon_positions, icon_width, icon_height)
+    generate_css(icon_positions, sheets, densities=build['densities'],
+                 sprite_size=(sprite_width, sprite_height), variants=variants,
+                 icon_config=build['icon_config'])
+    outputs.extend([OUTPUT_JSON, OUTPUT_CSS])
 
     # 保存位置信息为JSON（方便调试）
-    json_path = OUTPUT_SPRITE.replace('.png', '.json')
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(icon_positions, f, indent=2, ensure_ascii=False)
-    print(f"✅ 位置信息已保存: {json_path}")
-    
+    _atomic_write(OUTPUT_JSON, json.dumps(icon_positions, indent=2, ensure_ascii=False))
+    print(f"✅ 位置信息已保存: {OUTPUT_JSON}")
+
     # 同时复制JSON文件到 src/assets/img 目录，因为开发服务器用的也是雪碧图，不是原始图标
-    src_json_path = os.path.join(src_img_dir, os.path.basename(json_path))
-    shutil.copy2(json_path, src_json_path)
+    src_json_path = os.path.join(SRC_IMG_DIR, os.path.basename(OUTPUT_JSON))
+    _atomic_copy(OUTPUT_JSON, src_json_path)
     print(f"✅ 位置信息已复制到: {src_json_path}")
 
+    # 清理上次构建遗留、本次不再生成的文件，避免 CSS 之外的引用拿到旧图
+    remove_stale_outputs(outputs)
+
+    # 更新增量缓存
+    if build['use_cache']:
+        _save_cache(dict(build['manifest'], outputs=outputs), outputs)
+
+
+def _possible_outputs():
+    """所有配置组合下可能生成的输出文件（任意主题、密度、格式，以及 JSON 和 CSS）"""
+    paths = {OUTPUT_JSON, OUTPUT_CSS}
+    all_densities = range(1, SOURCE_DENSITY + 1)
+    for path in sprite_sheets(split_themes=True, densities=all_densities).values():
+        paths.add(path)
+        paths.update(_format_path(path, fmt) for fmt in ALT_FORMATS)
+    return paths
+
+
+def remove_stale_outputs(outputs):
+    """删除本次构建没有生成的输出文件
+
+    关闭主题拆分、某个密度或 WebP / AVIF 后，上次生成的雪碧图（含 src/assets/img 中的
+    开发副本）不会再被覆盖，不删除的话会被继续复制和发布。
+    """
+    current = {os.path.normpath(path) for path in outputs}
+    img_dir = os.path.dirname(OUTPUT_SPRITE)
+    for path in sorted(_possible_outputs()):
+        if os.path.normpath(path) in current:
+            continue
+        stale = [path]
+        # 图片目录下的输出在 src/assets/img 中还有开发副本
+        if os.path.dirname(path) == img_dir:
+            stale.append(os.path.join(SRC_IMG_DIR, os.path.basename(path)))
+        for stale_path in stale:
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+                print(f"🧹 已删除不再生成的文件: {stale_path}")
+
+
+def generate_sprite(**options):
+    """生成雪碧图并写出所有输出文件，参数同 build_sprite()
+
+    返回值：
+        bool: 是否生成成功
+    """
+    build = build_sprite(**options)
+    if build is None:
+        return False
+    write_sprite(build)
     return True
 
 
-def generate_css(positions, width, height):
-    """生成CSS代码"""
+def _open_inotify_watcher(directory):
+    """用 inotify 监听目录（仅 Linux），返回 wait(timeout) -> 变化的文件名集合
+
+    不支持时抛出 OSError，由调用方退回轮询。
+    """
+    if not sys.platform.startswith('linux'):
+        raise OSError('inotify 仅支持 Linux')
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), 'inotify_init1 失败')
+    # IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE：
+    # 只关心写完的文件，编辑器"写临时文件再改名"的保存方式由 MOVED_TO 覆盖
+    mask = 0x008 | 0x040 | 0x080 | 0x200
+    if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+        os.close(fd)
+        raise OSError(ctypes.get_errno(), f'无法监听目录: {directory}')
+
+    def wait(timeout):
+        readable, _, _ = select.select([fd], [], [], timeout)
+        names = set()
+        if not readable:
+            return names
+        data = os.read(fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = struct.unpack_from('iIII', data, offset)
+            offset += 16
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if name:
+                names.add(os.fsdecode(name))
+        return names
+
+    return wait
+
+
+def _open_polling_watcher(directory, interval=WATCH_POLL_INTERVAL):
+    """按修改时间和大小轮询目录，返回 wait(timeout) -> 变化的文件名集合"""
+    def snapshot():
+        with os.scandir(directory) as entries:
+            return {entry.name: (entry.stat().st_mtime_ns, entry.stat().st_size)
+                    for entry in entries if entry.is_file()}
+
+    state = {'files': snapshot()}
+
+    def wait(timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = interval if deadline is None else deadline - time.monotonic()
+            time.sleep(max(0, min(interval, remaining)))
+            files = snapshot()
+            previous = state['files']
+            state['files'] = files
+            names = {name for name in files.keys() | previous.keys()
+                     if files.get(name) != previous.get(name)}
+            if names or (deadline is not None and time.monotonic() >= deadline):
+                return names
+
+    return wait
+
+
+def watch_sprite(debounce=WATCH_DEBOUNCE, settle=WATCH_SETTLE, **options):
+    """监听图标目录，图标变化时增量重建雪碧图，直到 Ctrl+C 退出
+
+    连续的文件事件静默 debounce 秒后才开始重建；重建时只重绘变化的格子，
+    并用快速压缩尽快写出结果，空闲 settle 秒后再补做一次完整的压缩优化。
+    参数 options 同 build_sprite()。
+    """
+    optimize = options.pop('optimize', True)
+    quick = 'fast' if optimize else optimize
+
+    def rebuild(level, registry=None):
+        start = time.perf_counter()
+        try:
+            success = generate_sprite(optimize=level, registry=registry, **options)
+        except Exception as e:
+            # 文件可能还没写完或已被删除，等下一次事件再重建
+            print(f"❌ 重建失败: {e}")
+            return False
+        if success:
+            print(f"⚡ 重建完成，耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        return success
+
+    rebuild(optimize)
+    try:
+        wait = _open_inotify_watcher(IMG_DIR)
+        print(f"👀 正在监听 {IMG_DIR}（inotify），按 Ctrl+C 退出")
+    except (OSError, AttributeError) as e:
+        wait = _open_polling_watcher(IMG_DIR)
+        print(f"👀 正在监听 {IMG_DIR}（轮询，{e}），按 Ctrl+C 退出")
+
+    unsettled = False
+    try:
+        while True:
+            names = wait(settle if unsettled else None)
+            if not names:
+                # 空闲了一段时间：补做完整压缩优化（图标未变，只重新编码）
+                if unsettled:
+                    print("\n🗜️  空闲中，补做完整压缩优化...")
+                    rebuild(optimize)
+                    unsettled = False
+                continue
+
+            # 防抖：合并一连串的文件事件
+            while True:
+                more = wait(debounce)
+                if not more:
+                    break
+                names |= more
+            icons = sorted(name for name in names if name.lower().endswith('.png'))
+            if not icons:
+                continue
+            print(f"\n🔄 检测到 {len(icons)} 个图标变化: {', '.join(icons[:5])}"
+                  f"{' ...' if len(icons) > 5 else ''}")
+            # 图标登记表每次重建只读取一次，检查未配置的图标和重建共用
+            registry = load_icon_registry() if options.get('discover', True) else None
+            configured = sprite_icon_names(options.get('discover', True), registry)
+            unused = [name for name in icons if name not in configured]
+            if unused:
+                print(f"⚠️  未在 ICONS 中配置，不会进入雪碧图: {', '.join(unused[:5])}"
+                      f"{' ...' if len(unused) > 5 else ''}")
+            rebuild(quick, registry)
+            unsettled = quick != optimize
+    except KeyboardInterrupt:
+        print("\n👋 已停止监听")
+
+
+def format_size_table(variants):
+    """各张雪碧图不同格式的体积对比表（文本行）"""
+    lines = []
+    for sheet_variants in variants.values():
+        png_size = next(size for fmt, _, size in sheet_variants if fmt == 'png')
+        for fmt, path, size in sheet_variants:
+            change = (size - png_size) * 100 / png_size
+            lines.append(f"{os.path.basename(path):<36} {fmt.upper():<5} "
+                         f"{size:>9} B  {change:+6.1f}%")
+    return lines
+
+
+def print_format_report(variants):
+    """打印各格式体积对比"""
+    print("\n📦 雪碧图格式体积对比（相对 PNG）:")
+    for line in format_size_table(variants):
+        print(f"  {line}")
+
+
+def _background_image_lines(sheets, theme, densities, variants=None):
+    """某个主题的 background-image 声明
+
+    多密度时用 image-set() 让设备只下载所需密度；有 WebP / AVIF 时
+    按体积从小到大加上 type()，浏览器选择第一个支持的格式，PNG 兜底。
+    """
+    def url(path):
+        return f"url('../img/{os.path.basename(path)}')"
+
+    default = url(sheets[(theme, SOURCE_DENSITY)])
+    lines = [f"  background-image: {default};"]
+    typed = variants is not None and any(
+        len(variants[sheet]) > 1 for sheet in sheets if sheet[0] == theme)
+    if densities:
+        candidates = ', '.join(
+            f"{url(sheets[(theme, density)])} {density}x"
+            for density in densities)
+        lines.append(f"  background-image: -webkit-image-set({candidates});")
+        if not typed:
+            lines.append(f"  background-image: image-set({candidates});")
+    if typed:
+        candidates = []
+        for density in densities or [SOURCE_DENSITY]:
+            for fmt, path, _ in variants[(theme, density)]:
+                candidate = f"{url(path)} type('image/{fmt}')"
+                if densities:
+                    candidate += f" {density}x"
+                candidates.append(candidate)
+        lines.append(f"  background-image: image-set({', '.join(candidates)});")
+    return lines
+
+
+def _css_px(value, densities):
+    """源像素换算为 CSS 像素：多密度模式下按 SOURCE_DENSITY 缩小"""
+    if densities:
+        value = value / SOURCE_DENSITY
+        if value == int(value):
+            value = int(value)
+    return f"{value}px"
+
+
+def generate_css(positions, sheets=None, densities=None, sprite_size=None,
+                 variants=None, icon_config=None):
+    """生成CSS代码
+
+    参数：
+        positions: 每个图标的位置信息（源像素）
+        sheets: sprite_sheets() 返回的雪碧图路径；拆分主题时深色主题下
+                切换到深色雪碧图，浏览器只会下载当前主题用到的那一张
+        densities: 多密度模式下的密度列表；此时坐标按 CSS 像素输出，
+                   并用 image-set() 和 background-size 适配各密度的雪碧图
+        sprite_size: 源密度雪碧图的尺寸，多密度模式下用于 background-size
+        variants: 每张雪碧图实际输出的格式 {(主题, 密度): [(格式, 路径, 字节数)]}，
+                  按优先顺序排列；包含 WebP / AVIF 时输出带 type() 的 image-set()
+        icon_config: 图标分组（决定 CSS 中的类别顺序），默认为 ICONS
+    """
+    sheets = sheets or sprite_sheets()
+    themes = sorted({theme for theme, _ in sheets}, key=lambda t: t == 'dark')
+    default_theme = themes[0]
+    dark_theme = 'dark' if 'dark' in themes else None
     print("\n🎨 生成CSS代码...")
 
+    def px(value):
+        return _css_px(value, densities)
+
+    # 不写入生成时间：内容不变时输出逐字节一致，不会产生无意义的变更
     css_lines = [
         "/* 自动生成的雪碧图样式 - 请勿手动编辑 */",
-        "/* 生成时间: " +
-        __import__('datetime').datetime.now().strftime(
-            '%Y-%m-%d %H:%M:%S') + " */",
         "",
         "/* 雪碧图基础样式 */",
         ".sprite-icon {",
-        f"  background-image: url('../img/controls-sprite.png');",
+        *_background_image_lines(sheets, default_theme, densities, variants),
         "  background-repeat: no-repeat;",
         "  display: inline-block;",
         "}",
         ""
     ]
 
+    if variants and any(len(v) > 1 for v in variants.values()):
+        # 在文件头部记录各格式体积对比
+        css_lines[2:2] = ["/* 雪碧图格式体积对比（相对 PNG）:"] + [
+            f" * {line}" for line in format_size_table(variants)] + [" */", ""]
+
+    if densities and sprite_size:
+        # 各密度的雪碧图统一按 CSS 像素尺寸显示
+        css_lines[-2:-2] = [
+            f"  background-size: {px(sprite_size[0])} {px(sprite_size[1])};"]
+
+    if dark_theme:
+        # 深色主题只替换图片 URL，坐标与浅色雪碧图一致
+        css_lines.extend([
+            "/* 深色主题雪碧图 */",
+            f"{DARK_THEME_SELECTOR} .sprite-icon {{",
+            *_background_image_lines(sheets, dark_theme, densities, variants),
+            "}",
+            ""
+        ])
+
     # 按类别生成CSS
-    for category, icons in ICONS.items():
+    for category, icons in (icon_config or ICONS).items():
         css_lines.append(f"/* {category.upper()} 图标 */")
 
         for icon_name in icons:
@@ -290,11 +1700,29 @@ def generate_css(positions, width, height):
             pos = positions[icon_name]
             class_name = icon_name.replace('.png', '').replace('_', '-')
 
+            if 'alias_of' in pos:
+                css_lines.append(
+                    f"/* 与 {pos['alias_of']} 像素相同，共用雪碧图位置 */")
             css_lines.append(f".sprite-{class_name} {{")
             css_lines.append(
-                f"  background-position: {pos['x']}px {pos['y']}px;")
-            css_lines.append(f"  width: {pos['width']}px;")
-            css_lines.append(f"  height: {pos['height']}px;")
+                f"  background-position: {px(pos['x'])} {px(pos['y'])};")
+            css_lines.append(f"  width: {px(pos['width'])};")
+            css_lines.append(f"  height: {px(pos['height'])};")
+            if dark_theme and icon_theme(icon_name) == 'dark':
+                css_lines.extend(
+                    _background_image_lines(sheets, dark_theme, densities, variants))
+            if 'offset_x' in pos and (pos['width'], pos['height']) != (
+                    pos['source_width'], pos['source_height']):
+                # 裁剪过的图标：用 padding 补回透明边，背景只绘制在内容区
+                top = pos['offset_y']
+                left = pos['offset_x']
+                right = pos['source_width'] - left - pos['width']
+                bottom = pos['source_height'] - top - pos['height']
+                css_lines.append("  box-sizing: content-box;")
+                css_lines.append(
+                    f"  padding: {px(top)} {px(right)} {px(bottom)} {px(left)};")
+                css_lines.append("  background-origin: content-box;")
+                css_lines.append("  background-clip: content-box;")
             css_lines.append("}")
 
         css_lines.append("")
@@ -321,16 +1749,72 @@ def generate_css(positions, width, height):
     if not os.path.exists(css_output_dir):
         os.makedirs(css_output_dir, exist_ok=True)
 
-    with open(OUTPUT_CSS, 'w', encoding='utf-8') as f:
-        f.write(css_content)
+    _atomic_write(OUTPUT_CSS, css_content)
 
     print(f"✅ CSS已生成: {OUTPUT_CSS}")
     print("\n💡 提示: 请将生成的CSS整合到 styles.css 中")
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='生成控制按钮雪碧图及对应 CSS')
+    parser.add_argument('--debug-uncompressed', action='store_true',
+                        help='输出无压缩 PNG（compress_level=0），便于调试')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='忽略增量缓存，强制全量生成')
+    parser.add_argument('--layout', choices=['grid', 'maxrects'],
+                        default=DEFAULT_LAYOUT,
+                        help='布局方式：grid 固定 10 列网格，maxrects 按真实尺寸装箱')
+    parser.add_argument('--padding', type=int, default=0,
+                        help='maxrects 布局下图标之间的间距（像素）')
+    parser.add_argument('--extrude', type=int, default=0,
+                        help='maxrects 布局下图标边缘挤出宽度（像素）')
+    parser.add_argument('--trim', action='store_true',
+                        help='装箱前裁掉图标四周的透明边（需配合 --layout maxrects）')
+    parser.add_argument('--dedup', action='store_true',
+                        help='像素完全相同的图标共用雪碧图位置')
+    parser.add_argument('--split-themes', action='store_true',
+                        help='按 _dark 后缀拆分为浅色、深色两张坐标一致的雪碧图')
+    parser.add_argument('--densities', default='',
+                        help='输出多个像素密度的雪碧图，如 1,2；CSS 使用 image-set()')
+    parser.add_argument('--formats', default='',
+                        help='额外输出的无损格式，如 webp,avif；比 PNG 小时才会采用')
+    parser.add_argument('--no-discover', action='store_true',
+                        help='只使用 ICONS 中列出的图标，不自动发现目录中的新图标')
+    parser.add_argument('--registry-report', action='store_true',
+                        help='重新扫描图标目录，打印图标登记表及与 ICONS 的差异后退出')
+    parser.add_argument('--watch', action='store_true',
+                        help='监听图标目录，图标变化时自动增量重建（Ctrl+C 退出）')
+    parser.add_argument('--jobs', type=int, default=DEFAULT_WORKERS,
+                        help=f'并行解码图标的线程数，1 为串行（默认 {DEFAULT_WORKERS}）')
+    args = parser.parse_args()
+    if args.trim and args.layout != 'maxrects':
+        parser.error('--trim 需要配合 --layout maxrects 使用')
+    if args.watch and args.no_cache:
+        parser.error('--watch 依赖增量缓存，不能与 --no-cache 同时使用')
+
+    options = dict(optimize=not args.debug_uncompressed,
+                   use_cache=not args.no_cache,
+                   layout=args.layout,
+                   padding=args.padding,
+                   extrude=args.extrude,
+                   trim=args.trim,
+                   dedup=args.dedup,
+                   split_themes=args.split_themes,
+                   densities=[int(d) for d in args.densities.split(',')
+                              if d.strip()] or None,
+                   formats=[f.strip().lower() for f in args.formats.split(',')
+                            if f.strip()],
+                   workers=args.jobs,
+                   discover=not args.no_discover)
+    if args.registry_report:
+        print_registry_report(load_icon_registry(refresh=True))
+        sys.exit(0)
+    if args.watch:
+        watch_sprite(**options)
+        sys.exit(0)
+
     try:
-        success = generate_sprite()
+        success = generate_sprite(**options)
         if success:
             print("\n🎉 雪碧图生成成功！")
             print("\n📝 下一步:")
@@ -0,0 +1,443 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+雪碧图生成器性能基准
+
+功能：
+- 合成 100 / 1000 / 10000 个图标的测试集（尺寸混合、含半透明和透明边、部分像素重复）
+- 逐阶段调用 generate-sprite.py 的函数：发现、解码（含裁剪、去重）、装箱、拼图、编码、CSS 输出，
+  再完整调用一次 build_sprite() 作为对照
+- 记录每个阶段的耗时、阶段内峰值内存（RSS）和产出字节数，结果写入 JSON
+- 可与保存的基线 JSON 对比，列出各阶段的变化
+
+用法：
+    python scripts/bench-sprite.py
+    python scripts/bench-sprite.py --sizes 100,1000 --layout maxrects --trim --dedup
+    python scripts/bench-sprite.py --baseline .cache/bench/baseline.json --threshold 10
+
+每个规模在独立的子进程中运行，峰值内存互不影响；合成的图标缓存在
+.cache/bench/ 下，重复运行时不再重新生成（生成耗时不计入结果）。
+
+阶段内峰值内存：每个阶段开始前把进程的峰值 RSS 重置为当前值（Linux 的
+/proc/self/clear_refs），不支持时阶段内峰值记为 None，只报告整个进程的峰值。
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，峰值内存记为 None
+    resource = None
+
+from PIL import Image, ImageDraw
+import PIL
+
+# 项目根目录
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(PROJECT_ROOT, '.cache', 'bench')
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'sprite-bench.json')
+DEFAULT_SIZES = [100, 1000, 10000]
+
+# 合成图标的尺寸（@2x 源像素），宽高独立随机
+ICON_DIMENSIONS = [16, 24, 32, 48, 64, 80, 96]
+# 与之前某个图标像素完全相同的比例（用于衡量去重）
+DUPLICATE_RATIO = 0.1
+
+# 耗时变化小于该值（毫秒）时不视为退化，避免短阶段的计时抖动误报
+MIN_WALL_DELTA_MS = 5
+
+STAGES = ['discovery', 'decode', 'pack', 'blit', 'encode', 'css']
+# 对照：完整调用 build_sprite()（发现到拼图，不含编码和 CSS），不计入阶段合计
+REFERENCE_STAGE = 'build_sprite'
+
+# 2：峰值内存改为阶段内峰值，并记录整个进程的峰值
+BENCH_FORMAT_VERSION = 2
+
+
+def load_sprite_module():
+    """加载 generate-sprite.py 作为模块（文件名含连字符，不能直接 import）"""
+    module_path = os.path.join(PROJECT_ROOT, 'generate-sprite.py')
+    spec = importlib.util.spec_from_file_location('generate_sprite', module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def reset_peak_rss():
+    """把进程的峰值内存重置为当前内存（Linux 4.0+），返回是否成功"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss_bytes():
+    """当前进程的峰值内存（字节），Linux 上为上次 reset_peak_rss() 之后的峰值"""
+    try:
+        with open('/proc/self/status', 'r', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _draw_icon(rng, width, height):
+    """随机绘制一个图标：透明背景上的若干半透明图形，四周留出随机透明边"""
+    img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    margin_x = rng.randint(0, width // 4)
+    margin_y = rng.randint(0, height // 4)
+    for _ in range(rng.randint(1, 4)):
+        x0 = rng.randint(margin_x, width - margin_x - 1)
+        y0 = rng.randint(margin_y, height - margin_y - 1)
+        x1 = rng.randint(x0, width - margin_x - 1)
+        y1 = rng.randint(y0, height - margin_y - 1)
+        fill = (rng.randrange(256), rng.randrange(256), rng.randrange(256),
+                rng.choice([255, 255, rng.randrange(32, 256)]))
+        if rng.random() < 0.5:
+            draw.ellipse((x0, y0, x1, y1), fill=fill)
+        else:
+            draw.rectangle((x0, y0, x1, y1), fill=fill)
+    return img
+
+
+def synthesize_corpus(count, seed):
+    """生成（或复用缓存的）合成图标集
+
+    返回值：
+        tuple: (目录, 按顺序排列的图标文件名列表)
+    """
+    corpus_dir = os.path.join(BENCH_DIR, f'corpus-{count}-{seed}')
+    names = [f'bench_{i:05d}.png' for i in range(count)]
+    done_marker = os.path.join(corpus_dir, '.complete')
+    if os.path.exists(done_marker):
+        return corpus_dir, names
+
+    print(f"🧪 生成 {count} 个合成图标: {corpus_dir}")
+    os.makedirs(corpus_dir, exist_ok=True)
+    rng = random.Random(f'{seed}:{count}')
+    drawn = []
+    for name in names:
+        if drawn and rng.random() < DUPLICATE_RATIO:
+            # 像素与之前的图标相同（重新编码，文件字节可能不同）
+            img = rng.choice(drawn).copy()
+        else:
+            img = _draw_icon(rng, rng.choice(ICON_DIMENSIONS), rng.choice(ICON_DIMENSIONS))
+            if len(drawn) < 256:
+                drawn.append(img)
+        img.save(os.path.join(corpus_dir, name), 'PNG')
+    with open(done_marker, 'w', encoding='utf-8') as f:
+        f.write('ok\n')
+    return corpus_dir, names
+
+
+def run_stages(corpus_dir, names, options):
+    """在当前进程中逐阶段调用生成器的函数，返回 {阶段: 指标, 'process_peak_rss_bytes': 进程峰值内存}
+
+    生成器自身的打印输出在计时期间被丢弃，避免终端输出影响耗时。
+    """
+    sprite = load_sprite_module()
+    out_dir = tempfile.mkdtemp(prefix='bench-sprite-')
+    sprite.IMG_DIR = corpus_dir
+    sprite.ICONS = {'bench': names}
+    sprite.OUTPUT_CSS = os.path.join(out_dir, 'sprite-generated.css')
+    workers = options['workers']
+    results = {}
+
+    process_peak = 0
+
+    @contextlib.contextmanager
+    def stage(name):
+        nonlocal process_peak
+        metrics = {}
+        resettable = reset_peak_rss()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield metrics
+        metrics['wall_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        peak = peak_rss_bytes()
+        # 不能重置时峰值包含之前的阶段，不作为阶段内峰值
+        metrics['peak_rss_bytes'] = peak if resettable else None
+        process_peak = max(process_peak, peak or 0)
+        results[name] = metrics
+
+    # 发现：按配置收集文件、计算内容哈希、读取尺寸（只解析文件头）
+    with stage('discovery') as metrics:
+        icons = sprite.collect_icons()
+        icon_hashes = {name: sprite._file_sha256(path) for name, path in icons}
+        icon_sizes = {}
+        for name, path in icons:
+            with Image.open(path) as img:
+                icon_sizes[name] = list(img.size)
+        metrics['bytes'] = sum(os.path.getsize(path) for _, path in icons)
+        metrics['icons'] = len(icons)
+        metrics['unique_files'] = len(set(icon_hashes.values()))
+
+    # 解码：按需计算裁剪框和像素哈希（与 build_sprite() 相同的函数），再并行解码不重复的图标
+    with stage('decode') as metrics:
+        trim_boxes = None
+        if options['trim']:
+            trim_boxes = sprite.compute_trim_boxes(icons, icon_hashes, workers=workers)
+            icon_sizes = {name: [box[2] - box[0], box[3] - box[1]]
+                          for name, box in trim_boxes.items()}
+        aliases = {}
+        if options['dedup']:
+            pixel_hashes = sprite.compute_pixel_hashes(icons, icon_hashes, workers=workers)
+            aliases = sprite.find_duplicates(icons, pixel_hashes, icon_sizes)
+        unique = [(name, path) for name, path in icons if name not in aliases]
+
+        def decode(icon):
+            with Image.open(icon[1]) as img:
+                return sprite._prepare_icon(
+                    img, icon_sizes[icon[0]],
+                    trim_boxes[icon[0]] if trim_boxes is not None else None)
+
+        decoded = dict(zip((name for name, _ in unique),
+                           sprite.parallel_map(decode, unique, workers)))
+        metrics['bytes'] = sum(len(img.getbands()) * img.width * img.height
+                               for img in decoded.values())
+        metrics['duplicates'] = len(aliases)
+
+    # 装箱：计算布局
+    with stage('pack') as metrics:
+        if options['layout'] == 'maxrects':
+            positions, sprite_size = sprite.layout_maxrects(
+                unique, icon_sizes, padding=options['padding'], extrude=options['extrude'])
+            extrude = options['extrude']
+        else:
+            # 混合尺寸的图标按最大尺寸定格子
+            cell = [max(w for w, _ in icon_sizes.values()),
+                    max(h for _, h in icon_sizes.values())]
+            positions, sprite_size = sprite.layout_grid(
+                unique, {name: cell for name, _ in unique})
+            extrude = 0
+        for name, target in aliases.items():
+            positions[name] = dict(positions[target], alias_of=target)
+        metrics['sprite_size'] = list(sprite_size)
+        metrics['fill_ratio'] = round(
+            sum(w * h for w, h in (icon_sizes[name] for name, _ in unique))
+            / (sprite_size[0] * sprite_size[1]), 4)
+
+    # 拼图：生成挤出边缘，每个图标粘贴一次（与 build_sprite() 相同）
+    with stage('blit') as metrics:
+        atlas = Image.new('RGBA', tuple(sprite_size), (0, 0, 0, 0))
+        overlapping = any(icon_sizes[name][0] > positions[name]['width']
+                          or icon_sizes[name][1] > positions[name]['height'] for name, _ in unique)
+        for name, _ in unique:
+            pos = positions[name]
+            sprite._paste_tile(atlas, sprite._extrude_tile(decoded[name], extrude),
+                               -pos['x'], -pos['y'], extrude, overlapping)
+        metrics['bytes'] = atlas.width * atlas.height * 4
+    for img in decoded.values():
+        img.close()
+    decoded.clear()
+
+    # 编码：无损优化 PNG
+    with stage('encode') as metrics:
+        png_bytes, report = sprite.encode_png(atlas, optimize=options['optimize'])
+        metrics['bytes'] = len(png_bytes)
+        metrics['strategy'] = report['strategy']
+    atlas.close()
+
+    # CSS 输出
+    with stage('css') as metrics:
+        sprite.generate_css(positions)
+        metrics['bytes'] = os.path.getsize(sprite.OUTPUT_CSS)
+
+    # 对照：完整调用 build_sprite()，与上面各阶段的耗时之和比较，发现两者的偏差
+    with stage(REFERENCE_STAGE) as metrics:
+        build = sprite.build_sprite(
+            optimize=options['optimize'], use_cache=False, layout=options['layout'],
+            padding=options['padding'], extrude=options['extrude'], trim=options['trim'],
+            dedup=options['dedup'], workers=workers, discover=False)
+        metrics['sprite_size'] = list(build['sprite_size'])
+        metrics['bytes'] = sum(img.width * img.height * 4 for img in build['sprites'].values())
+    for img in build['sprites'].values():
+        img.close()
+
+    results['process_peak_rss_bytes'] = process_peak or None
+    return results
+
+
+def run_size(count, options):
+    """在独立子进程中运行一个规模的基准，返回该规模的结果"""
+    corpus_dir, _ = synthesize_corpus(count, options['seed'])
+    cmd = [sys.executable, os.path.abspath(__file__), '--run-size', str(count),
+           '--options', json.dumps(options)]
+    print(f"⏱️  运行 {count} 个图标...")
+    proc = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
+    if proc.returncode != 0:
+        raise RuntimeError(f"{count} 个图标的基准运行失败:\n{proc.stderr}")
+    return json.loads(proc.stdout)
+
+
+def format_bytes(value):
+    """字节数转为易读的字符串"""
+    if value is None:
+        return '-'
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if abs(value) < 1024 or unit == 'GB':
+            return f"{value:.0f}{unit}" if unit == 'B' else f"{value:.1f}{unit}"
+        value /= 1024
+
+
+def print_results(results):
+    """打印每个规模各阶段的耗时、峰值内存和产出字节数"""
+    for count, stages in results.items():
+        total = sum(stages[name]['wall_ms'] for name in STAGES)
+        print(f"\n📊 {count} 个图标（合计 {total:.0f}ms，"
+              f"进程峰值内存 {format_bytes(stages.get('process_peak_rss_bytes'))}）")
+        print("  阶段                 耗时 阶段内峰值     字节数")
+        for name in STAGES + [REFERENCE_STAGE]:
+            metrics = stages[name]
+            print(f"  {name:<12} {metrics['wall_ms']:>10.1f}ms "
+                  f"{format_bytes(metrics['peak_rss_bytes']):>10} "
+                  f"{format_bytes(metrics.get('bytes')):>10}")
+
+
+def _change(current, previous):
+    if not previous:
+        return None
+    return (current - previous) * 100 / previous
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """与基线逐阶段对比耗时、峰值内存和字节数
+
+    返回值：
+        list: 超过阈值的退化项 [(规模, 阶段, 指标, 变化百分比)]
+    """
+    regressions = []
+    print(f"\n📈 与基线对比（{baseline.get('created', '未知时间')}）")
+    for count, stages in results.items():
+        base_stages = baseline.get('results', {}).get(count)
+        if not base_stages:
+            print(f"  {count} 个图标: 基线中没有该规模，跳过")
+            continue
+        print(f"  {count} 个图标:")
+        for name in STAGES + [REFERENCE_STAGE]:
+            if name not in base_stages:
+                continue
+            parts = []
+            for key, label in [('wall_ms', '耗时'), ('peak_rss_bytes', '内存'),
+                               ('bytes', '字节')]:
+                current = stages[name].get(key)
+                previous = base_stages[name].get(key)
+                if current is None or previous is None:
+                    continue
+                change = _change(current, previous)
+                if change is None:
+                    continue
+                parts.append(f"{label} {change:+.1f}%")
+                if key == 'wall_ms' and current - previous < MIN_WALL_DELTA_MS:
+                    continue
+                if threshold is not None and change > threshold:
+                    regressions.append((count, name, key, change))
+            print(f"    {name:<10} {'  '.join(parts)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='雪碧图生成器性能基准')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='合成图标集的规模，逗号分隔（默认 100,1000,10000）')
+    parser.add_argument('--seed', type=int, default=1,
+                        help='合成图标的随机种子，相同种子生成相同的图标集')
+    parser.add_argument('--layout', choices=['grid', 'maxrects'], default='maxrects',
+                        help='布局方式（默认 maxrects；grid 按最大图标定格子）')
+    parser.add_argument('--padding', type=int, default=0, help='maxrects 布局的间距')
+    parser.add_argument('--extrude', type=int, default=0, help='maxrects 布局的挤出宽度')
+    parser.add_argument('--trim', action='store_true', help='解码后裁掉透明边')
+    parser.add_argument('--dedup', action='store_true', help='像素相同的图标共用位置')
+    parser.add_argument('--debug-uncompressed', action='store_true',
+                        help='编码阶段输出无压缩 PNG')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='解码线程数（默认同 generate-sprite.py）')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT,
+                        help=f'结果 JSON 路径（默认 {os.path.relpath(DEFAULT_OUTPUT, PROJECT_ROOT)}）')
+    parser.add_argument('--baseline', help='用于对比的基线 JSON')
+    parser.add_argument('--threshold', type=float, default=None,
+                        help='任一指标比基线增加超过该百分比时以非零状态退出')
+    parser.add_argument('--run-size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--options', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size:
+        # 子进程：运行单个规模，结果以 JSON 输出到 stdout
+        corpus_dir, names = synthesize_corpus(args.run_size, json.loads(args.options)['seed'])
+        results = run_stages(corpus_dir, names, json.loads(args.options))
+        json.dump(results, sys.stdout)
+        return 0
+
+    options = {
+        'seed': args.seed,
+        'layout': args.layout,
+        'padding': args.padding,
+        'extrude': args.extrude,
+        'trim': args.trim,
+        'dedup': args.dedup,
+        'optimize': not args.debug_uncompressed,
+        'workers': args.jobs if args.jobs is not None else load_sprite_module().DEFAULT_WORKERS,
+    }
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+
+    results = {}
+    for count in sizes:
+        results[str(count)] = run_size(count, options)
+
+    print_results(results)
+
+    report = {
+        'version': BENCH_FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'options': options,
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 结果已写入: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('options') != options:
+            print("⚠️  基线的运行参数与本次不同，对比结果仅供参考")
+        if baseline.get('version') != BENCH_FORMAT_VERSION:
+            print("⚠️  基线的结果格式版本与本次不同（峰值内存口径可能不同），对比结果仅供参考")
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} 项指标超过阈值 {args.threshold}%:")
+            for count, name, key, change in regressions:
+                print(f"  {count} 个图标 / {name} / {key}: {change:+.1f}%")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,14 +7,77 @@
 2. 复制其他资源目录
 3. 复制 gadgets 目录
 4. 复制 src 根目录文件（排除指定文件）
-5. 压缩 CSS 文件（使用 clean-css-cli）
+5. 压缩 CSS 文件（使用 clean-css）
 6. 压缩 JavaScript 文件（使用 terser）
+
+压缩由 scripts/minify-worker.cjs 在少量常驻 Node 进程中批量完成，
+找不到 node 或压缩模块时退回逐个文件调用 npx。压缩结果按源内容哈希和压缩参数
+缓存在 .cache/minify/ 下（LRU 淘汰，有总大小上限），docs 被 Vite 清空后
+未变化的文件也无需重新压缩。
+
+增量复制：.cache/copy-static/manifest.json 记录每个源文件的大小、修改时间和
+内容哈希，以及输出文件最终的状态；源文件和输出文件都没有变化时跳过复制和压缩，
+源文件已删除的输出文件会被清理。
+
+预压缩（--precompress）：压缩完成后为文本类资源并行生成 .br / .gz 同名文件（未安装 brotli 时
+只生成 .gz），压缩后没有变小的文件不生成，结果按内容哈希存入同一个压缩缓存。GitHub Pages
+不会使用这些文件，默认不生成（并删除之前生成的），部署到支持预压缩文件的服务器时再开启。
+
+文件指纹（--fingerprint）：为页面直接加载的资源生成带内容哈希的副本（如 app.1a2b3c4d.js），
+只改写 HTML 页面中的引用（CSS / JS / JSON 和原文件都不改写），并写出 docs/asset-manifest.json，
+服务器可据此把带哈希的文件标记为 immutable。原文件保留，运行时拼接的路径仍然可用；
+预压缩时只压缩副本。
+
+体积检查：构建结束时统计每个文件的源文件、部署（压缩后）、gzip / brotli 大小，写出
+.cache/copy-static/size-report.json，检查 SIZE_BUDGETS 中的预算并与上次通过检查的构建
+（size-baseline.json）比较；超出预算或增长超过阈值时列出文件（默认只警告，加
+--enforce-size-budget 时以非零状态退出）。没有预压缩文件的文本类文件的 gzip 大小记录在
+增量复制清单中，文件未变化时不重新计算。
+
+构建耗时：每个阶段和每个文件（复制、压缩、预压缩）的耗时写入
+.cache/copy-static/build-profile.json（汇总）和 build-trace.json（Chrome trace 事件，
+可用 Perfetto 或 chrome://tracing 打开），结束时列出最慢的阶段和文件。
+
+图片优化（--optimize-images）：用进程池无损重新压缩复制的 PNG / JPEG（去掉元数据、选择
+最小的编码方式、无损时转为调色板或灰度），没有变小的文件保持原样，结果按内容哈希缓存，
+并按目录报告节省的大小。关闭后优化过的图片按源文件重新复制。
+
+链接模式（--link-mode）：不需要压缩的文件（图片、svga、wasm 等）可以用 reflink、
+copy_file_range 或硬链接代替复制，几乎不占额外磁盘空间；需要压缩的文件始终是独立副本。
 """
 
+import argparse
+import fnmatch
+import gzip
+import hashlib
+import importlib.util
+import io
+import json
 import os
+import posixpath
+import re
 import shutil
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，链接模式下跳过 reflink
+    fcntl = None
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli 时只生成 .gz
+    brotli = None
+
+try:
+    import PIL
+    from PIL import Image
+except ImportError:  # 未安装 Pillow 时不能优化图片（生成雪碧图同样需要 Pillow）
+    PIL = Image = None
 
 # ==============================================
 # 全局定义排除规则
@@ -25,8 +88,130 @@ exclude_files = ['index.html', '404.html', 'drawer.css', 'panel.css', 'sprite-ge
 exclude_folders = ['gadgets', 'css']
 # 要排除的JS文件（已压缩的第三方库，避免二次压缩）
 exclude_js_files = ['gif.js', 'gif.worker.js']
+# 复制范围：(src 下的目录, 规则, 压缩类型)。assets 规则应用上面的排除列表，img 目录下跳过
+# 雪碧图图标；gadgets 规则只跳过 HTML（保留 Vite 构建生成的 HTML）。src 根目录的文件另外复制
+copy_sections = [
+    ('assets/css', 'assets', 'css'),
+    ('assets/js', 'assets', 'js'),
+    ('assets/dar_svga', 'assets', None),
+    ('assets/mingren_gift_1photo', 'assets', None),
+    ('assets/sth_auto_img', 'assets', None),
+    ('assets/svga', 'assets', None),
+    ('assets/xunzhang', 'assets', None),
+    ('assets/img', 'assets', None),
+    ('gadgets', 'gadgets', None),
+]
 # ==============================================
 
+# 增量复制清单（相对项目根目录）
+COPY_MANIFEST = os.path.join('.cache', 'copy-static', 'manifest.json')
+# 2：之前的版本可能把 npx 没有真正压缩的文件记为已压缩
+# 3：文件指纹不再改写 CSS / JS / JSON，之前改写过的复制输出需要重新复制
+COPY_MANIFEST_VERSION = 3
+
+# 批量压缩：Node 进程数及进程脚本
+MINIFY_WORKERS = min(4, os.cpu_count() or 1)
+MINIFY_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'minify-worker.cjs')
+# 压缩参数（传给压缩进程，同时参与缓存键），与原先的命令行参数一致：
+# cleancss <file> -o <file>
+# terser <file> -o <file> --compress --mangle --keep-classnames --keep-fnames
+MINIFY_OPTIONS = {
+    'css': {},
+    'js': {'compress': True, 'mangle': True, 'keep_classnames': True, 'keep_fnames': True},
+}
+
+# 压缩结果缓存（相对项目根目录）及总大小上限，超出时淘汰最久未使用的条目
+MINIFY_CACHE_DIR = os.path.join('.cache', 'minify')
+MINIFY_CACHE_MAX_BYTES = 200 * 1024 * 1024
+# 2：缓存键改为压缩工具的包名和版本，丢弃之前可能缓存的未压缩结果
+MINIFY_CACHE_VERSION = 2
+
+# 链接模式：copy 始终复制（默认）；auto 依次尝试 reflink、copy_file_range、硬链接，
+# 都不可用时退回 copy2；hardlink 优先硬链接（与源文件共用数据，修改其一会同时改变另一个）
+LINK_MODES = {
+    'copy': [],
+    'auto': ['reflink', 'copy_file_range', 'hardlink'],
+    'hardlink': ['hardlink', 'reflink'],
+}
+# 预压缩：文件类型、最小文件大小（更小的文件收益可忽略）、线程数（zlib / brotli 压缩时释放 GIL）
+PRECOMPRESS_EXTENSIONS = ('.html', '.css', '.js', '.mjs', '.json', '.svg', '.txt', '.xml', '.map', '.wasm')
+PRECOMPRESS_SUFFIXES = ('.br', '.gz')
+PRECOMPRESS_MIN_BYTES = 1024
+PRECOMPRESS_WORKERS = os.cpu_count() or 1
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+# 文件指纹：文件名映射（相对 docs）、加指纹的目录、不加指纹的文件类型（页面入口、按固定文件名读取的文件）
+ASSET_MANIFEST = 'asset-manifest.json'
+FINGERPRINT_LENGTH = 8
+FINGERPRINT_DIRS = ('assets', 'gadgets')
+FINGERPRINT_EXCLUDE_EXTENSIONS = ('.html', '.json', '.md', '.txt')
+# 不加指纹的目录（相对 docs 的路径前缀）：wasm-bindgen 生成的胶水代码中的模块名
+# 与编译进 .wasm 的导入模块名必须一致
+FINGERPRINT_EXCLUDE_DIRS = ('assets/js/libs/tinypng-lib-wasm/',)
+# 可能引用其他文件的文件类型（只改写其中的 HTML 页面）
+REFERENCE_EXTENSIONS = ('.html', '.css', '.js', '.mjs', '.json')
+FINGERPRINTED_NAME = re.compile(r'\.[0-9a-f]{%d}(\.[A-Za-z0-9]+)$' % FINGERPRINT_LENGTH)
+# 文本中可能是路径的片段（前面不能紧跟路径字符或 ":"，排除 https://... 这类外部地址），{} 为扩展名
+REFERENCE_TOKEN = r'(?<![\w./@%+:-])[\w./@%+-]*\.(?:{})(?![\w./@%+-])'
+# 加载地址的上下文（紧挨在路径之前）：HTML 属性和 .src = 赋值、CSS url() / @import、
+# import / export ... from、import()、require()、importScripts()、fetch()、new URL / Worker，
+# 以及名称以 url / src / href / path 结尾的字段或变量（如 url:、workerPath =）
+URL_CONTEXT = re.compile(r"""(?:
+      \b(?:src|href|poster)\s*=\s*["']?
+    | \burl\(\s*["']?
+    | @import\s+["']
+    | \b(?:import|export)\b[^;'"]*?\bfrom\s*["']
+    | \bimport\s*\(?\s*["']
+    | \b(?:require|importScripts|fetch)\s*\(\s*["']
+    | \bnew\s+(?:URL|Worker|SharedWorker)\s*\(\s*["']
+    | \w*(?:url|src|href|path)\s*[:=]\s*["']
+    )\Z""", re.IGNORECASE | re.VERBOSE)
+# 查找上下文时向前看的字符数（import { ... } from 可能跨多行）
+URL_CONTEXT_WINDOW = 200
+# 行注释：// 注释（排除 https:// 这类地址）、块注释中以 * 开头的行、单行的 HTML 注释
+LINE_COMMENT = re.compile(r'^\s*(?:\*|<!--)|(?<![:\w\'"/])//')
+
+# 引用图裁剪：只检查这些目录下复制的文件（图片等资源常由运行时拼接路径加载，无法静态判断），
+# 第三方库目录下的文件按库汇总
+PRUNE_DIRS = ('assets/js/',)
+LIBRARY_DIRS = ('assets/js/lib/', 'assets/js/libs/')
+# 由运行时拼接的路径加载、引用图中找不到但必须保留的文件（相对 docs 的路径前缀）
+PRUNE_KEEP = ()
+
+# 体积报告（每次构建写出）和比较基准（检查通过时更新），相对项目根目录
+SIZE_REPORT = os.path.join('.cache', 'copy-static', 'size-report.json')
+SIZE_BASELINE = os.path.join('.cache', 'copy-static', 'size-baseline.json')
+SIZE_REPORT_VERSION = 1
+# 体积预算：(路径模式（相对 docs，fnmatch 语法，* 可跨目录）, 指标, 上限字节数)，
+# 同一文件同一指标只使用第一条匹配的规则（具体的规则写在通用规则前面）
+# 指标：raw 源文件、minified 部署文件（压缩后）、gzip / brotli 预压缩后
+SIZE_BUDGETS = [
+    ('assets/*controls-sprite*.png', 'minified', 3 * 1024 * 1024),
+    ('gadgets/encoding-indexes.js', 'gzip', 200 * 1024),
+    ('*.js', 'gzip', 256 * 1024),
+    ('*.css', 'gzip', 64 * 1024),
+    ('*.wasm', 'gzip', 1024 * 1024),
+]
+# 部署大小比基准增长超过该比例且超过最小字节数时视为体积回退
+SIZE_GROWTH_THRESHOLD = 0.10
+SIZE_GROWTH_MIN_BYTES = 10 * 1024
+
+# 构建耗时汇总和 Chrome trace 事件文件（相对项目根目录），以及结束时列出的最慢文件数
+BUILD_PROFILE = os.path.join('.cache', 'copy-static', 'build-profile.json')
+BUILD_TRACE = os.path.join('.cache', 'copy-static', 'build-trace.json')
+SLOWEST_FILES = 10
+
+# 图片优化：文件类型、进程数；结果版本参与缓存键（优化方式改变后缓存自动失效）
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+IMAGE_WORKERS = os.cpu_count() or 1
+IMAGE_OPTIMIZE_VERSION = 1
+# EXIF 方向标签：去掉元数据会改变带方向标签图片的显示方向，这类图片不处理
+EXIF_ORIENTATION = 0x0112
+
+# Linux FICLONE ioctl（btrfs、xfs 等支持写时复制的文件系统）
+FICLONE = 0x40049409
+
 # 确保脚本使用 UTF-8 编码
 if sys.stdout.encoding != 'utf-8':
     sys.stdout.reconfigure(encoding='utf-8')
@@ -41,245 +226,1581 @@ def print_error(message):
     """打印错误"""
     print(f"[ERROR] {message}")
 
-def copy_directory(source, destination):
-    """复制目录"""
+def load_sprite_module(project_root):
+    """加载 generate-sprite.py 作为模块（文件名含连字符，不能直接 import）"""
+    module_path = os.path.join(project_root, 'generate-sprite.py')
+    spec = importlib.util.spec_from_file_location('generate_sprite', module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def format_size(size):
+    """字节数转为易读的字符串"""
+    for unit in ['B', 'KB', 'MB']:
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+def file_sha256(path):
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _temp_path(path):
+    """同目录下的临时文件路径（以 . 开头，按进程区分）"""
+    return os.path.join(os.path.dirname(path) or '.', f'.{os.path.basename(path)}.{os.getpid()}.tmp')
+
+def _atomic_write(path, data):
+    """原子写入：先写同目录下的临时文件再替换，开发服务器不会读到写了一半的文件，
+    硬链接模式下也不会改写源文件"""
+    tmp_path = _temp_path(path)
+    with open(tmp_path, 'wb') as f:
+        f.write(data.encode('utf-8', 'surrogateescape') if isinstance(data, str) else data)
+    os.replace(tmp_path, path)
+
+def _atomic_write_json(path, data, **kwargs):
+    """以 JSON 格式原子写入，见 _atomic_write()"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _atomic_write(path, json.dumps(data, **kwargs) + '\n')
+
+def _is_minify_target(file, kind):
+    """文件名是否属于需要压缩的 CSS / JS 文件"""
+    if kind == 'css':
+        return file.endswith('.css') and not file.endswith('.min.css')
+    return file.endswith('.js') and not file.endswith('.min.js') and file not in exclude_js_files
+
+def _reflink(source, destination):
+    """写时复制克隆：新文件与源文件共享数据块，修改时才真正复制"""
+    if fcntl is None:
+        raise OSError('当前平台不支持 reflink')
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+def _copy_file_range(source, destination):
+    """内核态复制，数据不经过用户态缓冲区（NFS、btrfs 等会直接共享数据块）"""
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        remaining = os.fstat(src.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+            if copied == 0:
+                break
+            remaining -= copied
+
+def link_file(source, destination, mode):
+    """按链接模式写出 destination（先写临时文件再替换），返回实际使用的方式"""
+    tmp_path = _temp_path(destination)
+    for method in LINK_MODES[mode]:
+        try:
+            if method == 'hardlink':
+                os.link(source, tmp_path)
+            else:
+                (_reflink if method == 'reflink' else _copy_file_range)(source, tmp_path)
+                shutil.copystat(source, tmp_path)
+        except (OSError, AttributeError):
+            # 文件系统或平台不支持（如跨设备、无 os.copy_file_range），尝试下一种方式
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+            continue
+        os.replace(tmp_path, destination)
+        return method
+    shutil.copy2(source, destination)
+    return 'copy'
+
+def load_copy_manifest(project_root, link_mode='copy', profile=None):
+    """读取增量复制清单，不存在或版本不符时从空清单开始（即全量复制）
+
+    link_mode: 见 LINK_MODES（需要压缩的文件始终复制为独立副本）
+    profile: 构建耗时记录（见 new_build_profile()），记录每个文件的复制耗时
+    """
+    data = {}
+    try:
+        with open(os.path.join(project_root, COPY_MANIFEST), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        pass
+    if data.get('version') != COPY_MANIFEST_VERSION:
+        data = {}
+    return {
+        'root': project_root,
+        # 输出路径 -> 源文件路径、大小、修改时间、内容哈希
+        'sources': data.get('sources', {}),
+        # 输出路径 -> 输出文件最终的 [大小, 修改时间]（压缩后）
+        'outputs': data.get('outputs', {}),
+        # 当前内容已经压缩过的输出路径
+        'minified': set(data.get('minified', [])),
+        # 当前内容经过图片优化的输出路径（关闭 --optimize-images 后按源文件重新复制）
+        'optimized': set(data.get('optimized', [])),
+        # docs 下的文件 -> [大小, 修改时间, gzip 大小]（体积检查现场计算的 gzip 大小）
+        'gzip_sizes': data.get('gzip_sizes', {}),
+        # 本次构建复制或确认过的输出路径
+        'visited': set(),
+        'stats': {'copied': [0, 0], 'skipped': [0, 0], 'removed': [0, 0]},
+        'link_mode': link_mode,
+        # 写出方式 -> 文件数
+        'methods': {},
+        'profile': profile,
+    }
+
+def save_copy_manifest(manifest):
+    """保存增量复制清单（先写临时文件再替换）"""
+    data = {
+        'version': COPY_MANIFEST_VERSION,
+        'sources': manifest['sources'],
+        'outputs': manifest['outputs'],
+        'minified': sorted(manifest['minified']),
+        'optimized': sorted(manifest['optimized']),
+        'gzip_sizes': manifest['gzip_sizes'],
+    }
+    _atomic_write_json(os.path.join(manifest['root'], COPY_MANIFEST), data, indent=1, sort_keys=True)
+
+def _manifest_key(manifest, path):
+    return os.path.relpath(path, manifest['root']).replace(os.sep, '/')
+
+def _record_output(manifest, path):
+    """记录输出文件当前的状态"""
+    stat = os.stat(path)
+    manifest['outputs'][_manifest_key(manifest, path)] = [stat.st_size, stat.st_mtime_ns]
+
+def _output_matches(manifest, path):
+    """输出文件是否仍是上次记录的状态（未被删除或被其他工具改写）"""
     try:
-        if not os.path.exists(destination):
-            os.makedirs(destination)
-        
-        # 复制目录内容
-        for item in os.listdir(source):
-            s = os.path.join(source, item)
-            d = os.path.join(destination, item)
-            # 跳过排除的文件夹
-            if os.path.isdir(s) and item in exclude_folders:
-                print_info(f"跳过排除的文件夹: {item}")
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return manifest['outputs'].get(_manifest_key(manifest, path)) == [stat.st_size, stat.st_mtime_ns]
+
+def sync_file(source, destination, manifest=None, stat=None, minify=False):
+    """复制单个文件，返回是否实际复制
+
+    提供清单时，源文件（大小、修改时间，必要时比较内容哈希）和输出文件都没有
+    变化则跳过；不提供清单时总是复制。
+    stat: 遍历时已取得的源文件 stat（省去一次系统调用）
+    minify: 输出文件之后是否会被压缩（压缩会改写内容，不能与源文件共享数据）
+    """
+    if manifest is None:
+        shutil.copy2(source, destination)
+        return True
+
+    key = _manifest_key(manifest, destination)
+    manifest['visited'].add(key)
+    source_key = _manifest_key(manifest, source)
+    stat = stat or os.stat(source)
+    record = manifest['sources'].get(key)
+    digest = None
+    if record and record['source'] == source_key and record['size'] == stat.st_size:
+        if record['mtime_ns'] == stat.st_mtime_ns:
+            digest = record['sha256']
+        else:
+            # 修改时间变了（如重新检出）但内容可能相同，比较内容哈希
+            current = file_sha256(source)
+            if current == record['sha256']:
+                digest = current
+                record['mtime_ns'] = stat.st_mtime_ns
+
+    independent = manifest['link_mode'] == 'copy' or minify
+    if independent and os.path.exists(destination) and os.path.samefile(source, destination):
+        # 之前以硬链接写出、现在需要独立副本：先删除链接，否则复制或压缩会改写源文件
+        os.remove(destination)
+
+    if digest is not None and _output_matches(manifest, destination):
+        manifest['stats']['skipped'][0] += 1
+        manifest['stats']['skipped'][1] += stat.st_size
+        return False
+
+    copy_start = time.perf_counter()
+    if not independent:
+        method = link_file(source, destination, manifest['link_mode'])
+    else:
+        shutil.copy2(source, destination)
+        method = 'copy'
+    profile_event(manifest['profile'], 'copy', key, copy_start, time.perf_counter() - copy_start,
+                  method=method, bytes=stat.st_size)
+    manifest['methods'][method] = manifest['methods'].get(method, 0) + 1
+    manifest['sources'][key] = {
+        'source': source_key,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest or file_sha256(source),
+    }
+    _record_output(manifest, destination)
+    manifest['minified'].discard(key)
+    manifest['optimized'].discard(key)
+    manifest['stats']['copied'][0] += 1
+    manifest['stats']['copied'][1] += stat.st_size
+    return True
+
+def remove_stale_outputs(manifest):
+    """删除源文件已不存在（或已被排除）的输出文件
+
+    只删除仍保持上次复制状态的文件，被 Vite 等其他工具改写过的文件保留。
+    """
+    for key in sorted(set(manifest['sources']) - manifest['visited']):
+        path = os.path.join(manifest['root'], key)
+        if _output_matches(manifest, path):
+            size = os.path.getsize(path)
+            os.remove(path)
+            _remove_precompressed(path)
+            manifest['stats']['removed'][0] += 1
+            manifest['stats']['removed'][1] += size
+            print_info(f"删除源文件已不存在的输出: {key}")
+        manifest['sources'].pop(key)
+        manifest['outputs'].pop(key, None)
+        manifest['minified'].discard(key)
+        manifest['optimized'].discard(key)
+
+def print_copy_summary(manifest):
+    """打印复制、跳过、删除的文件数和字节数"""
+    labels = {'copied': '复制', 'skipped': '跳过（未变化）', 'removed': '删除'}
+    parts = [f"{labels[name]} {count} 个文件 ({format_size(size)})"
+             for name, (count, size) in manifest['stats'].items()]
+    print_info(f"增量复制统计: {'，'.join(parts)}")
+    if manifest['methods']:
+        methods = '，'.join(f"{method} {count}" for method, count in sorted(manifest['methods'].items()))
+        print_info(f"写入方式（--link-mode {manifest['link_mode']}）: {methods}")
+
+def _needs_minify(manifest, path):
+    """输出文件是否需要压缩：没有清单，或当前内容不是上次压缩后的结果"""
+    if manifest is None:
+        return True
+    key = _manifest_key(manifest, path)
+    return key not in manifest['minified'] or not _output_matches(manifest, path)
+
+def _record_minify(manifest, path, success):
+    """记录压缩结果；失败时清除复制记录，下次构建重新复制并重试压缩"""
+    if manifest is None:
+        return
+    key = _manifest_key(manifest, path)
+    if success:
+        _record_output(manifest, path)
+        manifest['minified'].add(key)
+    else:
+        manifest['minified'].discard(key)
+        manifest['sources'].pop(key, None)
+
+def _minifier_versions(project_root):
+    """已安装的压缩工具及版本，如 terser@5.17.1（升级后缓存自动失效），未安装时为 None"""
+    versions = {}
+    for kind, package in [('css', 'clean-css'), ('js', 'terser')]:
+        try:
+            with open(os.path.join(project_root, 'node_modules', package, 'package.json'),
+                      'r', encoding='utf-8') as f:
+                version = json.load(f).get('version')
+        except (OSError, ValueError):
+            version = None
+        versions[kind] = f'{package}@{version}' if version else None
+    return versions
+
+def load_minify_cache(project_root):
+    """读取压缩结果缓存的索引"""
+    cache_dir = os.path.join(project_root, MINIFY_CACHE_DIR)
+    data = {}
+    try:
+        with open(os.path.join(cache_dir, 'index.json'), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        pass
+    if data.get('version') != MINIFY_CACHE_VERSION:
+        data = {}
+    return {
+        'dir': cache_dir,
+        # 缓存键 -> 压缩结果大小、压缩耗时、最后使用时间
+        'entries': data.get('entries', {}),
+        'versions': _minifier_versions(project_root),
+        'stats': {'hits': 0, 'misses': 0, 'saved_ms': 0, 'evicted': 0},
+    }
+
+def _minify_cache_path(cache, key):
+    return os.path.join(cache['dir'], key[:2], key)
+
+def _cache_read(cache, key):
+    """按内容哈希读取缓存（只读，不修改缓存索引，可在线程池中调用）
+
+    返回值：
+        tuple: (条目, 内容)；未缓存或缓存文件丢失时条目为 None，
+               "处理后没有变小"的条目（skip）内容为 None
+    """
+    entry = cache['entries'].get(key) if cache is not None else None
+    if entry is None or entry.get('skip'):
+        return entry, None
+    try:
+        with open(_minify_cache_path(cache, key), 'rb') as f:
+            return entry, f.read()
+    except OSError:
+        return None, None
+
+def _cache_write(cache, key, data, ms):
+    """按内容哈希保存处理结果；data 为 None 时记录"处理后没有变小"，下次无需再处理"""
+    if data is None:
+        cache['entries'][key] = {'size': 0, 'ms': round(ms, 1), 'last_used': time.time(), 'skip': True}
+        return
+    cache_path = _minify_cache_path(cache, key)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    _atomic_write(cache_path, data)
+    cache['entries'][key] = {'size': len(data), 'ms': round(ms, 1), 'last_used': time.time()}
+
+def minify_cache_key(cache, kind, path):
+    """缓存键：源文件内容、类型、压缩参数和压缩工具（包名、版本）的哈希
+
+    压缩工具未安装在项目中时（npx 临时下载的版本无法确定）返回 None，不使用缓存。
+    """
+    if cache['versions'].get(kind) is None:
+        return None
+    config = json.dumps([MINIFY_CACHE_VERSION, kind, MINIFY_OPTIONS[kind],
+                         cache['versions'].get(kind)], sort_keys=True)
+    digest = hashlib.sha256(config.encode('utf-8'))
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def minify_cache_restore(cache, key, path):
+    """缓存命中时把压缩结果直接写入输出文件，返回与压缩进程相同格式的结果，未命中返回 None"""
+    entry, output = _cache_read(cache, key)
+    if output is None:
+        # 未命中或缓存文件丢失（删除条目）
+        cache['entries'].pop(key, None)
+        cache['stats']['misses'] += 1
+        return None
+    before = os.path.getsize(path)
+    _atomic_write(path, output)
+    entry['last_used'] = time.time()
+    cache['stats']['hits'] += 1
+    cache['stats']['saved_ms'] += entry['ms']
+    return {'file': path, 'ok': True, 'before': before, 'after': entry['size'],
+            'ms': 0, 'cached': True}
+
+def minify_cache_store(cache, key, path, ms):
+    """保存压缩结果"""
+    with open(path, 'rb') as f:
+        _cache_write(cache, key, f.read(), ms)
+
+def save_minify_cache(cache):
+    """超出大小上限时按最久未使用淘汰条目，然后保存索引"""
+    entries = cache['entries']
+    total = sum(entry['size'] for entry in entries.values())
+    for key in sorted(entries, key=lambda k: entries[k]['last_used']):
+        if total <= MINIFY_CACHE_MAX_BYTES:
+            break
+        total -= entries.pop(key)['size']
+        cache['stats']['evicted'] += 1
+        try:
+            os.remove(_minify_cache_path(cache, key))
+        except OSError:
+            pass
+    cache['total'] = total
+    _atomic_write_json(os.path.join(cache['dir'], 'index.json'),
+                       {'version': MINIFY_CACHE_VERSION, 'entries': entries}, indent=1, sort_keys=True)
+
+def print_minify_cache_stats(cache):
+    """打印压缩缓存的命中率、节省的时间和占用空间"""
+    stats = cache['stats']
+    lookups = stats['hits'] + stats['misses']
+    rate = stats['hits'] * 100 / lookups if lookups else 0
+    print_info(f"压缩缓存: 命中 {stats['hits']}/{lookups} ({rate:.0f}%)，"
+               f"节省约 {stats['saved_ms'] / 1000:.2f}s，"
+               f"占用 {format_size(cache.get('total', 0))} / {format_size(MINIFY_CACHE_MAX_BYTES)}，"
+               f"淘汰 {stats['evicted']} 项")
+
+def compile_copy_rules(sprite_icons=frozenset()):
+    """把排除规则编译成集合，遍历时每个条目只做常数时间的判断
+
+    sprite_icons: 已合并进雪碧图的图标文件名，img 目录下的这些图标不再复制
+    """
+    return {
+        'files': frozenset(exclude_files),
+        'folders': frozenset(exclude_folders),
+        'sprite_icons': frozenset(sprite_icons),
+    }
+
+def scan_copy_work(src_dir, docs_dir, rules):
+    """用 os.scandir 遍历一次 src，按 copy_sections 和排除规则生成复制工作列表
+
+    返回值：
+        tuple: ([(源文件, 目标文件, 压缩类型 'css' / 'js' / None, 源文件 stat)], 需要创建的目标目录)
+    """
+    work = []
+    directories = []
+
+    def walk(source, destination, section, minify_kind):
+        directories.append(destination)
+        # 只有 img 目录（如 assets/img、assets/sth_auto_img）跳过雪碧图图标
+        icons = rules['sprite_icons'] if 'img' in os.path.relpath(source, src_dir) else frozenset()
+        with os.scandir(source) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+        for entry in entries:
+            target = os.path.join(destination, entry.name)
+            if entry.is_dir():
+                if section == 'assets' and entry.name in rules['folders']:
+                    print_info(f"跳过排除的文件夹: {entry.name}")
+                else:
+                    walk(entry.path, target, section, minify_kind)
                 continue
-            if os.path.isdir(s):
-                copy_directory(s, d)
+            if section == 'gadgets':
+                if entry.name.endswith('.html'):
+                    print_info(f"跳过 HTML 文件（保留 Vite 构建产物）: {entry.name}")
+                    continue
+            elif entry.name in rules['files']:
+                print_info(f"跳过排除的文件: {entry.name}")
+                continue
+            elif entry.name in icons and entry.name.endswith('.png'):
+                print_info(f"跳过雪碧图中的图标: {entry.name}")
+                continue
+            kind = minify_kind if minify_kind and _is_minify_target(entry.name, minify_kind) else None
+            work.append((entry.path, target, kind, entry.stat()))
+
+    for section_dir, section, minify_kind in copy_sections:
+        source = os.path.join(src_dir, *section_dir.split('/'))
+        if os.path.isdir(source):
+            walk(source, os.path.join(docs_dir, *section_dir.split('/')), section, minify_kind)
+
+    # src 根目录的文件（不进入子目录）
+    with os.scandir(src_dir) as it:
+        entries = sorted(it, key=lambda entry: entry.name)
+    for entry in entries:
+        if not entry.is_file():
+            continue
+        if entry.name in rules['files']:
+            print_info(f"跳过排除的单个文件: {entry.name}")
+            continue
+        work.append((entry.path, os.path.join(docs_dir, entry.name), None, entry.stat()))
+    return work, directories
+
+def copy_work(work, directories, manifest=None):
+    """按工作列表创建目录并复制文件，逐个文件报告失败（源文件为 None 的生成文件只参与压缩）"""
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+    for source, destination, kind, stat in work:
+        if source is None:
+            continue
+        try:
+            sync_file(source, destination, manifest, stat, minify=kind is not None)
+        except Exception as e:
+            print_error(f"复制文件失败 {source}: {e}")
+
+def collect_minify_jobs(work, manifest=None):
+    """从复制工作列表中收集需要压缩的 CSS / JS 文件，返回 [(类型, 路径)]
+
+    提供清单时跳过已压缩且未变化的文件；已被引用图检查排除的文件不再压缩。
+    """
+    jobs = []
+    for kind, label in [('css', 'CSS'), ('js', 'JavaScript')]:
+        files = [destination for _, destination, item_kind, _ in work
+                 if item_kind == kind and os.path.exists(destination)]
+        unchanged = [f for f in files if not _needs_minify(manifest, f)]
+        if unchanged:
+            print_info(f"跳过 {len(unchanged)} 个已压缩且未变化的{label}文件")
+        jobs.extend((kind, f) for f in files if f not in unchanged)
+    return jobs
+
+def _split_jobs(jobs, count):
+    """按文件大小把任务分给 count 个进程（大文件优先分给当前最空闲的进程）"""
+    chunks = [[] for _ in range(min(count, len(jobs)))]
+    loads = [0] * len(chunks)
+    for job in sorted(jobs, key=lambda job: os.path.getsize(job[1]), reverse=True):
+        index = loads.index(min(loads))
+        chunks[index].append(job)
+        loads[index] += os.path.getsize(job[1])
+    return chunks
+
+def _run_minify_worker(jobs):
+    """启动一个 Node 压缩进程处理一组文件，返回 (每个文件的结果, 致命错误)"""
+    payload = json.dumps({'jobs': [{'type': kind, 'file': path} for kind, path in jobs],
+                          'options': MINIFY_OPTIONS})
+    try:
+        proc = subprocess.Popen(['node', MINIFY_WORKER_SCRIPT], stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8')
+        stdout, stderr = proc.communicate(payload)
+    except OSError as e:
+        return [], str(e)
+    finished = time.perf_counter()
+    results = []
+    fatal = None
+    for line in stdout.splitlines():
+        try:
+            item = json.loads(line)
+        except ValueError:
+            continue
+        if 'fatal' in item:
+            fatal = item['fatal']
+        else:
+            results.append(item)
+    if proc.returncode != 0 and fatal is None:
+        fatal = stderr.strip() or f"压缩进程退出码 {proc.returncode}"
+    # 压缩进程按顺序处理文件且只报告每个文件的耗时：从进程结束时间往前推算各文件的开始时间
+    end = finished
+    for item in reversed(results):
+        item['start'] = end - item.get('ms', 0) / 1000
+        item['track'] = f'node {proc.pid}'
+        end = item['start']
+    return results, fatal
+
+def _minify_with_npx(kind, path):
+    """逐个文件调用 npx 压缩（批量压缩不可用时的后备方式），返回与压缩进程相同格式的结果
+
+    输出与输入完全相同时视为失败（如 npx 没有真正执行压缩工具却正常退出）。
+    """
+    # 解析出完整路径（Windows 上为 npx.cmd），不经过 shell 直接执行
+    npx = shutil.which('npx')
+    if npx is None:
+        return {'file': path, 'ok': False, 'error': "未找到 npx"}
+    if kind == 'css':
+        # 使用 npx cleancss 压缩 CSS
+        cmd = [npx, 'cleancss', path, '-o', path]
+    else:
+        # 使用 npx terser 压缩 JavaScript
+        # --keep-classnames 和 --keep-fnames 保留 Vue 相关的类名和函数名
+        cmd = [npx, 'terser', path, '-o', path, '--compress', '--mangle',
+               '--keep-classnames', '--keep-fnames']
+    with open(path, 'rb') as f:
+        original = f.read()
+    start = time.perf_counter()
+    try:
+        subprocess.run(cmd, check=True)
+        with open(path, 'rb') as f:
+            output = f.read()
+    except Exception as e:
+        return {'file': path, 'ok': False, 'error': str(e)}
+    if output == original:
+        return {'file': path, 'ok': False, 'error': "压缩后内容与原文件完全相同（压缩工具可能没有执行）"}
+    return {'file': path, 'ok': True, 'before': len(original), 'after': len(output),
+            'ms': (time.perf_counter() - start) * 1000, 'start': start, 'track': 'npx'}
+
+def compress_assets(work, manifest=None, cache=None, profile=None):
+    """批量压缩 CSS / JavaScript 文件，逐个文件报告成功或失败
+
+    提供缓存时先按内容哈希查找压缩结果，命中的文件直接写入，只压缩未命中的文件。
+    提供 profile 时记录每个文件的压缩耗时。
+
+    返回值：
+        dict: {类型: {'files', 'failed', 'before', 'after', 'ms'}}，ms 为压缩进程内的累计耗时
+    """
+    stats = {}
+    try:
+        jobs = collect_minify_jobs(work, manifest)
+        if not jobs:
+            print_info("无需要压缩的CSS/JavaScript文件")
+            return stats
+
+        results = {}
+        keys = {}
+        if cache is not None:
+            for kind, path in jobs:
+                keys[path] = minify_cache_key(cache, kind, path)
+                if keys[path] is None:
+                    continue
+                hit = minify_cache_restore(cache, keys[path], path)
+                if hit is not None:
+                    results[path] = hit
+            if results:
+                print_info(f"压缩缓存命中 {len(results)} 个文件，已直接写入压缩结果")
+        pending = [(kind, path) for kind, path in jobs if path not in results]
+
+        css_count = sum(1 for kind, _ in pending if kind == 'css')
+        chunks = _split_jobs(pending, MINIFY_WORKERS)
+        if pending:
+            print_info(f"开始压缩 {css_count} 个CSS文件、{len(pending) - css_count} 个JavaScript文件"
+                       f"（{len(chunks)} 个压缩进程）...")
+        fatal = None
+        if pending and shutil.which('node'):
+            with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+                for chunk_results, chunk_fatal in pool.map(_run_minify_worker, chunks):
+                    fatal = fatal or chunk_fatal
+                    for item in chunk_results:
+                        results[item['file']] = item
+        elif pending:
+            fatal = "未找到 node"
+        if fatal and not any(path in results for _, path in pending):
+            # 压缩模块不可用（如未安装依赖）：退回逐个文件调用 npx
+            print_error(f"批量压缩不可用（{fatal}），改为逐个文件调用 npx")
+            for kind, path in pending:
+                results[path] = _minify_with_npx(kind, path)
+
+        for kind, path in jobs:
+            item = results.get(path) or {'ok': False, 'error': fatal or "压缩进程未返回结果"}
+            label = 'CSS' if kind == 'css' else 'JS'
+            entry = stats.setdefault(kind, {'files': 0, 'failed': 0, 'before': 0, 'after': 0, 'ms': 0})
+            entry['files'] += 1
+            if item['ok']:
+                if item.get('cached'):
+                    print_info(f"{label}压缩完成（缓存）: {path}")
+                else:
+                    print_info(f"{label}压缩完成: {path}")
+                    # 只缓存压缩工具确认成功的结果（npx 后备方式已排除输出未变化的情况），
+                    # 且压缩工具版本已知
+                    if keys.get(path) is not None:
+                        minify_cache_store(cache, keys[path], path, item['ms'])
+                entry['before'] += item['before']
+                entry['after'] += item['after']
+                entry['ms'] += item['ms']
+                if 'start' in item:
+                    profile_event(profile, f'minify {kind}', _profile_name(profile, path), item['start'],
+                                  item['ms'] / 1000, track=item['track'],
+                                  before=item['before'], after=item['after'])
             else:
-                # 判断如果是排除的文件，直接跳过不复制
-                if item in exclude_files:
-                    print_info(f"跳过排除的文件: {item}")
-                    continue  # 跳过当前文件，继续复制下一个
-                
-                # 对于img目录，只复制未包含在雪碧图中的图标
-                if "img" in source and item.endswith('.png'):
-                    # 动态从generate-sprite.py获取雪碧图图标列表
-                    import ast
-                    sprite_icons = set()
-                    try:
-                        # 读取generate-sprite.py文件（在项目根目录）
-                        script_dir = os.path.dirname(os.path.abspath(__file__))
-                        project_root = os.path.dirname(script_dir)
-                        generate_sprite_path = os.path.join(project_root, 'generate-sprite.py')
-                        with open(generate_sprite_path, 'r', encoding='utf-8') as f:
-                            tree = ast.parse(f.read(), filename='generate-sprite.py')
-                        
-                        # 遍历AST找到ICONS字典
-                        for node in ast.walk(tree):
-                            if isinstance(node, ast.Assign):
-                                for target in node.targets:
-                                    if isinstance(target, ast.Name) and target.id == 'ICONS':
-                                        if isinstance(node.value, ast.Dict):
-                                            # 解析字典内容
-                                            icons_dict = {}
-                                            for key, value in zip(node.value.keys, node.value.values):
-                                                # 处理键
-                                                if hasattr(ast, 'Constant') and isinstance(key, ast.Constant):
-                                                    category = key.value
-                                                elif hasattr(ast, 'Str') and isinstance(key, ast.Str):
-                                                    category = key.s
-                                                else:
-                                                    continue
-                                                
-                                                if isinstance(value, ast.List):
-                                                    icons = []
-                                                    for element in value.elts:
-                                                        # 处理值
-                                                        if hasattr(ast, 'Constant') and isinstance(element, ast.Constant):
-                                                            icons.append(element.value)
-                                                        elif hasattr(ast, 'Str') and isinstance(element, ast.Str):
-                                                            icons.append(element.s)
-                                                    icons_dict[category] = icons
-                                                
-                                            # 收集所有图标文件名
-                                            for category, icons in icons_dict.items():
-                                                for icon in icons:
-                                                    sprite_icons.add(icon)
-                                        break
-                    except Exception as e:
-                        print_error(f"获取雪碧图图标列表失败: {e}")
-                    
-                    if item in sprite_icons:
-                        print_info(f"跳过雪碧图中的图标: {item}")
-                        continue
-                
-                shutil.copy2(s, d)  # 不是排除文件才执行复制
-        print_info(f"复制目录完成: {source} -> {destination}")
+                print_error(f"{label}压缩失败 {path}: {item['error']}")
+                entry['failed'] += 1
+            _record_minify(manifest, path, item['ok'])
     except Exception as e:
-        print_error(f"复制目录失败 {source}: {e}")
+        print_error(f"压缩流程失败: {e}")
+    return stats
+
+def print_minify_summary(stats):
+    """打印压缩结果：文件数、失败数、压缩前后大小及压缩进程内的累计耗时"""
+    for kind, entry in stats.items():
+        label = 'CSS' if kind == 'css' else 'JavaScript'
+        print_info(f"{label}压缩: {entry['files']} 个文件（失败 {entry['failed']} 个），"
+                   f"{format_size(entry['before'])} → {format_size(entry['after'])}，"
+                   f"累计耗时 {entry['ms'] / 1000:.2f}s")
+
+def precompress_encodings():
+    """可用的预压缩格式：[(扩展名, 压缩函数, 参数标识)]，参数标识参与缓存键"""
+    encodings = []
+    if brotli is not None:
+        encodings.append(('.br', lambda data: brotli.compress(data, quality=BROTLI_QUALITY),
+                          f"brotli {getattr(brotli, '__version__', '')} q{BROTLI_QUALITY}"))
+    encodings.append(('.gz', lambda data: gzip.compress(data, GZIP_LEVEL, mtime=0), f'gzip {GZIP_LEVEL}'))
+    return encodings
+
+def _remove_precompressed(path):
+    """删除 path 的 .br / .gz 预压缩文件，返回删除的文件数"""
+    removed = 0
+    for suffix in PRECOMPRESS_SUFFIXES:
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+            removed += 1
+    return removed
+
+def collect_precompress_files(docs_dir):
+    """收集需要预压缩的文件，过小的文件删除之前生成的 .br / .gz
+
+    有带哈希副本的原文件（页面加载的是副本，见 fingerprint_assets()）只压缩副本。
+    """
+    fingerprinted = {os.path.join(docs_dir, *rel.split('/')) for rel in load_fingerprint_map(docs_dir)}
+    files = []
+    for root, _, names in os.walk(docs_dir):
+        for name in sorted(names):
+            if not name.endswith(PRECOMPRESS_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            if path not in fingerprinted and os.path.getsize(path) >= PRECOMPRESS_MIN_BYTES:
+                files.append(path)
+            else:
+                _remove_precompressed(path)
+    return files
+
+def remove_precompressed_files(docs_dir):
+    """未开启预压缩时删除之前生成的 .br / .gz（含原文件已删除的），避免它们留在 docs 中被发布，
+    返回删除的文件数"""
+    removed = 0
+    for root, _, names in os.walk(docs_dir):
+        for name in names:
+            stem, suffix = os.path.splitext(name)
+            if suffix in PRECOMPRESS_SUFFIXES and stem.endswith(PRECOMPRESS_EXTENSIONS):
+                os.remove(os.path.join(root, name))
+                removed += 1
+    return removed
+
+def _precompress_file(path, encodings, cache):
+    """为单个文件生成各格式的预压缩文件（在线程池中执行，不修改缓存索引）
+
+    返回每种格式一项：{'ext', 'key', 'hit', 'before', 'after', 'ms', 'output'}，
+    after 为 None 表示压缩后没有变小（不生成文件）；output 为需要存入缓存的新压缩结果。
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    results = []
+    for ext, compress, label in encodings:
+        key = hashlib.sha256(f'{MINIFY_CACHE_VERSION} precompress {label} {digest}'.encode('utf-8')).hexdigest()
+        entry, output = _cache_read(cache, key)
+        item = {'ext': ext, 'key': key, 'hit': entry is not None, 'before': len(data), 'ms': 0, 'output': None}
+        if entry is None:
+            start = time.perf_counter()
+            output = compress(data)
+            item['ms'] = (time.perf_counter() - start) * 1000
+            item['start'] = start
+            item['track'] = threading.current_thread().name
+            if len(output) >= len(data):
+                output = None
+            item['output'] = output
+
+        sibling = path + ext
+        if output is None:
+            if os.path.exists(sibling):
+                os.remove(sibling)
+        else:
+            _atomic_write(sibling, output)
+        item['after'] = None if output is None else len(output)
+        results.append(item)
+    return results
+
+def precompress_assets(docs_dir, cache=None, profile=None):
+    """为 docs 下的文本类资源并行生成 .br / .gz 预压缩文件（提供 profile 时记录每个文件的压缩耗时）
 
-def copy_file(source, destination):
-    """复制单个文件【修复：增加排除判断】"""
+    返回值：
+        dict: {扩展名: {'files', 'skipped', 'before', 'after', 'hits', 'ms'}}
+    """
+    stats = {}
     try:
-        # 提取文件名，判断是否在排除列表中
-        file_name = os.path.basename(source)
-        if file_name in exclude_files:
-            print_info(f"跳过排除的单个文件: {file_name}")
-            return  # 直接返回，不执行复制
-        
-        # 确保目标目录存在
-        dest_dir = os.path.dirname(destination)
-        if not os.path.exists(dest_dir):
-            os.makedirs(dest_dir)
-        
-        shutil.copy2(source, destination)
-        print_info(f"复制文件完成: {source} -> {destination}")
+        encodings = precompress_encodings()
+        if brotli is None:
+            print_info("未安装 brotli（pip install brotli），只生成 .gz 预压缩文件")
+        files = collect_precompress_files(docs_dir)
+        print_info(f"开始预压缩 {len(files)} 个文件（{PRECOMPRESS_WORKERS} 个线程）...")
+        with ThreadPoolExecutor(max_workers=PRECOMPRESS_WORKERS) as pool:
+            for path, results in zip(files, pool.map(lambda path: _precompress_file(path, encodings, cache),
+                                                     files)):
+                for item in results:
+                    if 'start' in item:
+                        profile_event(profile, 'precompress', _profile_name(profile, path) + item['ext'],
+                                      item['start'], item['ms'] / 1000, track=item['track'],
+                                      before=item['before'], after=item['after'])
+                    entry = stats.setdefault(item['ext'], {'files': 0, 'skipped': 0, 'before': 0,
+                                                           'after': 0, 'hits': 0, 'ms': 0})
+                    if item['after'] is None:
+                        entry['skipped'] += 1
+                    else:
+                        entry['files'] += 1
+                        entry['before'] += item['before']
+                        entry['after'] += item['after']
+                    entry['ms'] += item['ms']
+                    if cache is None:
+                        continue
+                    if item['hit']:
+                        entry['hits'] += 1
+                        cache['entries'][item['key']]['last_used'] = time.time()
+                    else:
+                        # 没有变小时记录为"无需压缩"，下次直接跳过
+                        _cache_write(cache, item['key'], item['output'], item['ms'])
     except Exception as e:
-        print_error(f"复制文件失败 {source}: {e}")
+        print_error(f"预压缩失败: {e}")
+    return stats
+
+def print_precompress_summary(stats):
+    """打印预压缩结果：生成的文件数、未变小而跳过的文件数、压缩前后大小及缓存命中数"""
+    for ext, entry in stats.items():
+        print_info(f"预压缩 {ext}: {entry['files']} 个文件（未变小跳过 {entry['skipped']} 个），"
+                   f"{format_size(entry['before'])} → {format_size(entry['after'])}，"
+                   f"缓存命中 {entry['hits']} 个，累计耗时 {entry['ms'] / 1000:.2f}s")
+
+def _is_fingerprinted_copy(directory, name):
+    """是否为文件指纹阶段生成的带哈希副本（同目录下存在去掉哈希后的原文件）"""
+    original = FINGERPRINTED_NAME.sub(r'\1', name)
+    return original != name and os.path.exists(os.path.join(directory, original))
+
+def _in_comment(text, position):
+    """position 是否在注释中（块注释、行注释、HTML 注释）"""
+    line = text[text.rfind('\n', 0, position) + 1:position]
+    if LINE_COMMENT.search(line):
+        return True
+    # 块注释开头前面应是行首、空白或标点，排除 'image/*' 这类字符串
+    start = text.rfind('/*', 0, position)
+    while start > 0 and not (text[start - 1].isspace() or text[start - 1] in ';{}(),'):
+        start = text.rfind('/*', 0, start)
+    if start >= 0 and text.rfind('*/', 0, position) < start:
+        return True
+    start = text.rfind('<!--', 0, position)
+    return start >= 0 and text.rfind('-->', 0, position) < start
+
+def is_url_reference(text, start, end):
+    """text[start:end] 是否是实际加载的地址：前面是加载地址的上下文，不在注释中，也不是对象的键"""
+    if not URL_CONTEXT.search(text, max(0, start - URL_CONTEXT_WINDOW), start):
+        return False
+    if re.match(r'["\']\s*:', text[end:end + 16]):
+        return False
+    return not _in_comment(text, start)
+
+def find_references(text, base_dirs, targets, urls_only=False):
+    """在文本中查找对 targets（相对 docs 的路径集合）中文件的引用
+
+    引用可以相对 base_dirs 中的目录（如文件所在目录、加载它的页面所在目录）或 docs 根目录，
+    文件名可以带指纹。urls_only 为 True 时只接受实际加载的地址（见 is_url_reference()），
+    否则文本中任何位置出现的文件名都算引用（如注释、对象的键），适合判断文件是否可能被用到。
+
+    返回值：
+        list: [(文件名起始位置, 结束位置, 被引用文件)]
+    """
+    extensions = sorted({posixpath.splitext(target)[1][1:] for target in targets} - {''})
+    if not extensions:
+        return []
+    pattern = re.compile(REFERENCE_TOKEN.format('|'.join(map(re.escape, extensions))))
+    references = []
+    for match in pattern.finditer(text):
+        token = match.group()
+        if urls_only and not is_url_reference(text, match.start(), match.end()):
+            continue
+        name = token.rpartition('/')[2]
+        original = FINGERPRINTED_NAME.sub(r'\1', name)
+        reference = token[:len(token) - len(name)] + original
+        if reference.startswith('/'):
+            candidates = [reference.lstrip('/')]
+        else:
+            candidates = [posixpath.join(base_dir, reference) for base_dir in base_dirs] + [reference]
+        for candidate in candidates:
+            candidate = posixpath.normpath(candidate)
+            if candidate in targets:
+                references.append((match.end() - len(name), match.end(), candidate))
+                break
+    return references
+
+def _fingerprinted_path(path, digest):
+    """带指纹的文件名，如 assets/js/app.js -> assets/js/app.1a2b3c4d.js"""
+    stem, ext = posixpath.splitext(path)
+    return f'{stem}.{digest}{ext}'
+
+def load_fingerprint_map(docs_dir):
+    """读取文件指纹映射 {原文件: 带哈希的副本}（相对 docs），未开启文件指纹时为空"""
+    try:
+        with open(os.path.join(docs_dir, ASSET_MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def fingerprint_assets(docs_dir, manifest, enabled=True):
+    """为页面直接加载的资源生成带内容哈希的副本，并改写 HTML 页面中的引用
+
+    副本与原文件内容完全相同，只改写 HTML 页面中实际加载的地址（见 is_url_reference()）；
+    CSS / JS / JSON 等其他文件（包括 Vite 构建产物）都不改写，它们之间的引用仍指向原文件。
+    其他文件中也出现的资源（被脚本 import、由 library-loader.js 按路径加载等）保持原文件名，
+    同一个模块只有一个地址，不会被加载两次。FINGERPRINT_EXCLUDE_DIRS 下的文件不加指纹。
+    enabled 为 False 时（在复制之前调用）删除带哈希的副本和文件名映射：复制来的页面清除
+    输出记录，随后按源文件重新复制；其他页面（如 Vite 构建产物）把改写的引用恢复为原文件名。
+
+    返回值：
+        dict: {'assets', 'rewritten', 'removed'}
+    """
+    stats = {'assets': 0, 'rewritten': 0, 'removed': 0}
+    manifest_path = os.path.join(docs_dir, ASSET_MANIFEST)
+    previous = load_fingerprint_map(docs_dir)
+    if not enabled and not previous:
+        return stats
+
+    def relative(path):
+        return os.path.relpath(path, docs_dir).replace(os.sep, '/')
+
+    # 加指纹的文件：本次复制的输出（不含 Vite 构建产物，它们已自带哈希）
+    assets = set()
+    copied = set()
+    for key in manifest['sources']:
+        path = os.path.join(manifest['root'], key)
+        rel = relative(path)
+        copied.add(rel)
+        if (rel.split('/')[0] in FINGERPRINT_DIRS and not rel.endswith(FINGERPRINT_EXCLUDE_EXTENSIONS)
+                and not rel.startswith(FINGERPRINT_EXCLUDE_DIRS) and os.path.isfile(path)):
+            assets.add(rel)
+
+    pages = {}
+    shared = set()
+    for root, _, names in os.walk(docs_dir):
+        for name in names:
+            if not name.endswith(REFERENCE_EXTENSIONS) or _is_fingerprinted_copy(root, name):
+                continue
+            path = os.path.join(root, name)
+            rel = relative(path)
+            if rel == ASSET_MANIFEST:
+                continue
+            if not name.endswith('.html'):
+                if enabled:
+                    # 其他文件中出现的资源（不论是否为加载地址）都保持原文件名
+                    with open(path, 'r', encoding='utf-8', errors='surrogateescape') as f:
+                        text = f.read()
+                    shared.update(target for _, _, target
+                                  in find_references(text, [posixpath.dirname(rel)], assets))
+                continue
+            if not enabled and rel in copied:
+                # 改写过的复制来的页面：清除输出记录，随后的复制步骤按源文件重新复制
+                manifest['outputs'].pop(_manifest_key(manifest, path), None)
+                continue
+            with open(path, 'r', encoding='utf-8', errors='surrogateescape', newline='') as f:
+                pages[rel] = f.read()
+
+    hashes = {}
+    for rel, text in sorted(pages.items()):
+        parts = []
+        last = 0
+        for start, end, target in find_references(text, [posixpath.dirname(rel)], assets,
+                                                  urls_only=True):
+            name = posixpath.basename(target)
+            if enabled and target not in shared:
+                if target not in hashes:
+                    hashes[target] = file_sha256(os.path.join(docs_dir, target))[:FINGERPRINT_LENGTH]
+                name = posixpath.basename(_fingerprinted_path(target, hashes[target]))
+            parts.append(text[last:start] + name)
+            last = end
+        rewritten = ''.join(parts) + text[last:]
+        if rewritten != text:
+            path = os.path.join(docs_dir, rel)
+            _atomic_write(path, rewritten)
+            stats['rewritten'] += 1
+            if _manifest_key(manifest, path) in manifest['outputs']:
+                _record_output(manifest, path)
+
+    current = {rel: _fingerprinted_path(rel, digest) for rel, digest in sorted(hashes.items())}
+    for rel, hashed in current.items():
+        hashed_path = os.path.join(docs_dir, hashed)
+        if not os.path.exists(hashed_path):
+            # 独立副本：原文件之后可能被复制覆盖或原地压缩，不能与其共享数据
+            shutil.copy2(os.path.join(docs_dir, rel), hashed_path)
+    for hashed in set(previous.values()) - set(current.values()):
+        hashed_path = os.path.join(docs_dir, hashed)
+        for path in [hashed_path] + [hashed_path + suffix for suffix in PRECOMPRESS_SUFFIXES]:
+            if os.path.exists(path):
+                os.remove(path)
+        stats['removed'] += 1
+    if enabled:
+        _atomic_write_json(manifest_path, current, indent=2, sort_keys=True)
+    else:
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        _remove_precompressed(manifest_path)
+    stats['assets'] = len(current)
+    return stats
+
+def find_reachable_files(docs_dir):
+    """从 docs 下所有 HTML 入口沿引用关系遍历，返回可达文件的集合（相对 docs 的路径）
+
+    引用包括 script / link 标签、library-loader.js 中的 URL、Worker 地址、import 等
+    字符串中的路径；页面加载的脚本中的相对路径同时按页面所在目录解析。
+    """
+    files = set()
+    for root, _, names in os.walk(docs_dir):
+        for name in names:
+            files.add(os.path.relpath(os.path.join(root, name), docs_dir).replace(os.sep, '/'))
+    entries = sorted(rel for rel in files if rel.endswith('.html'))
+    reachable = set(entries)
+    texts = {}
+    queue = [(rel, posixpath.dirname(rel)) for rel in entries]
+    seen = set(queue)
+    while queue:
+        rel, page_dir = queue.pop()
+        if not rel.endswith(REFERENCE_EXTENSIONS):
+            continue
+        if rel not in texts:
+            with open(os.path.join(docs_dir, rel), 'r', encoding='utf-8', errors='surrogateescape') as f:
+                texts[rel] = f.read()
+        for _, _, target in find_references(texts[rel], [posixpath.dirname(rel), page_dir], files):
+            reachable.add(target)
+            if (target, page_dir) not in seen:
+                seen.add((target, page_dir))
+                queue.append((target, page_dir))
+    return reachable
+
+def _library_name(rel):
+    """未引用文件的汇总单位：第三方库目录下按库，其余按所在目录"""
+    for prefix in LIBRARY_DIRS:
+        if rel.startswith(prefix):
+            return prefix + rel[len(prefix):].split('/')[0]
+    return posixpath.dirname(rel)
+
+def prune_unreachable(docs_dir, manifest, exclude=False):
+    """找出 PRUNE_DIRS 下复制的、从任何 HTML 入口都引用不到的文件，exclude 时从 docs 中删除
+
+    返回值：
+        dict: {库或目录: [文件数, 字节数]}
+    """
+    reachable = find_reachable_files(docs_dir)
+    unused = {}
+    for key in sorted(manifest['sources']):
+        path = os.path.join(manifest['root'], key)
+        rel = os.path.relpath(path, docs_dir).replace(os.sep, '/')
+        if (not rel.startswith(PRUNE_DIRS) or rel.startswith(PRUNE_KEEP) or rel in reachable
+                or not os.path.isfile(path)):
+            continue
+        entry = unused.setdefault(_library_name(rel), [0, 0])
+        entry[0] += 1
+        entry[1] += os.path.getsize(path)
+        if exclude:
+            # 从清单中移除，下次构建重新复制后再按引用关系判断
+            for output in [path] + [path + suffix for suffix in PRECOMPRESS_SUFFIXES]:
+                if os.path.exists(output):
+                    os.remove(output)
+            manifest['sources'].pop(key)
+            manifest['outputs'].pop(key, None)
+            manifest['minified'].discard(key)
+            manifest['optimized'].discard(key)
+    return unused
+
+def print_prune_report(unused, excluded):
+    """按库打印未被引用的文件数和字节数（即排除后节省的部署大小）"""
+    if not unused:
+        print_info("引用图检查: 所有复制的 JS 目录文件都被页面引用")
+        return
+    total = sum(size for _, size in unused.values())
+    action = '已从 docs 中排除' if excluded else '可用 --prune-unused 从 docs 中排除'
+    print_info(f"引用图检查: {sum(count for count, _ in unused.values())} 个文件未被任何页面引用，"
+               f"共 {format_size(total)}（{action}）")
+    for library, (count, size) in sorted(unused.items(), key=lambda item: -item[1][1]):
+        print_info(f"  {library:<48} {count:4} 个文件 {format_size(size):>9}")
+
+def print_fingerprint_summary(stats):
+    """打印文件指纹结果：带哈希的文件数、改写引用的页面数、删除的旧副本数"""
+    print_info(f"文件指纹: {stats['assets']} 个文件，改写 {stats['rewritten']} 个页面，"
+               f"删除旧的带哈希副本 {stats['removed']} 个（映射见 docs/{ASSET_MANIFEST}）")
+
+def collect_asset_sizes(docs_dir, manifest):
+    """统计 docs 下每个文件的大小：{相对路径: {'raw', 'minified', 'gzip', 'brotli'}}
 
-def compress_css_files(directory):
-    """压缩 CSS 文件"""
+    raw 为源文件大小（Vite 构建产物等不是复制来的文件同 minified）；gzip / brotli 优先取
+    预压缩文件的大小，没有 .gz 的文本类文件现场计算（结果记录在 manifest['gzip_sizes'] 中，
+    大小和修改时间不变时直接使用），不适用的为 None。
+    """
+    sizes = {}
+    gzip_sizes = {}
+    for root, _, names in os.walk(docs_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            if name.endswith(PRECOMPRESS_SUFFIXES) and os.path.exists(path[:-3]):
+                continue
+            rel = os.path.relpath(path, docs_dir).replace(os.sep, '/')
+            if rel == ASSET_MANIFEST or _is_fingerprinted_copy(root, name):
+                continue
+            stat = os.stat(path)
+            size = stat.st_size
+            key = _manifest_key(manifest, path)
+            source = manifest['sources'].get(key)
+            entry = {'raw': source['size'] if source else size, 'minified': size,
+                     'gzip': None, 'brotli': None}
+            for metric, suffix in [('gzip', '.gz'), ('brotli', '.br')]:
+                if os.path.exists(path + suffix):
+                    entry[metric] = os.path.getsize(path + suffix)
+            if entry['gzip'] is None and name.endswith(PRECOMPRESS_EXTENSIONS):
+                cached = manifest['gzip_sizes'].get(key)
+                if cached and cached[:2] == [size, stat.st_mtime_ns]:
+                    entry['gzip'] = cached[2]
+                else:
+                    with open(path, 'rb') as f:
+                        entry['gzip'] = min(size, len(gzip.compress(f.read(), GZIP_LEVEL, mtime=0)))
+                gzip_sizes[key] = [size, stat.st_mtime_ns, entry['gzip']]
+            sizes[rel] = entry
+    manifest['gzip_sizes'] = gzip_sizes
+    return sizes
+
+def check_size_budgets(sizes):
+    """按 SIZE_BUDGETS 检查，返回超出预算的 [(文件, 指标, 大小, 上限)]"""
+    violations = []
+    for rel, entry in sorted(sizes.items()):
+        checked = set()
+        for pattern, metric, limit in SIZE_BUDGETS:
+            if metric in checked or not fnmatch.fnmatch(rel, pattern):
+                continue
+            checked.add(metric)
+            if entry.get(metric) is not None and entry[metric] > limit:
+                violations.append((rel, metric, entry[metric], limit))
+    return violations
+
+def diff_asset_sizes(baseline, sizes):
+    """与基准比较部署大小，返回 (体积回退的 [(文件, 基准大小, 当前大小)], 新增文件数, 删除文件数, 总大小变化)"""
+    regressions = []
+    for rel, entry in sorted(sizes.items()):
+        if rel not in baseline:
+            continue
+        before, after = baseline[rel]['minified'], entry['minified']
+        if after - before > max(SIZE_GROWTH_MIN_BYTES, before * SIZE_GROWTH_THRESHOLD):
+            regressions.append((rel, before, after))
+    added = len(set(sizes) - set(baseline))
+    removed = len(set(baseline) - set(sizes))
+    delta = (sum(entry['minified'] for entry in sizes.values())
+             - sum(entry['minified'] for entry in baseline.values()))
+    return regressions, added, removed, delta
+
+def _load_size_file(project_root, name):
     try:
-        css_files = []
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if file.endswith('.css') and not file.endswith('.min.css'):
-                    css_files.append(os.path.join(root, file))
-        
-        if css_files:
-            print_info(f"开始压缩 {len(css_files)} 个CSS文件...")
-            for css_file in css_files:
-                try:
-                    # 使用 npx cleancss 压缩 CSS
-                    subprocess.run(
-                        ['npx', 'cleancss', css_file, '-o', css_file],
-                        check=True,
-                        shell=True  # 在 Windows 上使用 shell
-                    )
-                    print_info(f"CSS压缩完成: {css_file}")
-                except Exception as e:
-                    print_error(f"CSS压缩失败 {css_file}: {e}")
+        with open(os.path.join(project_root, name), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data.get('assets') if data.get('version') == SIZE_REPORT_VERSION else None
+
+def _save_size_file(project_root, name, sizes):
+    totals = {metric: sum(entry[metric] or 0 for entry in sizes.values())
+              for metric in ('raw', 'minified', 'gzip', 'brotli')}
+    _atomic_write_json(os.path.join(project_root, name),
+                       {'version': SIZE_REPORT_VERSION, 'totals': totals, 'assets': sizes},
+                       indent=1, sort_keys=True)
+
+def check_asset_sizes(project_root, sizes, accept=False):
+    """写出体积报告（sizes 见 collect_asset_sizes()），检查预算并与基准比较，返回是否通过
+
+    检查通过（或 accept 为 True，接受体积增长）时把本次报告作为新的基准，未接受的体积回退
+    不会更新基准，之后的构建会继续提示；超出预算始终不通过。
+    """
+    _save_size_file(project_root, SIZE_REPORT, sizes)
+    baseline = _load_size_file(project_root, SIZE_BASELINE)
+    violations = check_size_budgets(sizes)
+    regressions, added, removed, delta = diff_asset_sizes(baseline or {}, sizes)
+
+    total = sum(entry['minified'] for entry in sizes.values())
+    total_gzip = sum(entry['gzip'] or entry['minified'] for entry in sizes.values())
+    print_info(f"体积报告: {len(sizes)} 个文件，部署 {format_size(total)}（gzip 后 {format_size(total_gzip)}），"
+               f"见 {SIZE_REPORT}")
+    if baseline is None:
+        print_info("体积对比: 没有基准，本次报告将作为基准")
+    else:
+        sign = '+' if delta >= 0 else '-'
+        print_info(f"体积对比: 新增 {added} 个文件，删除 {removed} 个文件，"
+                   f"部署大小 {sign}{format_size(abs(delta))}")
+    for rel, metric, size, limit in violations:
+        print_error(f"超出体积预算: {rel} {metric} {format_size(size)} > {format_size(limit)}")
+    for rel, before, after in regressions:
+        message = f"体积回退: {rel} {format_size(before)} → {format_size(after)}（+{(after - before) * 100 / before:.0f}%）"
+        if accept:
+            print_info(f"{message}，已接受")
         else:
-            print_info("无需要压缩的CSS文件")
-    except Exception as e:
-        print_error(f"CSS压缩流程失败: {e}")
+            print_error(message)
+    if regressions and not accept:
+        print_error("确认体积增长符合预期后可用 --accept-size-changes 更新基准")
+
+    if not regressions or accept:
+        _save_size_file(project_root, SIZE_BASELINE, sizes)
+    return not violations and (accept or not regressions)
 
-def compress_js_files(directory):
-    """压缩 JavaScript 文件"""
+def _png_candidates(image):
+    """PNG 的候选图像：原图，以及无损时的灰度和调色板版本（是否无损由调用方验证）"""
+    candidates = [image]
+    if image.mode in ('RGB', 'RGBA'):
+        candidates.append(image.convert('L' if image.mode == 'RGB' else 'LA'))
+        colors = image.getcolors(256)
+        if colors is not None:
+            if image.mode == 'RGB':
+                # 不超过 256 种颜色：用图中的全部颜色作调色板，映射是精确的
+                palette = Image.new('P', (1, 1))
+                palette.putpalette([channel for _, color in colors for channel in color])
+                candidates.append(image.quantize(palette=palette, dither=Image.Dither.NONE))
+            else:
+                candidates.append(image.quantize(colors=len(colors), method=Image.Quantize.FASTOCTREE))
+    return candidates
+
+def _same_pixels(image, other):
+    """两张图像素是否完全相同（模式不同时按 RGBA 比较）"""
+    if image.size != other.size:
+        return False
+    if image.mode == other.mode and image.mode not in ('P', 'PA'):
+        return image.tobytes() == other.tobytes()
+    if image.mode not in ('1', 'L', 'LA', 'P', 'PA', 'RGB', 'RGBA'):
+        return False  # 16 位等高位深图像只接受同模式的结果
+    return image.convert('RGBA').tobytes() == other.convert('RGBA').tobytes()
+
+def _optimize_png(path):
+    with Image.open(path) as image:
+        if getattr(image, 'is_animated', False):
+            return None, '动画 PNG'
+        if image.getexif().get(EXIF_ORIENTATION, 1) != 1:
+            return None, '带 EXIF 方向标签'
+        image.load()
+        # 保留 ICC 颜色配置（影响显示效果），其余元数据（文本、EXIF、时间等）不写出
+        icc_profile = image.info.get('icc_profile')
+        best = None
+        for candidate in _png_candidates(image):
+            buffer = io.BytesIO()
+            options = {'optimize': True}
+            if icc_profile:
+                options['icc_profile'] = icc_profile
+            candidate.save(buffer, 'PNG', **options)
+            data = buffer.getvalue()
+            if best is not None and len(data) >= len(best):
+                continue
+            with Image.open(io.BytesIO(data)) as decoded:
+                if _same_pixels(image, decoded):
+                    best = data
+    return best, None
+
+def _optimize_jpeg(path):
+    with Image.open(path) as image:
+        if image.getexif().get(EXIF_ORIENTATION, 1) != 1:
+            return None, '带 EXIF 方向标签'
+    # JPEG 重新编码会损失画质，只用 jpegtran 做无损优化（霍夫曼表优化、渐进式、去掉元数据）
+    jpegtran = shutil.which('jpegtran')
+    if jpegtran is None:
+        return None, '未找到 jpegtran'
+    best = None
+    for extra in ([], ['-progressive']):
+        proc = subprocess.run([jpegtran, '-copy', 'none', '-optimize', *extra, path], capture_output=True)
+        if proc.returncode == 0 and proc.stdout and (best is None or len(proc.stdout) < len(best)):
+            best = proc.stdout
+    return best, None
+
+def _optimize_image_file(path):
+    """在进程池中执行：无损重新压缩一张 PNG / JPEG
+
+    返回值：
+        tuple: (压缩结果，None 表示无法变小或不处理, 开始时间, 耗时 ms, 进程 id, 不处理的原因)
+    """
+    start = time.perf_counter()
     try:
-        js_files = []
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if file.endswith('.js') and not file.endswith('.min.js') and file not in exclude_js_files:
-                    js_files.append(os.path.join(root, file))
-        
-        if js_files:
-            print_info(f"开始压缩 {len(js_files)} 个JavaScript文件...")
-            for js_file in js_files:
-                try:
-                    # 使用 npx terser 压缩 JavaScript
-                    # --keep-classnames 和 --keep-fnames 保留 Vue 相关的类名和函数名
-                    subprocess.run(
-                        ['npx', 'terser', js_file, '-o', js_file, '--compress', '--mangle', '--keep-classnames', '--keep-fnames'],
-                        check=True,
-                        shell=True  # 在 Windows 上使用 shell
-                    )
-                    print_info(f"JS压缩完成: {js_file}")
-                except Exception as e:
-                    print_error(f"JS压缩失败 {js_file}: {e}")
+        if path.lower().endswith('.png'):
+            output, reason = _optimize_png(path)
         else:
-            print_info("无需要压缩的JavaScript文件")
+            output, reason = _optimize_jpeg(path)
     except Exception as e:
-        print_error(f"JS压缩流程失败: {e}")
+        output, reason = None, str(e)
+    if output is not None and len(output) >= os.path.getsize(path):
+        output = None
+    return output, start, (time.perf_counter() - start) * 1000, os.getpid(), reason
+
+def _image_cache_key(data):
+    tool = 'jpegtran' if shutil.which('jpegtran') else ''
+    config = f'{MINIFY_CACHE_VERSION} image {IMAGE_OPTIMIZE_VERSION} pillow {PIL.__version__} {tool} '
+    return hashlib.sha256(config.encode('utf-8') + data).hexdigest()
+
+def optimize_images(work, docs_dir, manifest=None, cache=None, profile=None):
+    """用进程池无损重新压缩工作列表中复制的 PNG / JPEG，没有变小的文件保持原样
+
+    结果按内容哈希存入压缩缓存（优化后的内容也记为"无需优化"），再次构建时直接写入。
+    改写过的输出记录在 manifest['optimized'] 中，关闭优化后由 restore_optimized_images() 撤销。
+
+    返回值：
+        dict: {目录（相对 docs）: {'files', 'optimized', 'before', 'after'}}
+    """
+    stats = {}
+    if Image is None:
+        print_error("图片优化需要 Pillow（pip install Pillow），已跳过")
+        return stats
+    files = [destination for source, destination, _, _ in work
+             if source is not None and destination.lower().endswith(IMAGE_EXTENSIONS)
+             and os.path.exists(destination)]
+
+    def record(path, before, after):
+        directory = os.path.relpath(os.path.dirname(path), docs_dir).replace(os.sep, '/')
+        entry = stats.setdefault(directory, {'files': 0, 'optimized': 0, 'before': 0, 'after': 0})
+        entry['files'] += 1
+        entry['optimized'] += after < before
+        entry['before'] += before
+        entry['after'] += after
 
-def main():
+    def write(path, data):
+        _atomic_write(path, data)
+        if manifest is None:
+            return
+        key = _manifest_key(manifest, path)
+        if key in manifest['outputs']:
+            _record_output(manifest, path)
+            manifest['optimized'].add(key)
+
+    def remember(key, data, ms):
+        if cache is not None:
+            _cache_write(cache, key, data, ms)
+
+    pending = []
+    hits = 0
+    for path in files:
+        with open(path, 'rb') as f:
+            data = f.read()
+        key = _image_cache_key(data)
+        entry, output = _cache_read(cache, key)
+        if entry is None:
+            pending.append((path, key, len(data)))
+            continue
+        hits += 1
+        entry['last_used'] = time.time()
+        if output is not None:
+            write(path, output)
+        record(path, len(data), len(output) if output is not None else len(data))
+
+    if pending:
+        print_info(f"开始优化 {len(pending)} 张图片（{min(IMAGE_WORKERS, len(pending))} 个进程，"
+                   f"缓存命中 {hits} 张）...")
+        with ProcessPoolExecutor(max_workers=min(IMAGE_WORKERS, len(pending))) as pool:
+            results = pool.map(_optimize_image_file, [path for path, _, _ in pending])
+            for (path, key, before), (output, start, ms, pid, reason) in zip(pending, results):
+                if reason:
+                    print_info(f"跳过图片优化（{reason}）: {path}")
+                profile_event(profile, 'image', _profile_name(profile, path), start, ms / 1000,
+                              track=f'image {pid}', before=before,
+                              after=len(output) if output is not None else before)
+                remember(key, output, ms)
+                if output is not None:
+                    write(path, output)
+                    # 优化后的内容再次遇到时无需优化
+                    remember(_image_cache_key(output), None, 0)
+                record(path, before, len(output) if output is not None else before)
+    elif files:
+        print_info(f"图片优化缓存命中 {hits} 张，无需重新优化")
+    return stats
+
+def restore_optimized_images(manifest):
+    """未开启图片优化时（在复制之前调用）清除优化过的输出的记录，随后的复制步骤按源文件重新复制，
+    返回清除的文件数"""
+    for key in manifest['optimized']:
+        manifest['outputs'].pop(key, None)
+    count = len(manifest['optimized'])
+    manifest['optimized'].clear()
+    return count
+
+def print_image_summary(stats):
+    """按目录打印图片优化结果：变小的文件数和节省的大小"""
+    if not stats:
+        return
+    print_info("===== 图片优化 =====")
+    for directory, entry in sorted(stats.items(), key=lambda item: item[1]['after'] - item[1]['before']):
+        saved = entry['before'] - entry['after']
+        percent = saved * 100 / entry['before'] if entry['before'] else 0
+        print_info(f"{directory:<40} {entry['optimized']:3}/{entry['files']:<3} 张变小  "
+                   f"{format_size(entry['before'])} → {format_size(entry['after'])} (-{percent:.1f}%)")
+    before = sum(entry['before'] for entry in stats.values())
+    after = sum(entry['after'] for entry in stats.values())
+    print_info(f"{'合计':<40} 节省 {format_size(before - after)}")
+
+def new_build_profile(project_root):
+    """构建耗时记录：各阶段及每个文件的耗时事件（时间相对构建开始）"""
+    return {'root': project_root, 'origin': time.perf_counter(), 'stages': [], 'events': []}
+
+def _profile_name(profile, path):
+    """事件名称：相对项目根目录的路径"""
+    if profile is None:
+        return path
+    return os.path.relpath(path, profile['root']).replace(os.sep, '/')
+
+def profile_event(profile, category, name, start, seconds, track='main', **args):
+    """记录一个耗时事件，start 为 time.perf_counter() 时间，track 为 trace 中的时间线（线程或进程）"""
+    if profile is None:
+        return
+    profile['events'].append({'cat': category, 'name': name, 'start': start - profile['origin'],
+                              'seconds': seconds, 'track': track, 'args': args})
+
+def record_timing(profile, name, start):
+    """记录一个构建阶段的耗时，返回下一阶段的开始时间"""
+    now = time.perf_counter()
+    profile['stages'].append((name, now - start))
+    profile_event(profile, 'stage', name, start, now - start, track='构建阶段')
+    return now
+
+def _slowest_files(profile):
+    return sorted((event for event in profile['events'] if event['cat'] != 'stage'),
+                  key=lambda event: -event['seconds'])[:SLOWEST_FILES]
+
+def save_build_profile(profile):
+    """写出耗时汇总（JSON）和 Chrome trace 事件文件"""
+    total = sum(seconds for _, seconds in profile['stages'])
+    by_category = {}
+    for event in profile['events']:
+        if event['cat'] != 'stage':
+            entry = by_category.setdefault(event['cat'], {'files': 0, 'seconds': 0})
+            entry['files'] += 1
+            entry['seconds'] += event['seconds']
+    summary = {
+        'total_seconds': round(total, 4),
+        'stages': [{'name': name, 'seconds': round(seconds, 4)} for name, seconds in profile['stages']],
+        'categories': {category: {'files': entry['files'], 'seconds': round(entry['seconds'], 4)}
+                       for category, entry in by_category.items()},
+        'slowest_files': [{'category': event['cat'], 'name': event['name'],
+                           'seconds': round(event['seconds'], 4), **event['args']}
+                          for event in _slowest_files(profile)],
+        'files': [{'category': event['cat'], 'name': event['name'], 'start': round(event['start'], 4),
+                   'seconds': round(event['seconds'], 4), 'track': event['track'], **event['args']}
+                  for event in profile['events'] if event['cat'] != 'stage'],
+    }
+
+    # trace 事件：每条时间线对应一个线程（tid），时间单位为微秒
+    tracks = ['构建阶段', 'main']
+    for event in profile['events']:
+        if event['track'] not in tracks:
+            tracks.append(event['track'])
+    pid = os.getpid()
+    trace_events = [{'ph': 'M', 'name': 'process_name', 'pid': pid, 'tid': 0,
+                     'args': {'name': 'copy-static.py'}}]
+    trace_events += [{'ph': 'M', 'name': 'thread_name', 'pid': pid, 'tid': tid, 'args': {'name': track}}
+                     for tid, track in enumerate(tracks)]
+    trace_events += [{'ph': 'X', 'cat': event['cat'], 'name': event['name'], 'pid': pid,
+                      'tid': tracks.index(event['track']), 'ts': round(event['start'] * 1e6, 1),
+                      'dur': round(event['seconds'] * 1e6, 1), 'args': event['args']}
+                     for event in profile['events']]
+
+    for name, data in [(BUILD_PROFILE, summary),
+                       (BUILD_TRACE, {'traceEvents': trace_events, 'displayTimeUnit': 'ms'})]:
+        _atomic_write_json(os.path.join(profile['root'], name), data, ensure_ascii=False, indent=1)
+
+def print_timing_breakdown(profile):
+    """打印各构建阶段的耗时及占比（从慢到快），以及最慢的文件"""
+    total = sum(seconds for _, seconds in profile['stages']) or 1
+    print_info("===== 构建耗时 =====")
+    for name, seconds in sorted(profile['stages'], key=lambda stage: -stage[1]):
+        print_info(f"{name:<12} {seconds:8.2f}s {seconds * 100 / total:6.1f}%")
+    print_info(f"{'合计':<12} {total:8.2f}s")
+    slowest = _slowest_files(profile)
+    if slowest:
+        print_info(f"===== 最慢的 {len(slowest)} 个文件 =====")
+        for event in slowest:
+            print_info(f"{event['cat']:<12} {event['seconds']:8.3f}s  {event['name']}")
+    print_info(f"耗时明细: {BUILD_PROFILE}，trace: {BUILD_TRACE}（可用 Perfetto 打开）")
+
+def main(argv=None):
     """主函数"""
+    parser = argparse.ArgumentParser(description='静态资源复制和压缩')
+    parser.add_argument('--link-mode', choices=sorted(LINK_MODES), default='copy',
+                        help='不需要压缩的文件的写出方式：copy 复制（默认），'
+                             'auto 依次尝试 reflink / copy_file_range / 硬链接，hardlink 优先硬链接')
+    parser.add_argument('--report-unused', action='store_true',
+                        help='按引用图报告 assets/js 下未被任何页面引用的文件')
+    parser.add_argument('--prune-unused', action='store_true',
+                        help='报告并从 docs 中排除未被任何页面引用的文件')
+    parser.add_argument('--optimize-images', action='store_true',
+                        help='无损重新压缩复制的 PNG / JPEG（多进程，结果按内容哈希缓存）')
+    parser.add_argument('--fingerprint', action='store_true',
+                        help='为页面直接加载的资源生成带内容哈希的副本并改写页面中的引用，'
+                             '写出 docs/asset-manifest.json')
+    parser.add_argument('--precompress', action='store_true',
+                        help='为文本类资源生成 .br / .gz 预压缩文件（GitHub Pages 不使用，'
+                             '部署到支持预压缩文件的服务器时开启）')
+    parser.add_argument('--no-size-check', action='store_true',
+                        help='不生成体积报告，不检查体积预算和体积回退')
+    parser.add_argument('--accept-size-changes', action='store_true',
+                        help='接受本次的体积增长，更新体积对比的基准')
+    parser.add_argument('--enforce-size-budget', action='store_true',
+                        help='超出体积预算或体积回退时以非零状态退出（默认只警告）')
+    args = parser.parse_args(argv)
+    
     print_info("===== 开始执行静态资源复制和压缩 =====")
     
     # 获取项目根目录（脚本在 scripts/ 目录下）
     script_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.dirname(script_dir)
     
-    # 生成雪碧图
+    profile = new_build_profile(project_root)
+    start = time.perf_counter()
+    
+    # 生成雪碧图（在当前进程内调用，同时取得雪碧图图标列表供复制 img 目录时过滤）
     print_info("===== 开始生成雪碧图 =====")
+    sprite_icons = frozenset()
+    sprite_css = None
+    cwd = os.getcwd()
     try:
-        import subprocess
-        generate_sprite_path = os.path.join(project_root, 'generate-sprite.py')
-        subprocess.run(['python', generate_sprite_path], check=True, capture_output=False, text=True)
-        print_info("雪碧图生成成功")
+        sprite_module = load_sprite_module(project_root)
+        sprite_css = os.path.join(project_root, *sprite_module.OUTPUT_CSS.split('/'))
+        # generate-sprite.py 中的路径相对于项目根目录
+        os.chdir(project_root)
+        # 雪碧图图标列表取自图标登记表（ICONS + 按文件名约定自动发现的图标），
+        # 登记表只读取一次，过滤 img 目录和生成雪碧图共用
+        registry = sprite_module.load_icon_registry()
+        sprite_icons = frozenset(sprite_module.sprite_icon_names(registry=registry))
+        build = sprite_module.build_sprite(registry=registry)
+        if build is None:
+            print_error("生成雪碧图失败: 没有找到任何图标文件")
+        else:
+            sprite_module.write_sprite(build)
+            print_info("雪碧图生成成功")
     except Exception as e:
         print_error(f"生成雪碧图失败: {e}")
+    finally:
+        os.chdir(cwd)
+    start = record_timing(profile, '生成雪碧图', start)
     
     # 定义源目录和目标目录
     src_dir = os.path.join(project_root, 'src')
     docs_dir = os.path.join(project_root, 'docs')
+    manifest = load_copy_manifest(project_root, args.link_mode, profile)
+    minify_cache = load_minify_cache(project_root)
     
-    # 复制 CSS 文件
-    css_source = os.path.join(src_dir, 'assets', 'css')
-    css_dest = os.path.join(docs_dir, 'assets', 'css')
-    if os.path.exists(css_source):
-        copy_directory(css_source, css_dest)
+    # 一次遍历 src 生成复制工作列表（CSS、JS、资源目录、gadgets、src 根目录文件），
+    # 复制和压缩都使用这个列表
+    work, directories = scan_copy_work(src_dir, docs_dir, compile_copy_rules(sprite_icons))
+    print_info(f"扫描 src 完成: {len(work)} 个文件，{len(directories)} 个目录")
+    # 雪碧图 CSS 由生成脚本直接写入 docs，不经过复制，但同样需要压缩
+    if sprite_css and os.path.exists(sprite_css):
+        work.append((None, sprite_css, 'css', None))
+    start = record_timing(profile, '扫描 src', start)
     
-    # 复制 js 文件
-    js_source = os.path.join(src_dir, 'assets', 'js')
-    js_dest = os.path.join(docs_dir, 'assets', 'js')
-    if os.path.exists(js_source):
-        copy_directory(js_source, js_dest)
+    # 未开启文件指纹：在复制之前撤销上次的指纹（改写过的复制输出随后重新复制）
+    if not args.fingerprint:
+        try:
+            fingerprint_assets(docs_dir, manifest, enabled=False)
+        except Exception as e:
+            print_error(f"撤销文件指纹失败: {e}")
+        start = record_timing(profile, '撤销文件指纹', start)
+    # 未开启图片优化：上次优化过的图片按源文件重新复制
+    if not args.optimize_images:
+        restored = restore_optimized_images(manifest)
+        if restored:
+            print_info(f"未开启图片优化，按源文件重新复制之前优化过的 {restored} 张图片")
+    copy_work(work, directories, manifest)
     
-    # 复制其他资源目录
-    resource_dirs = [
-        'dar_svga',
-        'mingren_gift_1photo',
-        'sth_auto_img',
-        'svga',
-        'xunzhang',
-        'img'
-    ]
+    # 清理源文件已不存在的输出
+    remove_stale_outputs(manifest)
+    start = record_timing(profile, '复制文件', start)
     
-    for resource_dir in resource_dirs:
-        source = os.path.join(src_dir, 'assets', resource_dir)
-        dest = os.path.join(docs_dir, 'assets', resource_dir)
-        if os.path.exists(source):
-            copy_directory(source, dest)
+    # 按引用图找出未被页面引用的文件（在压缩之前排除，省去压缩它们的时间）
+    unused = None
+    if args.report_unused or args.prune_unused:
+        try:
+            unused = prune_unreachable(docs_dir, manifest, exclude=args.prune_unused)
+        except Exception as e:
+            print_error(f"引用图检查失败: {e}")
+        start = record_timing(profile, '引用图检查', start)
     
-    # 复制 gadgets 目录（跳过 .html 文件，保留 Vite 构建生成的 HTML）
-    gadgets_source = os.path.join(src_dir, 'gadgets')
-    gadgets_dest = os.path.join(docs_dir, 'gadgets')
-    if os.path.exists(gadgets_source):
-        if not os.path.exists(gadgets_dest):
-            os.makedirs(gadgets_dest)
-        for root, dirs, files in os.walk(gadgets_source):
-            rel_root = os.path.relpath(root, gadgets_source)
-            dest_root = os.path.join(gadgets_dest, rel_root) if rel_root != '.' else gadgets_dest
-            for d in dirs:
-                dest_dir = os.path.join(dest_root, d)
-                if not os.path.exists(dest_dir):
-                    os.makedirs(dest_dir)
-            for f in files:
-                if f.endswith('.html'):
-                    print_info(f"跳过 HTML 文件（保留 Vite 构建产物）: {f}")
-                    continue
-                src_path = os.path.join(root, f)
-                dest_path = os.path.join(dest_root, f)
-                shutil.copy2(src_path, dest_path)
-        print_info(f"复制 gadgets 静态资源完成（已跳过 HTML）: {gadgets_source} -> {gadgets_dest}")
+    # 压缩 CSS 和 JavaScript 文件
+    minify_stats = compress_assets(work, manifest, minify_cache, profile)
+    start = record_timing(profile, '压缩 CSS/JS', start)
+    
+    # 无损优化图片（在文件指纹之前，哈希包含优化后的内容）
+    image_stats = {}
+    if args.optimize_images:
+        try:
+            image_stats = optimize_images(work, docs_dir, manifest, minify_cache, profile)
+        except Exception as e:
+            print_error(f"图片优化失败: {e}")
+        start = record_timing(profile, '图片优化', start)
+    
+    # 文件指纹
+    fingerprint_stats = None
+    if args.fingerprint:
+        try:
+            fingerprint_stats = fingerprint_assets(docs_dir, manifest)
+        except Exception as e:
+            print_error(f"文件指纹失败: {e}")
+        start = record_timing(profile, '文件指纹', start)
     
-    # 复制 src 根目录文件（现在会走copy_file的排除规则）
-    if os.path.exists(src_dir):
-        for item in os.listdir(src_dir):
-            item_path = os.path.join(src_dir, item)
-            if os.path.isfile(item_path):
-                dest_path = os.path.join(docs_dir, item)
-                copy_file(item_path, dest_path)
+    # 为文本类资源生成 .br / .gz 预压缩文件（包括 Vite 构建产物）
+    precompress_stats = {}
+    if args.precompress:
+        precompress_stats = precompress_assets(docs_dir, minify_cache, profile)
+        start = record_timing(profile, '预压缩', start)
+    else:
+        removed = remove_precompressed_files(docs_dir)
+        if removed:
+            print_info(f"未开启预压缩，已删除之前生成的 {removed} 个 .br / .gz 文件")
     
-    # 压缩 CSS 文件
-    compress_css_files(os.path.join(docs_dir, 'assets', 'css'))
+    # 统计体积（在保存增量复制清单之前，清单中记录现场计算的 gzip 大小）
+    sizes = None
+    if not args.no_size_check:
+        try:
+            sizes = collect_asset_sizes(docs_dir, manifest)
+        except Exception as e:
+            print_error(f"体积统计失败: {e}")
     
-    # 压缩 JavaScript 文件
-    compress_js_files(os.path.join(docs_dir, 'assets', 'js'))
+    save_copy_manifest(manifest)
+    save_minify_cache(minify_cache)
+    print_copy_summary(manifest)
+    if unused is not None:
+        print_prune_report(unused, args.prune_unused)
+    print_minify_summary(minify_stats)
+    print_image_summary(image_stats)
+    if fingerprint_stats:
+        print_fingerprint_summary(fingerprint_stats)
+    print_precompress_summary(precompress_stats)
+    print_minify_cache_stats(minify_cache)
+    
+    # 体积报告、预算检查和体积回退检查
+    sizes_ok = True
+    if sizes is not None:
+        try:
+            sizes_ok = check_asset_sizes(project_root, sizes, args.accept_size_changes)
+        except Exception as e:
+            print_error(f"体积检查失败: {e}")
+        start = record_timing(profile, '体积检查', start)
+    try:
+        save_build_profile(profile)
+    except OSError as e:
+        print_error(f"保存构建耗时失败: {e}")
+    print_timing_breakdown(profile)
     
+    if not sizes_ok:
+        if args.enforce_size_budget:
+            print_error("===== 体积检查未通过 =====")
+            sys.exit(1)
+        print_error("体积检查未通过（只警告，加 --enforce-size-budget 时构建失败）")
     print_info("===== 静态资源复制和压缩执行完成 =====")
 
 if __name__ == '__main__':
@@ -0,0 +1,97 @@
+/**
+ * ==================== 批量压缩进程 (Minify Worker) ====================
+ *
+ * 功能说明：
+ * 由 scripts/copy-static.py 启动，在一个 Node 进程内批量压缩 CSS / JS 文件，
+ * 避免每个文件都启动一次 npx 的开销。
+ *
+ * 输入（stdin，JSON）：
+ * { "jobs": [{ "type": "css" | "js", "file": "绝对路径" }, ...],
+ *   "options": { "css": clean-css 参数, "js": terser 参数 } }
+ *
+ * 输出（stdout，每个文件一行 JSON）：
+ * { "file": ..., "ok": true, "ms": 12.3, "before": 1000, "after": 400 }
+ * { "file": ..., "ok": false, "error": "错误信息" }
+ * 缺少 terser / clean-css 时输出 { "fatal": "错误信息" } 并以非零状态退出，
+ * 由调用方退回逐个文件 npx 压缩。
+ *
+ * 压缩参数由调用方传入（见 copy-static.py 的 MINIFY_OPTIONS），未传入时
+ * 使用与原先命令行一致的默认值：
+ * - cleancss <file> -o <file>
+ * - terser <file> -o <file> --compress --mangle --keep-classnames --keep-fnames
+ */
+
+'use strict';
+
+const fs = require('fs');
+const path = require('path');
+
+let minifyJs;
+let CleanCSS;
+try {
+  ({ minify: minifyJs } = require('terser'));
+  CleanCSS = require('clean-css');
+} catch (err) {
+  process.stdout.write(JSON.stringify({ fatal: err.message }) + '\n');
+  process.exit(2);
+}
+
+const DEFAULT_CSS_OPTIONS = {};
+const DEFAULT_JS_OPTIONS = {
+  compress: true,
+  mangle: true,
+  keep_classnames: true,
+  keep_fnames: true
+};
+
+/** 原子写入：先写临时文件再改名 */
+function writeAtomic(file, data) {
+  const tmp = path.join(path.dirname(file), `.${path.basename(file)}.${process.pid}.tmp`);
+  fs.writeFileSync(tmp, data);
+  fs.renameSync(tmp, file);
+}
+
+async function minifyFile(job, options) {
+  const source = fs.readFileSync(job.file, 'utf8');
+  let output;
+  if (job.type === 'css') {
+    // 传入文件路径，@import 等相对路径按文件所在目录解析，与命令行一致
+    const result = new CleanCSS(options.css || DEFAULT_CSS_OPTIONS).minify([job.file]);
+    if (result.errors.length) {
+      throw new Error(result.errors.join('; '));
+    }
+    output = result.styles;
+  } else {
+    const result = await minifyJs({ [path.basename(job.file)]: source },
+      options.js || DEFAULT_JS_OPTIONS);
+    output = result.code;
+  }
+  writeAtomic(job.file, output);
+  return { before: Buffer.byteLength(source), after: Buffer.byteLength(output) };
+}
+
+async function main() {
+  const chunks = [];
+  for await (const chunk of process.stdin) {
+    chunks.push(chunk);
+  }
+  const { jobs, options = {} } = JSON.parse(Buffer.concat(chunks).toString('utf8'));
+
+  for (const job of jobs) {
+    const start = process.hrtime.bigint();
+    let result;
+    try {
+      const sizes = await minifyFile(job, options);
+      result = { file: job.file, ok: true, ...sizes };
+    } catch (err) {
+      result = { file: job.file, ok: false, error: String(err && err.message || err) };
+    }
+    result.ms = Number(process.hrtime.bigint() - start) / 1e6;
+    process.stdout.write(JSON.stringify(result) + '\n');
+  }
+}
+
+main().catch((err) => {
+  process.stdout.write(JSON.stringify({ fatal: String(err && err.stack || err) }) + '\n');
+  process.exit(1);
+});
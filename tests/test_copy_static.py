@@ -0,0 +1,625 @@
+"""scripts/copy-static.py 的测试
+
+运行：python -m unittest discover -s tests
+"""
+import gzip
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from PIL import PngImagePlugin
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GLUE_DIR = os.path.join('assets', 'js', 'libs', 'tinypng-lib-wasm')
+
+
+def load_copy_static():
+    spec = importlib.util.spec_from_file_location(
+        'copy_static', os.path.join(PROJECT_ROOT, 'scripts', 'copy-static.py'))
+    module = importlib.util.module_from_spec(spec)
+    # 登记到 sys.modules，进程池中的子进程才能按模块名找到函数
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+copy_static = load_copy_static()
+
+
+class FingerprintTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.docs = os.path.join(self.root, 'docs')
+        shutil.copytree(os.path.join(PROJECT_ROOT, 'src', GLUE_DIR), os.path.join(self.docs, GLUE_DIR))
+        self.manifest = copy_static.load_copy_manifest(self.root)
+        for root, _, names in os.walk(self.docs):
+            for name in names:
+                self.add(os.path.relpath(os.path.join(root, name), self.docs))
+
+    def add(self, rel, content=None, copied=True):
+        """写入 docs 下的文件（content 为 None 时只登记已有文件），copied 为 True 时登记为复制输出"""
+        path = os.path.join(self.docs, *rel.replace(os.sep, '/').split('/'))
+        if content is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content.encode('utf-8') if isinstance(content, str) else content)
+        if copied:
+            self.manifest['sources'][copy_static._manifest_key(self.manifest, path)] = {}
+            copy_static._record_output(self.manifest, path)
+        return path
+
+    def read(self, *parts):
+        with open(os.path.join(self.docs, *parts), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def read_bytes(self, *parts):
+        with open(os.path.join(self.docs, *parts), 'rb') as f:
+            return f.read()
+
+    def hashed(self, rel):
+        """rel 的带哈希副本（相对 docs）"""
+        return copy_static.load_fingerprint_map(self.docs)[rel]
+
+    def test_glue_is_excluded(self):
+        original = self.read(GLUE_DIR, 'tinypng_lib_wasm.js')
+        stats = copy_static.fingerprint_assets(self.docs, self.manifest)
+        self.assertEqual(stats['assets'], 0)
+        self.assertEqual(self.read(GLUE_DIR, 'tinypng_lib_wasm.js'), original)
+
+    def test_only_pages_rewritten(self):
+        app = 'window.app = 1;\n'
+        self.add('assets/js/app.js', app)
+        self.add('assets/css/site.css', 'body { background: url("../img/bg.png"); }\n')
+        self.add('assets/img/bg.png', b'\x89PNG')
+        self.add('index.html', '<link href="assets/css/site.css">\n<script src="assets/js/app.js"></script>\n')
+
+        stats = copy_static.fingerprint_assets(self.docs, self.manifest)
+        self.assertEqual(stats['rewritten'], 1)
+        hashed = self.hashed('assets/js/app.js')
+        digest = hashlib.sha256(app.encode('utf-8')).hexdigest()[:copy_static.FINGERPRINT_LENGTH]
+        self.assertEqual(hashed, f'assets/js/app.{digest}.js')
+        # 副本与原文件完全相同，原文件和 CSS 都不改写
+        self.assertEqual(self.read(hashed), app)
+        self.assertEqual(self.read('assets', 'js', 'app.js'), app)
+        self.assertIn('url("../img/bg.png")', self.read('assets', 'css', 'site.css'))
+        self.assertNotIn('assets/img/bg.png', copy_static.load_fingerprint_map(self.docs))
+        html = self.read('index.html')
+        self.assertIn(f'src="{hashed}"', html)
+        self.assertIn(f'href="{self.hashed("assets/css/site.css")}"', html)
+        # 页面输出重新记录，下次构建不会因改写而重新复制
+        self.assertTrue(copy_static._output_matches(self.manifest, os.path.join(self.docs, 'index.html')))
+
+        # 再次运行结果不变
+        before = html
+        stats = copy_static.fingerprint_assets(self.docs, self.manifest)
+        self.assertEqual(stats['rewritten'], 0)
+        self.assertEqual(self.read('index.html'), before)
+
+    def test_changed_asset_replaces_copy(self):
+        self.add('assets/js/app.js', 'window.app = 1;\n')
+        self.add('index.html', '<script src="assets/js/app.js"></script>\n')
+        copy_static.fingerprint_assets(self.docs, self.manifest)
+        old = self.hashed('assets/js/app.js')
+
+        self.add('assets/js/app.js', 'window.app = 2;\n')
+        stats = copy_static.fingerprint_assets(self.docs, self.manifest)
+        new = self.hashed('assets/js/app.js')
+        self.assertNotEqual(new, old)
+        self.assertEqual(stats['removed'], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.docs, old)))
+        self.assertEqual(self.read(new), 'window.app = 2;\n')
+        self.assertIn(f'src="{new}"', self.read('index.html'))
+
+    def test_shared_module_keeps_name(self):
+        # 被其他脚本 import 的模块保持原文件名，页面和脚本加载的是同一个模块实例
+        self.add('assets/js/main.js', 'import { f } from "./shared.js";\n')
+        self.add('assets/js/shared.js', 'export function f() {}\n')
+        html = ('<script type="module" src="assets/js/main.js"></script>\n'
+                '<script type="module" src="assets/js/shared.js"></script>\n')
+        self.add('index.html', html)
+
+        copy_static.fingerprint_assets(self.docs, self.manifest)
+        fingerprints = copy_static.load_fingerprint_map(self.docs)
+        self.assertIn('assets/js/main.js', fingerprints)
+        self.assertNotIn('assets/js/shared.js', fingerprints)
+        text = self.read('index.html')
+        self.assertIn('src="assets/js/shared.js"', text)
+        self.assertIn(f'src="{fingerprints["assets/js/main.js"]}"', text)
+        self.assertEqual(self.read('assets', 'js', 'main.js'), 'import { f } from "./shared.js";\n')
+
+    def test_strings_like_urls_unchanged(self):
+        self.add('assets/js/app.js', 'window.app = 1;\n')
+        html = ('<!-- 加载 assets/js/app.js -->\n'
+                '<p>源码见 assets/js/app.js</p>\n'
+                '<a href="https://cdn.example.com/assets/js/app.js">CDN</a>\n'
+                '<a href="#assets/js/app.js">锚点</a>\n'
+                '<input value="assets/js/app.js">\n'
+                '<script>\n'
+                'var files = { "assets/js/app.js": 1 };\n'
+                'console.log("url: assets/js/app.js");\n'
+                '// script.src = "assets/js/app.js";\n'
+                '</script>\n')
+        self.add('index.html', html + '<script src="assets/js/app.js?v=1"></script>\n')
+
+        copy_static.fingerprint_assets(self.docs, self.manifest)
+        hashed = self.hashed('assets/js/app.js')
+        self.assertEqual(self.read('index.html'), html + f'<script src="{hashed}?v=1"></script>\n')
+
+    def test_is_url_reference(self):
+        cases = [
+            ('<script src="app.js">', True),
+            ("import x from 'app.js'", True),
+            ('new Worker("app.js")', True),
+            ('{ url: "app.js" }', True),
+            ('<p>app.js</p>', False),
+            ('{ "app.js": 1 }', False),
+            ('// src = "app.js"', False),
+            ('/* src = "app.js" */', False),
+            ('<!-- <script src="app.js"> -->', False),
+        ]
+        for text, expected in cases:
+            start = text.index('app.js')
+            with self.subTest(text=text):
+                self.assertEqual(copy_static.is_url_reference(text, start, start + len('app.js')), expected)
+
+    def test_json_unchanged(self):
+        self.add('assets/js/app.js', 'window.app = 1;\n')
+        data = '\ufeff{\n    "files": [ "assets/js/app.js" ]\n}'.encode('utf-8')
+        self.add('file-list.json', data)
+        self.add('index.html', '<script src="assets/js/app.js"></script>\n')
+
+        copy_static.fingerprint_assets(self.docs, self.manifest)
+        self.assertEqual(self.read_bytes('file-list.json'), data)
+
+    def test_disable_restores_pages(self):
+        self.add('assets/js/app.js', 'window.app = 1;\n')
+        self.add('index.html', '<script src="assets/js/app.js"></script>\n')
+        # 不是复制来的页面（如 Vite 构建产物）
+        vite = '<script src="/assets/js/app.js"></script>\n'
+        self.add('tools/index.html', vite, copied=False)
+        copy_static.fingerprint_assets(self.docs, self.manifest)
+        hashed = self.hashed('assets/js/app.js')
+        self.assertIn(hashed, self.read('tools', 'index.html'))
+        with open(os.path.join(self.docs, copy_static.ASSET_MANIFEST) + '.gz', 'wb'):
+            pass
+
+        stats = copy_static.fingerprint_assets(self.docs, self.manifest, enabled=False)
+        self.assertEqual(stats['removed'], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.docs, hashed)))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, copy_static.ASSET_MANIFEST)))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, copy_static.ASSET_MANIFEST) + '.gz'))
+        # 复制来的页面清除输出记录，由复制步骤按源文件重新复制；其他页面恢复为原文件名
+        self.assertNotIn('docs/index.html', self.manifest['outputs'])
+        self.assertEqual(self.read('tools', 'index.html'), vite)
+
+        stats = copy_static.fingerprint_assets(self.docs, self.manifest, enabled=False)
+        self.assertEqual(stats, {'assets': 0, 'rewritten': 0, 'removed': 0})
+
+    def test_precompress_skips_fingerprinted_originals(self):
+        content = 'window.app = 1;\n' * 100
+        self.add('assets/js/app.js', content)
+        self.add('index.html', '<script src="assets/js/app.js"></script>\n')
+        original = os.path.join(self.docs, 'assets', 'js', 'app.js')
+        with open(original + '.gz', 'wb'):
+            pass
+        copy_static.fingerprint_assets(self.docs, self.manifest)
+
+        files = copy_static.collect_precompress_files(self.docs)
+        self.assertIn(os.path.join(self.docs, *self.hashed('assets/js/app.js').split('/')), files)
+        self.assertNotIn(original, files)
+        self.assertFalse(os.path.exists(original + '.gz'))
+
+
+class SizeCheckTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.docs = os.path.join(self.root, 'docs')
+        os.makedirs(os.path.join(self.docs, 'assets', 'js'))
+        self.manifest = copy_static.load_copy_manifest(self.root)
+        for name in ('print_info', 'print_error'):
+            patcher = mock.patch.object(copy_static, name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write(self, rel, size):
+        path = os.path.join(self.docs, *rel.split('/'))
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        return path
+
+    def check(self, accept=False):
+        return copy_static.check_asset_sizes(
+            self.root, copy_static.collect_asset_sizes(self.docs, self.manifest), accept)
+
+    def test_gzip_sizes_cached(self):
+        self.write('assets/js/app.js', 2048)
+        self.write('assets/js/lib.js', 2048)
+        with mock.patch.object(copy_static.gzip, 'compress', wraps=gzip.compress) as compress:
+            sizes = copy_static.collect_asset_sizes(self.docs, self.manifest)
+            self.assertEqual(compress.call_count, 2)
+            self.assertEqual(copy_static.collect_asset_sizes(self.docs, self.manifest), sizes)
+            self.assertEqual(compress.call_count, 2)
+            # 只重新计算变化的文件，删除的文件不再记录
+            self.write('assets/js/app.js', 4096)
+            os.remove(os.path.join(self.docs, 'assets', 'js', 'lib.js'))
+            sizes = copy_static.collect_asset_sizes(self.docs, self.manifest)
+            self.assertEqual(compress.call_count, 3)
+        self.assertGreater(sizes['assets/js/app.js']['gzip'], 4000)
+        self.assertEqual(list(self.manifest['gzip_sizes']), ['docs/assets/js/app.js'])
+
+        # 记录随增量复制清单保存
+        copy_static.save_copy_manifest(self.manifest)
+        manifest = copy_static.load_copy_manifest(self.root)
+        self.assertEqual(manifest['gzip_sizes'], self.manifest['gzip_sizes'])
+
+    def test_budget(self):
+        self.write('assets/js/app.js', 4096)
+        budgets = [('assets/js/*.js', 'gzip', 1024), ('*.js', 'gzip', 1024 * 1024)]
+        with mock.patch.object(copy_static, 'SIZE_BUDGETS', budgets):
+            violations = copy_static.check_size_budgets(copy_static.collect_asset_sizes(self.docs, self.manifest))
+            self.assertEqual([(rel, metric, limit) for rel, metric, _, limit in violations],
+                             [('assets/js/app.js', 'gzip', 1024)])
+            self.assertFalse(self.check())
+            # 接受体积增长不能绕过预算
+            self.assertFalse(self.check(accept=True))
+
+    def test_baseline(self):
+        baseline = os.path.join(self.root, copy_static.SIZE_BASELINE)
+        self.write('assets/js/app.js', 20 * 1024)
+        self.assertTrue(self.check())
+        self.assertTrue(os.path.exists(baseline))
+        self.assertTrue(os.path.exists(os.path.join(self.root, copy_static.SIZE_REPORT)))
+
+        # 增长未超过阈值：通过，基准更新
+        self.write('assets/js/app.js', 21 * 1024)
+        self.assertTrue(self.check())
+        # 体积回退：不通过，基准不变，之后的构建继续提示
+        self.write('assets/js/app.js', 40 * 1024)
+        self.assertFalse(self.check())
+        self.assertFalse(self.check())
+        self.assertEqual(copy_static._load_size_file(self.root, copy_static.SIZE_BASELINE)
+                         ['assets/js/app.js']['minified'], 21 * 1024)
+        # 接受后更新基准
+        self.assertTrue(self.check(accept=True))
+        self.assertTrue(self.check())
+
+
+@unittest.skipIf(copy_static.Image is None, '需要 Pillow')
+class OptimizeImagesTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.docs = os.path.join(self.root, 'docs')
+        os.makedirs(os.path.join(self.root, 'src'))
+        os.makedirs(self.docs)
+        self.source = os.path.join(self.root, 'src', 'bg.png')
+        self.output = os.path.join(self.docs, 'bg.png')
+        # 未压缩、带元数据的 PNG，优化后一定变小
+        image = copy_static.Image.new('RGB', (64, 64), (200, 30, 30))
+        info = PngImagePlugin.PngInfo()
+        info.add_text('Comment', 'x' * 256)
+        image.save(self.source, compress_level=0, pnginfo=info)
+        with open(self.source, 'rb') as f:
+            self.original = f.read()
+        self.manifest = copy_static.load_copy_manifest(self.root)
+        self.work = [(self.source, self.output, 'img', None)]
+        for name in ('print_info', 'print_error'):
+            patcher = mock.patch.object(copy_static, name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def read_output(self):
+        with open(self.output, 'rb') as f:
+            return f.read()
+
+    def test_enable_then_disable(self):
+        self.assertTrue(copy_static.sync_file(self.source, self.output, self.manifest))
+        stats = copy_static.optimize_images(self.work, self.docs, self.manifest)
+        self.assertEqual(stats['.']['optimized'], 1)
+        optimized = self.read_output()
+        self.assertLess(len(optimized), len(self.original))
+        self.assertEqual(self.manifest['optimized'], {'docs/bg.png'})
+
+        # 继续开启优化：输出记录已更新，不会重新复制
+        copy_static.save_copy_manifest(self.manifest)
+        self.manifest = copy_static.load_copy_manifest(self.root)
+        self.assertEqual(self.manifest['optimized'], {'docs/bg.png'})
+        self.assertFalse(copy_static.sync_file(self.source, self.output, self.manifest))
+
+        # 关闭优化：按源文件重新复制
+        self.assertEqual(copy_static.restore_optimized_images(self.manifest), 1)
+        self.assertTrue(copy_static.sync_file(self.source, self.output, self.manifest))
+        self.assertEqual(self.read_output(), self.original)
+        self.assertEqual(self.manifest['optimized'], set())
+        self.assertEqual(copy_static.restore_optimized_images(self.manifest), 0)
+        self.assertFalse(copy_static.sync_file(self.source, self.output, self.manifest))
+
+    def test_cached_result(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        cache = copy_static.load_minify_cache(root)
+        copy_static.sync_file(self.source, self.output, self.manifest)
+        copy_static.optimize_images(self.work, self.docs, self.manifest, cache)
+        optimized = self.read_output()
+
+        # 重新复制后直接使用缓存的结果，不再启动进程池
+        copy_static.restore_optimized_images(self.manifest)
+        copy_static.sync_file(self.source, self.output, self.manifest)
+        with mock.patch.object(copy_static, 'ProcessPoolExecutor') as pool:
+            copy_static.optimize_images(self.work, self.docs, self.manifest, cache)
+        pool.assert_not_called()
+        self.assertEqual(self.read_output(), optimized)
+        self.assertEqual(self.manifest['optimized'], {'docs/bg.png'})
+
+
+class IncrementalCopyTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        os.makedirs(os.path.join(self.root, 'src'))
+        os.makedirs(os.path.join(self.root, 'docs'))
+        self.source = os.path.join(self.root, 'src', 'app.js')
+        self.output = os.path.join(self.root, 'docs', 'app.js')
+        self.write(self.source, 'window.app = 1;\n')
+        self.manifest = copy_static.load_copy_manifest(self.root)
+        patcher = mock.patch.object(copy_static, 'print_info')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write(self, path, content):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def sync(self):
+        return copy_static.sync_file(self.source, self.output, self.manifest)
+
+    def reload(self):
+        copy_static.save_copy_manifest(self.manifest)
+        self.manifest = copy_static.load_copy_manifest(self.root)
+
+    def test_unchanged_skipped(self):
+        self.assertTrue(self.sync())
+        self.reload()
+        self.assertFalse(self.sync())
+        self.assertEqual(self.manifest['stats']['skipped'][0], 1)
+
+    def test_source_changed(self):
+        self.sync()
+        self.write(self.source, 'window.app = 22;\n')
+        self.assertTrue(self.sync())
+        with open(self.output, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'window.app = 22;\n')
+
+    def test_mtime_changed_same_content(self):
+        # 修改时间变了但内容相同（如重新检出）：比较内容哈希后跳过，并记录新的修改时间
+        self.sync()
+        stat = os.stat(self.source)
+        os.utime(self.source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        with mock.patch.object(copy_static, 'file_sha256', wraps=copy_static.file_sha256) as sha256:
+            self.assertFalse(self.sync())
+            self.assertFalse(self.sync())
+        self.assertEqual(sha256.call_count, 1)
+
+    def test_output_changed_or_deleted(self):
+        self.sync()
+        self.write(self.output, 'changed by another tool\n')
+        self.assertTrue(self.sync())
+        os.remove(self.output)
+        self.assertTrue(self.sync())
+        self.assertTrue(os.path.exists(self.output))
+
+    def test_minified_flag_cleared_on_copy(self):
+        self.sync()
+        key = copy_static._manifest_key(self.manifest, self.output)
+        self.manifest['minified'].add(key)
+        self.write(self.source, 'window.app = 3;\n')
+        self.sync()
+        self.assertNotIn(key, self.manifest['minified'])
+
+    def test_stale_outputs_removed(self):
+        self.sync()
+        kept = os.path.join(self.root, 'docs', 'kept.js')
+        self.write(os.path.join(self.root, 'src', 'kept.js'), 'window.kept = 1;\n')
+        copy_static.sync_file(os.path.join(self.root, 'src', 'kept.js'), kept, self.manifest)
+        self.reload()
+
+        # 源文件已删除：app.js 的输出删除；kept.js 的输出被其他工具改写过，保留
+        os.remove(self.source)
+        self.write(kept, 'written by vite\n')
+        copy_static.remove_stale_outputs(self.manifest)
+        self.assertFalse(os.path.exists(self.output))
+        self.assertTrue(os.path.exists(kept))
+        self.assertEqual(self.manifest['sources'], {})
+        self.assertEqual(self.manifest['outputs'], {})
+
+    def test_version_mismatch_starts_empty(self):
+        self.sync()
+        copy_static.save_copy_manifest(self.manifest)
+        with mock.patch.object(copy_static, 'COPY_MANIFEST_VERSION', copy_static.COPY_MANIFEST_VERSION + 1):
+            manifest = copy_static.load_copy_manifest(self.root)
+        self.assertEqual(manifest['sources'], {})
+        self.assertEqual(manifest['outputs'], {})
+
+
+class MinifyCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.path = os.path.join(self.root, 'app.js')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('function add(a, b) { return a + b; }\n')
+
+    def install(self, package, version):
+        directory = os.path.join(self.root, 'node_modules', package)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'package.json'), 'w', encoding='utf-8') as f:
+            json.dump({'name': package, 'version': version}, f)
+        return copy_static.load_minify_cache(self.root)
+
+    def test_no_cache_without_installed_minifier(self):
+        # npx 临时下载的版本无法确定，不使用缓存
+        cache = copy_static.load_minify_cache(self.root)
+        self.assertEqual(cache['versions'], {'css': None, 'js': None})
+        self.assertIsNone(copy_static.minify_cache_key(cache, 'js', self.path))
+        cache = self.install('clean-css', '5.3.3')
+        self.assertIsNone(copy_static.minify_cache_key(cache, 'js', self.path))
+
+    def test_key_includes_minifier_version(self):
+        cache = self.install('terser', '5.17.1')
+        self.assertEqual(cache['versions']['js'], 'terser@5.17.1')
+        key = copy_static.minify_cache_key(cache, 'js', self.path)
+        self.assertEqual(copy_static.minify_cache_key(cache, 'js', self.path), key)
+        upgraded = self.install('terser', '5.31.0')
+        self.assertNotEqual(copy_static.minify_cache_key(upgraded, 'js', self.path), key)
+        with mock.patch.dict(copy_static.MINIFY_OPTIONS, {'js': {'compress': False}}):
+            self.assertNotEqual(copy_static.minify_cache_key(cache, 'js', self.path), key)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('add(1, 2);\n')
+        self.assertNotEqual(copy_static.minify_cache_key(cache, 'js', self.path), key)
+
+    def test_store_and_restore(self):
+        cache = self.install('terser', '5.17.1')
+        key = copy_static.minify_cache_key(cache, 'js', self.path)
+        self.assertIsNone(copy_static.minify_cache_restore(cache, key, self.path))
+        minified = os.path.join(self.root, 'app.min.js')
+        with open(minified, 'w', encoding='utf-8') as f:
+            f.write('function add(n,d){return n+d}\n')
+        copy_static.minify_cache_store(cache, key, minified, 12.0)
+        copy_static.save_minify_cache(cache)
+
+        cache = copy_static.load_minify_cache(self.root)
+        result = copy_static.minify_cache_restore(cache, key, self.path)
+        self.assertTrue(result['cached'])
+        with open(self.path, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'function add(n,d){return n+d}\n')
+        self.assertEqual(cache['stats']['hits'], 1)
+
+        # 缓存文件丢失时视为未命中并删除条目
+        os.remove(copy_static._minify_cache_path(cache, key))
+        self.assertIsNone(copy_static.minify_cache_restore(cache, key, self.path))
+        self.assertNotIn(key, cache['entries'])
+
+
+class PrecompressTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.docs = os.path.join(self.root, 'docs')
+        os.makedirs(self.docs)
+        for name in ('print_info', 'print_error'):
+            patcher = mock.patch.object(copy_static, name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write(self, name, data):
+        path = os.path.join(self.docs, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_precompress_and_remove(self):
+        content = b'function add(a, b) { return a + b; }\n' * 100
+        large = self.write('app.js', content)
+        small = self.write('small.js', b'window.a = 1;\n')
+        random = self.write('random.js', os.urandom(4096))
+        image = self.write('bg.png', b'\0' * 4096)
+        cache = copy_static.load_minify_cache(self.root)
+
+        stats = copy_static.precompress_assets(self.docs, cache)
+        with open(large + '.gz', 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), content)
+        # 过小、压缩后没有变小、不是文本类资源的文件不生成
+        for path in (small, random, image):
+            self.assertFalse(os.path.exists(path + '.gz'))
+        self.assertEqual((stats['.gz']['files'], stats['.gz']['skipped']), (1, 1))
+
+        # 再次预压缩时使用缓存，结果不变
+        with open(large + '.gz', 'rb') as f:
+            compressed = f.read()
+        stats = copy_static.precompress_assets(self.docs, cache)
+        self.assertEqual(stats['.gz']['hits'], 2)
+        with open(large + '.gz', 'rb') as f:
+            self.assertEqual(f.read(), compressed)
+
+        # 关闭预压缩：删除生成的文件（含原文件已删除的），其他 .gz 文件保留
+        os.remove(large)
+        archive = self.write('data.tar.gz', b'archive')
+        self.assertEqual(copy_static.remove_precompressed_files(self.docs),
+                         len(copy_static.precompress_encodings()))
+        self.assertEqual(sorted(os.listdir(self.docs)), ['bg.png', 'data.tar.gz', 'random.js', 'small.js'])
+        self.assertTrue(os.path.exists(archive))
+
+    def test_small_file_removes_old_output(self):
+        path = self.write('app.js', b'window.a = 1;\n')
+        self.write('app.js.gz', b'old')
+        self.assertEqual(copy_static.collect_precompress_files(self.docs), [])
+        self.assertFalse(os.path.exists(path + '.gz'))
+
+
+class PruneTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.docs = os.path.join(self.root, 'docs')
+        self.manifest = copy_static.load_copy_manifest(self.root)
+        self.add('index.html', '<script type="module" src="assets/js/app.js"></script>\n')
+        self.add('assets/js/app.js', 'import { f } from "./util.js";\n'
+                                     'loadScript("assets/js/libs/foo/foo.min.js");\n')
+        self.add('assets/js/util.js', 'export function f() {}\n')
+        self.add('assets/js/old.js', 'window.old = 1;\n')
+        self.add('assets/js/libs/foo/foo.min.js', 'window.foo = 1;\n')
+        self.add('assets/js/libs/foo/foo.esm.js', 'export default 1;\n')
+        self.add('assets/js/libs/bar/bar.js', 'window.bar = 1;\n')
+        # 不是复制来的文件（如 Vite 构建产物）不检查
+        self.add('assets/js/vite-chunk.js', 'export {};\n', copied=False)
+
+    def add(self, rel, content, copied=True):
+        path = os.path.join(self.docs, *rel.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        if copied:
+            key = copy_static._manifest_key(self.manifest, path)
+            self.manifest['sources'][key] = {}
+            copy_static._record_output(self.manifest, path)
+            self.manifest['minified'].add(key)
+
+    def exists(self, rel):
+        return os.path.exists(os.path.join(self.docs, *rel.split('/')))
+
+    def test_report(self):
+        unused = copy_static.prune_unreachable(self.docs, self.manifest)
+        self.assertEqual(sorted(unused), ['assets/js', 'assets/js/libs/bar', 'assets/js/libs/foo'])
+        self.assertEqual(unused['assets/js/libs/foo'][0], 1)
+        # 只报告，不删除
+        self.assertTrue(self.exists('assets/js/old.js'))
+        self.assertIn('docs/assets/js/old.js', self.manifest['sources'])
+
+    def test_prune(self):
+        with open(os.path.join(self.docs, 'assets', 'js', 'old.js.gz'), 'wb'):
+            pass
+        with mock.patch.object(copy_static, 'PRUNE_KEEP', ('assets/js/libs/bar/',)):
+            unused = copy_static.prune_unreachable(self.docs, self.manifest, exclude=True)
+        self.assertEqual(sorted(unused), ['assets/js', 'assets/js/libs/foo'])
+        for rel in ('assets/js/old.js', 'assets/js/old.js.gz', 'assets/js/libs/foo/foo.esm.js'):
+            self.assertFalse(self.exists(rel), rel)
+        for rel in ('index.html', 'assets/js/app.js', 'assets/js/util.js', 'assets/js/libs/foo/foo.min.js',
+                    'assets/js/libs/bar/bar.js', 'assets/js/vite-chunk.js'):
+            self.assertTrue(self.exists(rel), rel)
+        # 从清单中移除，下次构建重新复制后再判断
+        key = 'docs/assets/js/old.js'
+        self.assertNotIn(key, self.manifest['sources'])
+        self.assertNotIn(key, self.manifest['outputs'])
+        self.assertNotIn(key, self.manifest['minified'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+"""generate-sprite.py 的测试
+
+运行：python -m unittest discover -s tests
+"""
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_generate_sprite():
+    spec = importlib.util.spec_from_file_location(
+        'generate_sprite', os.path.join(PROJECT_ROOT, 'generate-sprite.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+sprite = load_generate_sprite()
+
+
+class SpriteTestCase(unittest.TestCase):
+    """在临时目录中生成雪碧图（generate-sprite.py 中的路径相对于当前目录）"""
+
+    icons = {'controls': ['play.png', 'pause.png', 'mute.png']}
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        self.addCleanup(os.chdir, cwd)
+        os.makedirs(sprite.IMG_DIR)
+        patcher = mock.patch.object(sprite, 'ICONS', self.icons)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        colors = [(255, 0, 0, 255), (0, 255, 0, 255), (0, 0, 255, 255), (255, 255, 0, 255)]
+        for i, name in enumerate(name for names in self.icons.values() for name in names):
+            self.save_icon(name, colors[i % len(colors)])
+
+    def save_icon(self, name, color, size=(16, 16), box=None):
+        """写一个图标：box 为不透明区域（默认整张图）"""
+        img = Image.new('RGBA', size, (0, 0, 0, 0))
+        img.paste(color, box or (0, 0) + size)
+        img.save(os.path.join(sprite.IMG_DIR, name))
+
+    def build(self, **options):
+        options.setdefault('optimize', False)
+        options.setdefault('workers', 1)
+        with mock.patch('builtins.print'):
+            return sprite.build_sprite(**options)
+
+
+class IconRegistryTest(SpriteTestCase):
+    def test_registry_passed_in_is_not_reloaded(self):
+        with mock.patch('builtins.print'):
+            registry = sprite.load_icon_registry()
+        with mock.patch.object(sprite, 'load_icon_registry', side_effect=AssertionError('重复读取')):
+            names = sprite.sprite_icon_names(registry=registry)
+            build = self.build(use_cache=False, registry=registry)
+        self.assertEqual(names, build['icons'])
+        self.assertEqual(names, {'play.png', 'pause.png', 'mute.png'})
+
+
+class LayoutTest(SpriteTestCase):
+    icons = {'controls': ['play.png', 'pause.png', 'mute.png', 'volume.png']}
+
+    def test_maxrects_rects_do_not_overlap(self):
+        sizes = {'a': [30, 10], 'b': [12, 40], 'c': [16, 16], 'd': [5, 7], 'e': [30, 10]}
+        icons = [(name, None) for name in sizes]
+        padding, extrude = 2, 1
+        with mock.patch('builtins.print'):
+            positions, (width, height) = sprite.layout_maxrects(icons, sizes, padding, extrude)
+        rects = []
+        for name, pos in positions.items():
+            x, y = -pos['x'] - extrude, -pos['y'] - extrude
+            w, h = pos['width'] + extrude * 2, pos['height'] + extrude * 2
+            self.assertEqual([pos['width'], pos['height']], sizes[name])
+            self.assertGreaterEqual(x, 0)
+            self.assertGreaterEqual(y, 0)
+            self.assertLessEqual(x + w, width)
+            self.assertLessEqual(y + h, height)
+            rects.append((x, y, w, h))
+        for i, (ax, ay, aw, ah) in enumerate(rects):
+            for bx, by, bw, bh in rects[i + 1:]:
+                # 包含挤出边的区域之间至少相隔 padding
+                self.assertTrue(ax + aw + padding <= bx or bx + bw + padding <= ax
+                                or ay + ah + padding <= by or by + bh + padding <= ay)
+
+    def test_trim_records_offsets(self):
+        self.save_icon('pause.png', (0, 0, 255, 255), box=(4, 3, 12, 10))
+        build = self.build(use_cache=False, layout='maxrects', trim=True)
+        pos = build['positions']['pause.png']
+        self.assertEqual((pos['width'], pos['height']), (8, 7))
+        self.assertEqual((pos['offset_x'], pos['offset_y']), (4, 3))
+        self.assertEqual((pos['source_width'], pos['source_height']), (16, 16))
+        self.assertEqual(build['positions']['play.png']['width'], 16)
+
+    def test_dedup_aliases_identical_pixels(self):
+        self.save_icon('volume.png', (255, 0, 0, 255))  # 与 play.png 像素相同
+        build = self.build(use_cache=False, layout='maxrects', dedup=True)
+        positions = build['positions']
+        self.assertEqual(positions['volume.png']['alias_of'], 'play.png')
+        self.assertEqual((positions['volume.png']['x'], positions['volume.png']['y']),
+                         (positions['play.png']['x'], positions['play.png']['y']))
+        self.assertNotIn('alias_of', positions['pause.png'])
+
+
+class CompositeTest(SpriteTestCase):
+    def icon_at(self, build, name, sheet=(None, sprite.SOURCE_DENSITY)):
+        pos = build['positions'][name]
+        box = (-pos['x'], -pos['y'], -pos['x'] + pos['width'], -pos['y'] + pos['height'])
+        return build['sprites'][sheet].crop(box)
+
+    def test_icon_pixels_copied_exactly(self):
+        # 半透明像素（抗锯齿边缘）不能与透明底色混合
+        img = Image.new('RGBA', (16, 16), (0, 0, 0, 0))
+        img.paste((200, 100, 50, 128), (2, 2, 14, 14))
+        img.paste((10, 20, 30, 255), (5, 5, 11, 11))
+        img.save(os.path.join(sprite.IMG_DIR, 'pause.png'))
+        for options in ({}, {'layout': 'maxrects', 'padding': 2, 'extrude': 2}):
+            build = self.build(use_cache=False, **options)
+            self.assertEqual(self.icon_at(build, 'pause.png').tobytes(), img.tobytes())
+
+    def test_extrude_repeats_edge_pixels(self):
+        self.save_icon('play.png', (9, 8, 7, 255), box=(0, 0, 1, 16))
+        build = self.build(use_cache=False, layout='maxrects', extrude=2)
+        pos = build['positions']['play.png']
+        x, y = -pos['x'], -pos['y']
+        atlas = build['sprites'][(None, sprite.SOURCE_DENSITY)]
+        self.assertEqual(atlas.getpixel((x - 1, y + 5)), (9, 8, 7, 255))
+        self.assertEqual(atlas.getpixel((x - 2, y - 2)), (9, 8, 7, 255))
+        self.assertEqual(atlas.getpixel((x + 16, y + 5)), (0, 0, 0, 0))
+
+    def test_overflowing_grid_icon_is_not_erased(self):
+        # 网格格子取第一个图标的尺寸：pause.png 超出格子，与后面 mute.png 的透明部分重叠
+        self.save_icon('pause.png', (0, 0, 255, 255), size=(24, 16))
+        self.save_icon('mute.png', (0, 255, 0, 255), box=(8, 0, 16, 16))
+        build = self.build(use_cache=False)
+        atlas = build['sprites'][(None, sprite.SOURCE_DENSITY)]
+        self.assertEqual(atlas.getpixel((16 * 2 + 4, 4)), (0, 0, 255, 255))
+        self.assertEqual(atlas.getpixel((16 * 2 + 12, 4)), (0, 255, 0, 255))
+
+    def test_parallel_matches_serial(self):
+        self.save_icon('pause.png', (0, 0, 255, 100), box=(2, 2, 14, 9))
+        options = {'use_cache': False, 'layout': 'maxrects', 'extrude': 2, 'trim': True,
+                   'split_themes': True, 'densities': [1, 2]}
+        serial = self.build(workers=1, **options)
+        parallel = self.build(workers=4, **options)
+        for sheet, img in serial['sprites'].items():
+            self.assertEqual(img.tobytes(), parallel['sprites'][sheet].tobytes())
+
+
+class OutputTest(SpriteTestCase):
+    def generate(self, **options):
+        options.setdefault('optimize', False)
+        options.setdefault('workers', 1)
+        with mock.patch('builtins.print'):
+            self.assertTrue(sprite.generate_sprite(**options))
+
+    def read_outputs(self):
+        outputs = {}
+        for path in (sprite.OUTPUT_SPRITE, sprite.OUTPUT_JSON, sprite.OUTPUT_CSS):
+            with open(path, 'rb') as f:
+                outputs[path] = f.read()
+        return outputs
+
+    def test_rebuild_is_byte_identical(self):
+        self.generate(use_cache=False)
+        first = self.read_outputs()
+        self.generate(use_cache=False)
+        self.assertEqual(self.read_outputs(), first)
+        # 增量缓存完全命中时复用的输出也一致
+        self.generate()
+        self.generate()
+        self.assertEqual(self.read_outputs(), first)
+
+    def test_stale_outputs_removed(self):
+        self.save_icon('play_dark.png', (9, 9, 9, 255))
+        self.generate(split_themes=True, densities=[1, 2])
+        dark = os.path.join(sprite.SRC_IMG_DIR, os.path.basename(sprite.OUTPUT_SPRITE_DARK))
+        self.assertTrue(os.path.exists(sprite.OUTPUT_SPRITE_DARK))
+        self.assertTrue(os.path.exists(dark))
+        self.generate()
+        self.assertFalse(os.path.exists(sprite.OUTPUT_SPRITE_DARK))
+        self.assertFalse(os.path.exists(dark))
+        self.assertEqual(sorted(os.listdir(os.path.dirname(sprite.OUTPUT_SPRITE))),
+                         ['controls-sprite.json', 'controls-sprite.png'])
+
+
+if __name__ == '__main__':
+    unittest.main()